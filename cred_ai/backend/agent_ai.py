@@ -1,18 +1,29 @@
 # backend/agent_ai.py  (Windows/local-friendly version)
-import os, joblib, json, datetime, tempfile
-from typing import Dict, Any, Optional
-from urllib.parse import urlparse
+import os, joblib, json, datetime, hashlib, contextvars
+from typing import Optional
 from pathlib import Path
 
-import pandas as pd
 import numpy as np
 import requests
-from PIL import Image, ImageChops, ImageOps
-import pytesseract
-from pdf2image import convert_from_path
 from fuzzywuzzy import fuzz
-import dns.resolver
-import whois
+
+import startup
+import metrics
+import field_extractor
+import train_agent
+import compact_forest
+import ingest
+from field_extractor import first_number
+from trusted_index import KeyIndex, VERIFY_COLUMNS
+from registry import TrustedRegistry
+from tenants import TenantDirectory
+from phash_index import HashIndex, phash, phash_bytes
+from registry_audit import SerialFlags
+from semantic_index import SemanticEngine, website_text
+from imaging import ocr_image, ela_analysis, is_pdf, ocr_pdf
+from result_cache import VerificationCache, make_key
+from domain_intel import DomainIntel
+from metrics import timed
 
 # ---------------------------
 # Local-path configuration (no /mnt)
@@ -42,56 +53,199 @@ if LOCAL_TRUSTED_CSV is None:
                 LOCAL_TRUSTED_CSV = str(f.resolve())
                 break
 
-# Models directory (local)
-_MODEL_DIR = Path("models")
+# Models directory: the one train_agent promotes into (MODEL_DIR, default models/)
+_MODEL_DIR = train_agent.OUT_DIR
 _MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
-_CLASSIFIER_P = _MODEL_DIR / "classifier_model.joblib"
-_ANOMALY_P = _MODEL_DIR / "anomaly_model.joblib"
+_CLASSIFIER_P = _MODEL_DIR / train_agent.CLASSIFIER_NAME
+_ANOMALY_P = _MODEL_DIR / train_agent.ANOMALY_NAME
+# "auto": serve the compact mmap export when present and current, "joblib" / "compact" to force one
+SERVING_MODEL_FORMAT = os.environ.get("SERVING_MODEL_FORMAT", "auto").lower()
+
+# Index artifact shared by workers (see trusted_index.load_trusted); "" disables it
+TRUSTED_ARTIFACT_DIR = os.environ.get("TRUSTED_ARTIFACT_DIR", "cache")
+# Registry columns kept in memory: the ones the checks read ("*" = every CSV column)
+_cols = os.environ.get("TRUSTED_COLUMNS", "").strip()
+TRUSTED_COLUMNS = None if _cols == "*" else ([c.strip() for c in _cols.split(",") if c.strip()] or VERIFY_COLUMNS)
+# Append-only delta files (*.csv / *.jsonl) picked up without a restart (see registry.py)
+REGISTRY_DELTA_DIR = os.environ.get("REGISTRY_DELTA_DIR") or (
+    str(Path(LOCAL_TRUSTED_CSV).parent / "deltas") if LOCAL_TRUSTED_CSV else None)
+REGISTRY_POLL_SECONDS = float(os.environ.get("REGISTRY_POLL_SECONDS", 30))
+# Per-issuer registries and known-good rules (see tenants.py); optional
+TENANTS_CONFIG = os.environ.get("TENANTS_CONFIG") or next(
+    (str(p.resolve()) for p in (Path("tenants.json"), Path("data/tenants.json"), Path("../data/tenants.json"))
+     if p.exists()), None)
+
+# Perceptual-hash index of registered / verified scans (see phash_index.py); "" disables it
+PHASH_INDEX_DIR = os.environ.get("PHASH_INDEX_DIR", "cache/phash")
+PHASH_RADIUS = int(os.environ.get("PHASH_RADIUS", 10))                  # matches reported
+PHASH_DUPLICATE_DISTANCE = int(os.environ.get("PHASH_DUPLICATE_DISTANCE", 6))   # matches that count as reuse
+PHASH_RECORD_VERIFIED = os.environ.get("PHASH_RECORD_VERIFIED", "1") == "1"
 
-print("agent_ai starting. Trusted CSV:", LOCAL_TRUSTED_CSV or "(not found)")
-print("Model dir:", str(_MODEL_DIR.resolve()))
-print("Classifier file:", str(_CLASSIFIER_P.resolve()))
-print("Anomaly file:", str(_ANOMALY_P.resolve()))
+# Per-serial flags written by the offline audit (see registry_audit.py); "" disables them
+REGISTRY_AUDIT_DIR = os.environ.get("REGISTRY_AUDIT_DIR", "cache/audit")
+
+# Embedding match (see semantic_index.py) only rescues names fuzzy matching scored below 75
+SEMANTIC_MATCH_SCORE = float(os.environ.get("SEMANTIC_MATCH_SCORE", 85))
 
 # ---------------------------
-# Load trusted CSV if available
+# Heavy components load lazily (first use, or startup.warm_up() in the background)
 # ---------------------------
-_TRUST_DF = None
-if LOCAL_TRUSTED_CSV and os.path.exists(LOCAL_TRUSTED_CSV):
-    try:
-        _TRUST_DF = pd.read_csv(LOCAL_TRUSTED_CSV)
-        print("Loaded trusted CSV, rows:", len(_TRUST_DF))
-    except Exception as e:
-        print("Failed to load trusted CSV:", e)
-        _TRUST_DF = None
-else:
-    print("No trusted CSV loaded. Place your CSV into backend/data/ and restart.")
+def _load_trusted():
+    if not (LOCAL_TRUSTED_CSV and os.path.exists(LOCAL_TRUSTED_CSV)):
+        print("No trusted CSV loaded. Place your CSV into backend/data/ and restart.")
+        return None
+    reg = TrustedRegistry(LOCAL_TRUSTED_CSV, TRUSTED_ARTIFACT_DIR or None, REGISTRY_DELTA_DIR,
+                          REGISTRY_POLL_SECONDS, TRUSTED_COLUMNS)
+    data = reg.load()
+    print("Loaded trusted registry:", LOCAL_TRUSTED_CSV, "rows:", len(data),
+          "distinct names:", len(data.institute_index), "version:", reg.version)
+    reg.start()
+    return reg
+
+def _open_tenant_registry(tenant):
+    if not os.path.exists(tenant.registry_path):
+        print("tenant", tenant.id, "registry not found at", tenant.registry_path)
+        return None
+    reg = TrustedRegistry(tenant.registry_path, TRUSTED_ARTIFACT_DIR or None, None,
+                          REGISTRY_POLL_SECONDS, TRUSTED_COLUMNS)
+    data = reg.load()
+    print("Loaded tenant registry:", tenant.id, "rows:", len(data) if data is not None else 0)
+    reg.start()
+    return reg
+
+def _load_tenants():
+    if not TENANTS_CONFIG:
+        return None
+    directory = TenantDirectory.from_file(TENANTS_CONFIG, _open_tenant_registry)
+    print("Loaded tenants:", TENANTS_CONFIG, "tenants:", len(directory))
+    return directory
+
+def _load_phash():
+    if not PHASH_INDEX_DIR:
+        return None
+    idx = HashIndex.load(PHASH_INDEX_DIR)
+    print("Loaded image hash index:", PHASH_INDEX_DIR, "rows:", len(idx))
+    return idx
+
+def _load_audit():
+    if not REGISTRY_AUDIT_DIR:
+        return None
+    flags = SerialFlags.load(REGISTRY_AUDIT_DIR)
+    if flags is not None:
+        print("Loaded registry audit flags:", REGISTRY_AUDIT_DIR, "serials:", len(flags), "audited:", flags.generated_at)
+    return flags
+
+def _load_semantic():
+    engine = SemanticEngine.load()
+    if engine is not None:
+        st = engine.status()
+        print("Loaded embedding model:", st["model"], "stored institutes:", st["institutes"], "texts:", st["texts"])
+    return engine
+
+def _model_manifest():
+    p = _MODEL_DIR / train_agent.MANIFEST_NAME
+    return json.loads(p.read_text()) if p.exists() else None
+
+def _load_model(path, label, manifest=None):
+    """The compact mmap export (compact_forest.py) when it matches the joblib file, else the joblib pickle."""
+    if SERVING_MODEL_FORMAT != "joblib":
+        model = compact_forest.load_for(path)
+        if model is not None:
+            print("Loaded", label, f"(compact, {model.n_trees} trees).")
+            return model
+        if SERVING_MODEL_FORMAT == "compact":
+            print(label, "has no compact export at", compact_forest.compact_path(path))
+            return None
+    if not path.exists():
+        print(label, "not found at", path)
+        return None
+    model = joblib.load(path)
+    print("Loaded", label + (f" (version {manifest['version']})." if manifest else "."))
+    return model
+
+def _model_loader(path, label):
+    def load():
+        manifest = _model_manifest()
+        reason = train_agent.check_compatible(manifest, FEATURES) if manifest else None
+        if reason:
+            print("Not loading", label + ":", reason)
+            return None
+        return _load_model(path, label, manifest)
+    return load
+
+def _load_ocr_engine():
+    import pytesseract
+    return pytesseract.get_tesseract_version()
+
+_REGISTRY = startup.register("trusted_registry", _load_trusted)
+_CLASSIFIER = startup.register("classifier", _model_loader(_CLASSIFIER_P, "classifier model"))
+_ANOMALY = startup.register("anomaly_model", _model_loader(_ANOMALY_P, "anomaly model"))
+_TENANTS = startup.register("tenants", _load_tenants)
+_PHASH = startup.register("phash_index", _load_phash)
+_AUDIT = startup.register("registry_audit", _load_audit)
+_SEMANTIC = startup.register("semantic_engine", _load_semantic)
+startup.register("ocr_engine", _load_ocr_engine)
+
+def reload_models():
+    """Hot-swap to whatever train_agent last promoted into models/, after checking its feature schema."""
+    manifest = _model_manifest()
+    reason = train_agent.check_compatible(manifest, FEATURES) if manifest else None
+    if reason:
+        return {"swapped": False, "error": reason}
+    # load both before swapping either, so requests never pair old and new models
+    clf = _load_model(_CLASSIFIER_P, "classifier model", manifest)
+    iso = _load_model(_ANOMALY_P, "anomaly model", manifest)
+    _CLASSIFIER.replace(clf)
+    _ANOMALY.replace(iso)
+    return {"swapped": True, "version": (manifest or {}).get("version"),
+            "classifier": clf is not None, "anomaly_model": iso is not None}
+
+def reload_audit():
+    """Pick up serial_flags.json after `registry_audit.py run` without a restart."""
+    flags = _load_audit()
+    _AUDIT.replace(flags)
+    return {"loaded": flags is not None, "serials": len(flags) if flags is not None else 0,
+            "audited_at": flags.generated_at if flags is not None else None}
+
+# One registry snapshot per request: a delta landing mid-request doesn't change what it sees
+_SNAPSHOT = contextvars.ContextVar("trusted_snapshot", default=None)
+
+def _trusted():
+    td = _SNAPSHOT.get()
+    if td is None:
+        reg = _REGISTRY.get()
+        td = reg.current() if reg is not None else None
+    return td
+
+def snapshot_for(payload):
+    """-> (tenant id or None, registry snapshot): the issuer's shard when it has one, else the global registry."""
+    directory = _TENANTS.get()
+    tenant = directory.route(payload.get("institute_code"), payload.get("institute_name")) if directory else None
+    td = directory.snapshot(tenant) if tenant is not None else None
+    if td is None:
+        reg = _REGISTRY.get()
+        td = reg.current() if reg is not None else None
+    return (tenant.id if tenant is not None else None), td
+
+def known_good_rule(metadata):
+    """(tenant id, rule) for the first tenant known-good signature metadata matches, else None."""
+    directory = _TENANTS.get()
+    hit = directory.match_known_good(metadata) if directory else None
+    return (hit[0].id, hit[1]) if hit else None
+
+def registry_version():
+    td = _trusted()
+    return td.version if td is not None else None
 
 # ---------------------------
-# Load ML models if available
+# Verification result cache (memory LRU + optional SQLite via CACHE_DB_PATH)
 # ---------------------------
-_classifier = None
-_iso_model = None
-try:
-    if _CLASSIFIER_P.exists():
-        _classifier = joblib.load(_CLASSIFIER_P)
-        print("Loaded classifier model.")
-    else:
-        print("Classifier model not found at", _CLASSIFIER_P)
-except Exception as e:
-    print("Error loading classifier:", e)
-    _classifier = None
-
-try:
-    if _ANOMALY_P.exists():
-        _iso_model = joblib.load(_ANOMALY_P)
-        print("Loaded anomaly model.")
-    else:
-        print("Anomaly model not found at", _ANOMALY_P)
-except Exception as e:
-    print("Error loading anomaly model:", e)
-    _iso_model = None
+_RESULT_CACHE = VerificationCache(
+    max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 2048)),
+    db_path=os.environ.get("CACHE_DB_PATH") or None,
+    watch_paths=[LOCAL_TRUSTED_CSV, _CLASSIFIER_P, _ANOMALY_P],
+)
 
 # ---------------------------
 # Features list (same as training)
@@ -101,52 +255,53 @@ FEATURES = [
     "ocr_vs_meta_institute_match","ela_score","image_complexity_kb","marks_removed_flag","marks_missing"
 ]
 
-# ---------- small helpers ----------
-def ocr_image(pil_img: Image.Image) -> str:
-    gray = ImageOps.grayscale(pil_img)
-    return pytesseract.image_to_string(gray, lang='eng')
-
-def ela_score_from_image(pil_img: Image.Image) -> float:
-    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
-        pil_img.convert("RGB").save(f.name, "JPEG", quality=90)
-        saved = Image.open(f.name)
-    diff = ImageChops.difference(pil_img.convert("RGB"), saved)
-    score = float(np.mean(np.array(diff.convert("L"))))
-    try: os.remove(f.name)
-    except: pass
-    return score
+def _records(frame):
+    """Registry rows as JSON-safe dicts (NaN -> None, numpy scalars -> Python)."""
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+
+def row_ref(row):
+    """Stable reference id for a registry row (its registration roll number, else its serial)."""
+    if not row:
+        return None
+    roll = row.get("unique_registration_roll_number")
+    if roll:
+        return str(roll)
+    serial = row.get("certificate_serial_number")
+    return f"serial:{serial}" if serial else None
 
 # Trusted CSV lookup (exact column names)
+@timed("find_in_trusted")
 def find_in_trusted(institute_name: str, institute_code: Optional[str]=None):
-    if _TRUST_DF is None:
+    td = _trusted()
+    if td is None:
         return False, None, 0
-    name_cols = [c for c in _TRUST_DF.columns if "institute" in c.lower() or "name" in c.lower()]
-    if not name_cols:
-        name_cols = _TRUST_DF.columns.tolist()
     best_score = 0; best_row = None
-    for _, r in _TRUST_DF.iterrows():
-        for nc in name_cols:
-            try:
-                cand = str(r.get(nc,""))
-                s = fuzz.token_set_ratio(institute_name.lower(), cand.lower())
-                if s > best_score:
-                    best_score = s; best_row = r
-            except:
-                continue
+    try:
+        pos, best_score = td.institute_index.best(str(institute_name or ""))
+        if best_score < 75:
+            # abbreviations / reordered names fuzzy ratios miss; the embedding can only raise the score
+            sem_pos, sem_score = _semantic_best(str(institute_name or ""), td.institute_index)
+            if sem_pos is not None and sem_score >= SEMANTIC_MATCH_SCORE and sem_score > best_score:
+                pos, best_score = sem_pos, int(round(sem_score))
+        if pos is not None:
+            best_row = td.row(pos)
+    except Exception:
+        best_score = 0; best_row = None
     # code match if csv has certificate_serial_number column or code
-    if institute_code and "code" in _TRUST_DF.columns:
-        matched = _TRUST_DF[_TRUST_DF["code"].astype(str).str.lower()==str(institute_code).lower()]
+    if institute_code and td.code_index is not None:
+        matched = td.code_index.positions(KeyIndex.normalize(institute_code, lower=True))
         if len(matched):
-            best_score = 100; best_row = matched.iloc[0]
-    return (best_score>=75), (best_row.to_dict() if best_row is not None else None), int(best_score)
+            best_score = 100; best_row = td.row(int(matched[0]))
+    return (best_score>=75), (_records(best_row.to_frame().T)[0] if best_row is not None else None), int(best_score)
 
 # Web checks
-def webpage_check(url, timeout=6):
+@timed("webpage_check")
+def webpage_check(url, timeout=6, session=None):
     out={"ok":False}
     if not url: return {"ok":False,"error":"no-url"}
     if not url.startswith("http"): url = "http://"+url
     try:
-        r = requests.get(url, timeout=timeout, allow_redirects=True)
+        r = (session or requests).get(url, timeout=timeout, allow_redirects=True)
         out["ok"]=True; out["status_code"]=r.status_code
         html = r.text
         s = html.lower().find("<title>")
@@ -160,8 +315,10 @@ def webpage_check(url, timeout=6):
         out["ok"]=False; out["error"]=str(e)
     return out
 
+@timed("whois_age_days")
 def whois_age_days(domain):
     try:
+        import whois
         w = whois.whois(domain)
         cd = w.creation_date
         if isinstance(cd, list): cd = cd[0]
@@ -170,47 +327,108 @@ def whois_age_days(domain):
     except:
         return None
 
+@timed("mx_check")
 def mx_check(domain):
     try:
+        import dns.resolver
         answers = dns.resolver.resolve(domain, 'MX')
         return len(answers) > 0
     except:
         return False
 
+# Cached, concurrent website/whois/MX probes per domain (see domain_intel.py)
+_DOMAIN_INTEL = DomainIntel(
+    fetch=lambda url, session: webpage_check(url, session=session),
+    whois_fn=whois_age_days,
+    mx_fn=mx_check,
+)
+
+@metrics.collector
+def _cache_metrics():
+    """Evidence-cache and domain-probe hit/miss counters plus hit ratios, sampled at scrape time."""
+    out = []
+    for cache, stats in (("result", _RESULT_CACHE.stats), ("domain", _DOMAIN_INTEL.stats)):
+        hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+        out.append(("verifier_cache_hits_total", {"cache": cache}, hits))
+        out.append(("verifier_cache_misses_total", {"cache": cache}, misses))
+        out.append(("verifier_cache_hit_ratio", {"cache": cache}, hits / (hits + misses) if hits + misses else 0.0))
+    return out
+
+@metrics.collector
+def _semantic_metrics():
+    """Embedding-engine counters (store / query-cache hits, background alignment), sampled at scrape time."""
+    engine = _SEMANTIC.get() if _SEMANTIC.loaded else None
+    if engine is None:
+        return []
+    st = engine.status()
+    out = [("verifier_semantic_events_total", {"event": k}, st[k]) for k in (
+        "store_hits", "cache_hits", "encoded", "stores_rejected", "aligned_built", "aligned_errors", "aligned_not_ready")]
+    out.append(("verifier_semantic_aligning", {}, st["aligning"]))
+    return out
+
+def _semantic_best(name, index):
+    engine = _SEMANTIC.get()
+    if engine is None:
+        return None, 0.0
+    try:
+        return engine.best(name, index)
+    except Exception:     # model timeout / failure (counted under stage="semantic_lookup"): the fuzzy result stands
+        return None, 0.0
+
 def semantic_sim(a,b):
+    """max(fuzzy, embedding cosine * 100); fuzzy only when no embedding model is loaded."""
     try:
-        # fallback to fuzzy
-        return float(fuzz.token_set_ratio(a,b))
+        score = float(fuzz.token_set_ratio(a,b))
     except:
-        return 0.0
+        score = 0.0
+    engine = _SEMANTIC.get()
+    if engine is not None:
+        try:
+            score = max(score, engine.similarity(a, b))
+        except Exception:     # counted under stage="semantic_sim"; the fuzzy score stands
+            pass
+    return score
+
+def institution_cache_key(institute_name, institute_website=None, institute_code=None):
+    return make_key("institution", str(institute_name or "").strip().lower(), institute_website, institute_code,
+                    registry_version())
 
 def institution_authenticator(institute_name, institute_website=None, institute_code=None):
+    key = institution_cache_key(institute_name, institute_website, institute_code)
+    evidence, info = _RESULT_CACHE.cached(
+        "institution", key, lambda: _institution_authenticator(institute_name, institute_website, institute_code))
+    evidence["cache"] = info
+    return evidence
+
+def _institution_authenticator(institute_name, institute_website=None, institute_code=None):
+    trusted = find_in_trusted(institute_name, institute_code)
+    intel = _DOMAIN_INTEL.probe(institute_website) if institute_website else None
+    return institution_evidence(institute_name, institute_code, trusted, intel)
+
+def institution_evidence(institute_name, institute_code, trusted, intel):
+    """Score the institution from a registry match (found, row, score) and a DomainIntel probe (None: no website)."""
     evidence={"checks":{}}
     score=0
-    found, row, row_score = find_in_trusted(institute_name, institute_code)
-    evidence["checks"]["trusted_csv"] = {"found":found,"match_score":row_score,"row":row}
+    found, row, row_score = trusted
+    evidence["checks"]["trusted_csv"] = {"found":found,"match_score":row_score,"ref":row_ref(row),"row":row}
     if found: score+=60
-    if institute_website:
-        wc = webpage_check(institute_website)
+    if intel is not None:
+        wc = intel["website"]
         evidence["checks"]["website"]=wc
         if wc.get("ok"):
-            sim = semantic_sim(institute_name, (wc.get("title","") + " " + wc.get("text_snippet","")[:300]))
+            sim = semantic_sim(institute_name, website_text(wc.get("title"), wc.get("text_snippet")))
             evidence["checks"]["website"]["semantic_score"]=sim
             if wc.get("status_code") in (200,301,302): score+=10
             if sim>=70: score+=20
             elif sim>=50: score+=10
-        # whois + mx
-        try:
-            domain = urlparse(institute_website).netloc or institute_website
-            if domain.startswith("www."): domain=domain.split("www.")[-1]
-            age = whois_age_days(domain)
-            evidence["checks"]["whois_age_days"]=age
-            if age and age>365: score+=5
-            mx = mx_check(domain)
-            evidence["checks"]["mx_ok"]=mx
-            if mx: score+=5
-        except Exception as e:
-            evidence["checks"]["whois_mx_err"]=str(e)
+        # whois + mx (probed concurrently with the page fetch)
+        age = intel["whois_age_days"]
+        evidence["checks"]["whois_age_days"]=age
+        if age and age>365: score+=5
+        mx = intel["mx_ok"]
+        evidence["checks"]["mx_ok"]=mx
+        if mx: score+=5
+        evidence["checks"]["domain_cache"]=intel.get("cache")
     else:
         evidence["checks"]["website"]={"ok":False,"note":"no-website"}
     if institute_code and isinstance(institute_code,str) and len(institute_code)>2:
@@ -219,48 +437,128 @@ def institution_authenticator(institute_name, institute_website=None, institute_
     return evidence
 
 # Extract fields from OCR text
-def extract_fields(ocr_text):
-    out={"name":None,"degree":None,"marks":None,"issuance_date":None,"institute":None,"serial":None}
-    lines = [l.strip() for l in str(ocr_text).splitlines() if l.strip()]
-    for l in lines:
-        low=l.lower()
-        if ("name" in low and ":" in l) or ("student" in low and ":" in l):
-            out["name"]=l.split(":",1)[1].strip()
-        if ("degree" in low or "course" in low) and ":" in l:
-            out["degree"]=l.split(":",1)[1].strip()
-        if ("marks" in low or "percentage" in low or "gpa" in low) and ":" in l:
-            out["marks"]=l.split(":",1)[1].strip()
-        if ("issued on" in low or "issuance" in low or ("date" in low and ":" in l)):
-            out["issuance_date"]=l.split(":",1)[1].strip() if ":" in l else l.strip()
-        if ("institute" in low or "university" in low or "college" in low) and ":" in l:
-            out["institute"]=l.split(":",1)[1].strip()
-        if ("serial" in low or "certificate no" in low or "certificate no." in low) and ":" in l:
-            out["serial"]=l.split(":",1)[1].strip()
-    if not out["marks"]:
-        import re
-        m = re.search(r"(\d{1,3}\.\d+|\d{1,3})\s*%", ocr_text or "")
-        if m: out["marks"]=m.group(1)+"%"
-    return out
+def extract_fields(ocr_text, institute=None):
+    return field_extractor.extract_fields(ocr_text, institute)
 
+@timed("serial_check")
 def serial_check(serial):
-    if _TRUST_DF is None or serial is None: return {"found":False}
-    matches = _TRUST_DF[_TRUST_DF.get("certificate_serial_number","").astype(str)==str(serial)]
-    if matches.shape[0]==0: return {"found":False}
-    return {"found":True,"count":int(matches.shape[0]),"rows":matches.to_dict(orient="records"), "reused": matches.shape[0]>1}
+    td = _trusted()
+    if td is None or td.serial_index is None or serial is None: return {"found":False}
+    key = KeyIndex.normalize(serial)
+    count = td.serial_index.count(key)
+    if count==0: return {"found":False}
+    rows = _records(td.rows(td.serial_index.positions(key)))
+    out = {"found":True,"count":count,"refs":[row_ref(r) for r in rows],"rows":rows, "reused": count>1}
+    audit = _AUDIT.get()
+    flagged = audit.lookup(key) if audit is not None else None
+    if flagged:
+        out["audit"] = flagged
+    return out
 
-def credential_verifier(metadata, image_bytes=None):
-    evidence={"ocr_text":"","fields":{},"consistency_score":0,"ela":None,"serial_check":None,"accreditation_ok":None,"date_check":None}
-    ocr_text=""
+def credential_cache_key(metadata, image_bytes=None, image_analysis=None):
     if image_bytes:
-        from io import BytesIO
-        img = Image.open(BytesIO(image_bytes)).convert("RGB")
-        ocr_text = ocr_image(img)
-        evidence["ela"] = ela_score_from_image(img)
+        img_part = hashlib.sha256(image_bytes).hexdigest()
+    elif image_analysis is not None:
+        img_part = make_key(image_analysis)
     else:
+        img_part = None
+    audit = _AUDIT.get()
+    return make_key("credential", img_part, metadata, registry_version(),
+                    audit.generated_at if audit is not None else None)
+
+def credential_cached(metadata, image_bytes=None):
+    return _RESULT_CACHE.contains("credential", credential_cache_key(metadata, image_bytes))
+
+def credential_verifier(metadata, image_bytes=None, image_analysis=None, image=None):
+    """image_analysis: optional precomputed {"ocr_text","ela"} (e.g. from a batch worker pool);
+    image: the upload already decoded by ingest.decode."""
+    key = credential_cache_key(metadata, image_bytes, image_analysis)
+    evidence, info = _RESULT_CACHE.cached(
+        "credential", key, lambda: _credential_verifier(metadata, image_bytes, image_analysis, image))
+    evidence["cache"] = info
+    return evidence
+
+def _credential_verifier(metadata, image_bytes=None, image_analysis=None, image=None):
+    evidence = new_credential_evidence()
+    ocr_text, image_e = image_evidence(metadata, image_bytes, image_analysis, image=image)
+    evidence.update(image_e)
+    evidence.update(field_evidence(metadata, ocr_text))
+    # serial checks (if metadata has certificate_serial_number)
+    serial = metadata.get("certificate_serial_number") or evidence["fields"].get("serial")
+    if serial:
+        evidence["serial_check"] = serial_check(serial)
+    evidence["accreditation_ok"] = accreditation_check(metadata)
+    evidence["date_check"] = date_check(metadata)
+    return evidence
+
+def new_credential_evidence():
+    return {"ocr_text":"","fields":{},"consistency_score":0,"ela":None,"serial_check":None,"accreditation_ok":None,"date_check":None}
+
+def image_evidence(metadata, image_bytes=None, image_analysis=None, ocr=True, ela=True, image=None):
+    """OCR text plus ELA/PDF evidence, from a precomputed analysis, a PDF, an image or metadata raw_text.
+    image: the shared decode of image_bytes (ingest.decode); decoded here when not given."""
+    evidence={}
+    ocr_text=""
+    if image_analysis is not None:
+        ocr_text = image_analysis.get("ocr_text") or ""
+        evidence["ela"] = image_analysis.get("ela")
+        if image_analysis.get("ela_heatmap"):
+            evidence["ela_heatmap"] = image_analysis["ela_heatmap"]
+        if image_analysis.get("pdf"):
+            evidence["pdf"] = image_analysis["pdf"]
+    elif image_bytes and is_pdf(image_bytes):
+        if ocr:
+            pdf = ocr_pdf(image_bytes)
+            ocr_text = pdf["ocr_text"]
+            evidence["pdf"] = pdf["pdf"]
+    elif image_bytes:
+        img = image
+        if img is None:
+            with timed("decode"):
+                img = ingest.decode(image_bytes)["image"]
+        if ocr:
+            ocr_text = ocr_image(img, (metadata or {}).get("institute_name") or (metadata or {}).get("issuer_name"))
+        if ela:
+            with timed("decode_full"):
+                full = ingest.decode_full(image_bytes, img)
+            ela_e = ela_analysis(full)
+            evidence["ela"] = ela_e["score"]
+            evidence["ela_heatmap"] = ela_e
+    elif ocr:
         ocr_text = metadata.get("raw_text","") or ""
-    evidence["ocr_text"]=ocr_text[:5000]
-    fields = extract_fields(ocr_text)
+    return ocr_text, evidence
+
+@timed("phash")
+def image_match(metadata, image_bytes=None, image=None):
+    """Nearest registered/verified scans by perceptual hash; a close one under another serial means a reused scan."""
+    idx = _PHASH.get()
+    if idx is None or not image_bytes or is_pdf(image_bytes):
+        return None
+    h = phash(image) if image is not None else phash_bytes(image_bytes)
+    own = str((metadata or {}).get("certificate_serial_number") or "")
+    matches = idx.query(h, PHASH_RADIUS)
+    dup = next((m for m in matches if m["distance"] <= PHASH_DUPLICATE_DISTANCE and m["key"] != own), None)
+    return {"phash": format(h, "016x"), "matches": matches, "near_duplicate": dup is not None,
+            "duplicate_of": dup["key"] if dup else None}
+
+def _remember_image(metadata, match, decision):
+    """Fingerprint verified uploads, so a later upload reusing the scan under another serial is caught."""
+    serial = (metadata or {}).get("certificate_serial_number")
+    if not (PHASH_RECORD_VERIFIED and match and serial and decision["verdict"] == "VERIFIED"):
+        return
+    if any(m["distance"] == 0 and m["key"] == str(serial) for m in match["matches"]):
+        return
+    idx = _PHASH.get()
+    if idx is not None:
+        idx.add(int(match["phash"], 16), str(serial))
+
+def field_evidence(metadata, ocr_text):
+    """Extracted fields and their consistency with the submitted metadata."""
+    evidence={"ocr_text": ocr_text[:5000]}
+    details = field_extractor.extract_fields_detailed(ocr_text, metadata.get("issuer_name") or metadata.get("institute_name"))
+    fields = {f: (details[f]["value"] if f in details else None) for f in field_extractor.FIELDS}
     evidence["fields"]=fields
+    evidence["field_details"]=details
 
     total=0; match=0
     if metadata.get("recipient_name"):
@@ -273,13 +571,8 @@ def credential_verifier(metadata, image_bytes=None):
             match+=1
     if metadata.get("marks") is not None or metadata.get("marks_percent") is not None or metadata.get("percentage") is not None:
         total+=1
-        def num_from_str(s):
-            if not s: return None
-            import re
-            m = re.search(r"\d+(\.\d+)?", str(s))
-            return float(m.group(0)) if m else None
-        meta_num = num_from_str(metadata.get("marks") or metadata.get("marks_percent") or metadata.get("percentage"))
-        ocr_num = num_from_str(fields.get("marks"))
+        meta_num = first_number(metadata.get("marks") or metadata.get("marks_percent") or metadata.get("percentage"))
+        ocr_num = first_number(fields.get("marks"))
         if meta_num is not None and ocr_num is not None:
             # small numeric tolerance
             if abs(meta_num - ocr_num) <= 1.0:
@@ -291,27 +584,18 @@ def credential_verifier(metadata, image_bytes=None):
 
     # finalize consistency score
     evidence["consistency_score"] = int((match / total) * 100) if total > 0 else 0
+    return evidence
 
-    # serial checks (if metadata has certificate_serial_number)
-    serial = metadata.get("certificate_serial_number") or fields.get("serial")
-    if serial:
-        evidence["serial_check"] = serial_check(serial)
-
-    # accreditation check (if metadata/CSV has accreditation text, compare)
+def accreditation_check(metadata):
+    """accreditation_statement vs the registry's accreditation table (None when not claimed)."""
     accred_meta = metadata.get("accreditation_statement")
-    accred_ok = None
-    if accred_meta and _TRUST_DF is not None:
-        inst_name = metadata.get("issuer_name", "")
-        matches = _TRUST_DF[_TRUST_DF.get("institute_name", "").astype(str).str.lower().str.contains(str(inst_name).lower(), na=False)]
-        accred_ok = False
-        for _, r in matches.iterrows():
-            combined = " ".join([str(r.get(c, "")) for c in r.index if isinstance(c, str)])
-            if accred_meta.lower() in combined.lower() or any(k.lower() in combined.lower() for k in ["ugc", "aicte", "naac", "abet", "national importance", "ministry"]):
-                accred_ok = True
-                break
-    evidence["accreditation_ok"] = accred_ok
+    td = _trusted() if accred_meta else None
+    if accred_meta and td is not None:
+        return td.accreditation.check(metadata.get("issuer_name", ""), accred_meta)
+    return None
 
-    # issuance_date vs convocation_date logic
+def date_check(metadata):
+    """issuance_date vs convocation_date logic."""
     try:
         iss = metadata.get("issuance_date")
         conv = metadata.get("convocation_date")
@@ -319,10 +603,146 @@ def credential_verifier(metadata, image_bytes=None):
             d_iss = datetime.datetime.fromisoformat(iss)
             d_conv = datetime.datetime.fromisoformat(conv)
             delta_days = (d_conv - d_iss).days
-            evidence["date_check"] = {"issuance": iss, "convocation": conv, "delta_days": delta_days}
+            out = {"issuance": iss, "convocation": conv, "delta_days": delta_days}
             if delta_days < 0:
-                evidence["date_check"]["issue"] = "convocation_before_issuance"
+                out["issue"] = "convocation_before_issuance"
+            return out
     except Exception:
-        evidence["date_check"] = None
+        pass
+    return None
 
-    return evidence
+# ---------------------------
+# Model scoring + decision (run_agent)
+# ---------------------------
+def build_features(metadata, cred_evidence, image_bytes=None):
+    """One FEATURES row (same order/defaults as train_agent.py) from request evidence."""
+    fields = cred_evidence.get("fields") or {}
+    marks = first_number(metadata.get("marks_percent") or metadata.get("marks") or metadata.get("percentage"))
+    if marks is None:
+        marks = first_number(fields.get("marks"))
+    name_match = 50.0
+    if fields.get("name") and metadata.get("recipient_name"):
+        name_match = float(fuzz.token_set_ratio(str(fields["name"]).lower(), str(metadata["recipient_name"]).lower()))
+    inst_meta = metadata.get("issuer_name") or metadata.get("institute_name")
+    inst_match = 50.0
+    if fields.get("institute") and inst_meta:
+        inst_match = float(fuzz.token_set_ratio(str(fields["institute"]).lower(), str(inst_meta).lower()))
+    ela = cred_evidence.get("ela")
+    if ela is None:
+        ela = first_number(metadata.get("ela_score"))
+    signed = metadata.get("signed_hash_present")
+    if signed is None:
+        signed = 1 if metadata.get("signed_hash") else 0
+    row = {
+        "marks_percent": marks if marks is not None else 0.0,
+        "num_subjects": first_number(metadata.get("num_subjects")) or 0.0,
+        "signed_hash_present": float(bool(first_number(signed))),
+        "ocr_vs_meta_name_match": name_match,
+        "ocr_vs_meta_institute_match": inst_match,
+        "ela_score": float(ela) if ela is not None else 5.0,
+        "image_complexity_kb": len(image_bytes) / 1024.0 if image_bytes else (first_number(metadata.get("image_complexity_kb")) or 200.0),
+        "marks_removed_flag": float(bool(first_number(metadata.get("marks_removed_flag")))),
+        "marks_missing": float(marks is None),
+    }
+    return np.array([row[f] for f in FEATURES], dtype=np.float64)
+
+@timed("model_scoring")
+def score_features(X):
+    """Score an N x len(FEATURES) matrix with one sklearn call per model."""
+    X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+    out = {"tamper_prob": None, "anomaly_score": None}
+    clf, iso = _CLASSIFIER.get(), _ANOMALY.get()
+    if clf is not None and len(X):
+        proba = clf.predict_proba(X)
+        classes = list(getattr(clf, "classes_", [0, 1]))
+        out["tamper_prob"] = proba[:, classes.index(1)] if 1 in classes else np.zeros(len(X))
+    if iso is not None and len(X):
+        out["anomaly_score"] = iso.decision_function(X)
+    return out
+
+def decide(inst_e, cred_e, model_scores, match=None):
+    reasons = []
+    inst = inst_e.get("institution_score", 0)
+    has_fields = bool((cred_e.get("fields") or {}) and cred_e.get("consistency_score"))
+    score = 0.5 * inst + 0.5 * cred_e.get("consistency_score", 0) if has_fields else float(inst)
+    if inst < 60: reasons.append("institution_not_confirmed")
+    sc = cred_e.get("serial_check") or {}
+    if sc.get("reused"):
+        score -= 25; reasons.append("serial_reused")
+    elif sc and not sc.get("found"):
+        score -= 10; reasons.append("serial_not_in_registry")
+    if sc.get("audit"):
+        # informational: the offline audit's findings on the registry rows themselves
+        reasons.append("registry_audit:" + ",".join(sc["audit"]["flags"]))
+    if (cred_e.get("date_check") or {}).get("issue"):
+        score -= 20; reasons.append(cred_e["date_check"]["issue"])
+    if cred_e.get("accreditation_ok") is False:
+        score -= 10; reasons.append("accreditation_not_confirmed")
+    tp = model_scores.get("tamper_prob")
+    if tp is not None:
+        if tp >= 0.5:
+            score -= 30; reasons.append(f"classifier_tamper_prob={tp:.2f}")
+        else:
+            score += 5
+    if match and match.get("near_duplicate"):
+        score -= 25; reasons.append(f"image_near_duplicate:{match['duplicate_of']}")
+    an = model_scores.get("anomaly_score")
+    if an is not None and an < 0:
+        score -= 15; reasons.append(f"isolation_forest_outlier={an:.3f}")
+    score = int(max(0, min(100, round(score))))
+    verdict = "VERIFIED" if score >= 75 else ("SUSPICIOUS" if score >= 50 else "REJECTED")
+    return {"verdict": verdict, "score": score, "reasons": reasons}
+
+def _evidence_for(payload):
+    metadata = payload.get("metadata") or {}
+    inst_e = institution_authenticator(payload.get("institute_name"), payload.get("institute_website"), payload.get("institute_code"))
+    cred_e = credential_verifier(metadata, payload.get("image_bytes"), payload.get("image_analysis"), payload.get("image"))
+    match = image_match(metadata, payload.get("image_bytes"), payload.get("image"))
+    return inst_e, cred_e, build_features(metadata, cred_e, payload.get("image_bytes")), match
+
+def run_agent_batch(payloads):
+    """Evidence per payload, then a single model call over the stacked N x 9 matrix."""
+    evid, rows, out = [], [], []
+    for p in payloads:
+        try:
+            tenant, snapshot = snapshot_for(p)
+        except Exception as exc:
+            evid.append(exc)
+            continue
+        token = _SNAPSHOT.set(snapshot)
+        try:
+            e = _evidence_for(p) + (tenant, registry_version())
+            evid.append(e); rows.append(e[2])
+        except Exception as exc:
+            evid.append(exc)
+        finally:
+            _SNAPSHOT.reset(token)
+    scores = score_features(np.vstack(rows)) if rows else {}
+    i = 0
+    for p, e in zip(payloads, evid):
+        if isinstance(e, Exception):
+            out.append({"student_id": p.get("student_id"), "error": "agent_exception", "detail": str(e)})
+            continue
+        inst_e, cred_e, feats, match, tenant, version = e
+        ms = {k: (float(v[i]) if v is not None else None) for k, v in scores.items()}
+        i += 1
+        out.append(assemble_result(p, inst_e, cred_e, feats, ms, version, tenant, match))
+    return out
+
+def assemble_result(payload, inst_e, cred_e, feats, model_scores, version, tenant=None, match=None):
+    decision = decide(inst_e, cred_e, model_scores, match)
+    _remember_image(payload.get("metadata"), match, decision)
+    return {
+        "student_id": payload.get("student_id"),
+        "tenant": tenant,
+        "institution_evidence": inst_e,
+        "credential_evidence": cred_e,
+        "image_match": match,
+        "features": dict(zip(FEATURES, feats.tolist())),
+        "model_scores": model_scores,
+        "decision": decision,
+        "registry_version": version,
+    }
+
+def run_agent(payload):
+    return run_agent_batch([payload])[0]
@@ -0,0 +1,97 @@
+# backend/benchmarks/bench_ingest.py
+# Peak memory and time of the image side of one /agent_ai request on a large
+# phone photo: the old flow (the OCR and ELA checks each decode the full-size
+# upload, OCR converts it again) vs ingest.decode (one draft-mode decode for OCR;
+# ELA keeps a native-resolution decode via ingest.decode_full so its score is
+# unchanged). Each flow runs in a fresh interpreter and reads its own VmHWM
+# (ru_maxrss is inherited from this process, which rendered the photo).
+# Tesseract itself runs as a separate process and is left out.
+# Run from backend/:  python benchmarks/bench_ingest.py [--megapixels 40] [--out ingest.json]
+import argparse, io, json, subprocess, sys, tempfile
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from bench_verifier import render_certificate  # noqa: E402
+
+BACKEND = str(Path(__file__).resolve().parents[1])
+
+SNIPPET = """
+import sys, time, resource, threading
+sys.path.insert(0, {backend!r})
+from io import BytesIO
+from PIL import Image, ImageOps
+import imaging, ingest
+def peak_kb():
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(l.split()[1]) for l in f if l.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+data = open({path!r}, "rb").read()
+base = peak_kb()
+t = time.perf_counter()
+{flow}
+secs = time.perf_counter() - t
+print(secs, base, peak_kb())
+"""
+
+# the OCR and ELA checks ran concurrently, each with its own decode
+LEGACY = """
+def ocr_check():
+    img = Image.open(BytesIO(data)).convert("RGB")
+    ImageOps.grayscale(img)
+def ela_check():
+    img = Image.open(BytesIO(data)).convert("RGB")
+    imaging.ela_analysis(img)
+ts = [threading.Thread(target=ocr_check), threading.Thread(target=ela_check)]
+[t.start() for t in ts]; [t.join() for t in ts]
+"""
+
+INGEST = """
+img = ingest.decode(data)["image"]
+ts = [threading.Thread(target=ImageOps.grayscale, args=(img,)),
+      threading.Thread(target=lambda: imaging.ela_analysis(ingest.decode_full(data, img)))]
+[t.start() for t in ts]; [t.join() for t in ts]
+"""
+
+
+def photo(megapixels, quality=90):
+    """A rendered certificate upscaled to phone-camera resolution."""
+    jpeg, _ = render_certificate(["CERTIFICATE", "Name: Asha Sharma", "Degree: B.Tech", "Marks: 81.5%"])
+    img = Image.open(io.BytesIO(jpeg))
+    f = (megapixels * 1e6 / (img.width * img.height)) ** 0.5
+    img = img.resize((int(img.width * f), int(img.height * f)), Image.BICUBIC)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue(), img.size
+
+
+def run(flow, path):
+    out = subprocess.check_output([sys.executable, "-c", SNIPPET.format(backend=BACKEND, path=path, flow=flow)],
+                                  cwd=BACKEND)
+    secs, base_kb, peak_kb = out.split()[-3:]
+    return {"ms": round(float(secs) * 1000, 1), "peak_rss_mb": round(int(peak_kb) / 1024, 1),
+            "request_rss_mb": round((int(peak_kb) - int(base_kb)) / 1024, 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--megapixels", type=float, default=40)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    data, size = photo(args.megapixels)
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as f:
+        f.write(data)
+        f.flush()
+        report = {"image": {"size": list(size), "bytes": len(data)},
+                  "before": run(LEGACY, f.name), "after": run(INGEST, f.name)}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# backend/benchmarks/bench_institute_index.py
+# Per-lookup latency of the institute-name index at growing registry sizes.
+# Run from backend/:  python benchmarks/bench_institute_index.py [--sizes 2000,100000,1000000]
+import argparse, json, random, sys, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from trusted_index import InstituteIndex, name_columns  # noqa: E402
+
+DEFAULT_CSV = Path(__file__).resolve().parents[2] / "data" / "NIT_SILCHAR Dataset.csv"
+CITIES = ["North", "South", "East", "West", "Central", "Rural", "Tech Park", "Annex", "City", "Hill"]
+
+
+def synth_frame(base: pd.DataFrame, n_rows: int, rows_per_institute: int = 25, seed: int = 0) -> pd.DataFrame:
+    """Registry of n_rows with ~n_rows/rows_per_institute distinct institutes derived from the real ones."""
+    rng = np.random.default_rng(seed)
+    inst = base[["institute_type", "institute_name", "institute_website"]].drop_duplicates("institute_name")
+    n_inst = max(len(inst), n_rows // rows_per_institute)
+    pick = rng.integers(0, len(inst), n_inst)
+    names = inst["institute_name"].to_numpy()[pick].astype(object)
+    sites = inst["institute_website"].to_numpy()[pick].astype(object)
+    types = inst["institute_type"].to_numpy()[pick].astype(object)
+    if n_inst > len(inst):
+        suffix = np.array([f" {CITIES[i % len(CITIES)]} Campus {i}" for i in range(n_inst)], dtype=object)
+        suffix[: len(inst)] = ""
+        names = names + suffix
+        sites = np.array([s.rstrip("/") + (f"/campus{i}" if i >= len(inst) else "") for i, s in enumerate(sites)], dtype=object)
+    rows = rng.integers(0, n_inst, n_rows)
+    return pd.DataFrame({"institute_type": types[rows], "institute_name": names[rows], "institute_website": sites[rows]})
+
+
+def legacy_lookup(df: pd.DataFrame, q: str):
+    cols = name_columns(df)
+    best_score = 0; best_pos = None
+    for pos, (_, r) in enumerate(df.iterrows()):
+        for nc in cols:
+            s = fuzz.token_set_ratio(q.lower(), str(r.get(nc, "")).lower())
+            if s > best_score:
+                best_score = s; best_pos = pos
+    return best_pos, best_score
+
+
+def make_queries(df: pd.DataFrame, n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    names = df["institute_name"].drop_duplicates().tolist()
+    out = []
+    for _ in range(n):
+        q = rnd.choice(names)
+        if rnd.random() < 0.5 and len(q) > 4:  # one-character typo
+            i = rnd.randrange(len(q))
+            q = q[:i] + rnd.choice("abcdefghijklmnopqrstuvwxyz") + q[i + 1:]
+        out.append(q)
+    return out
+
+
+def time_lookups(fn, queries):
+    lat = []
+    for q in queries:
+        t = time.perf_counter(); fn(q); lat.append(time.perf_counter() - t)
+    lat = np.array(lat) * 1000
+    return {"p50_ms": round(float(np.percentile(lat, 50)), 3), "p95_ms": round(float(np.percentile(lat, 95)), 3),
+            "mean_ms": round(float(lat.mean()), 3)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(DEFAULT_CSV))
+    ap.add_argument("--sizes", default="2000,100000,1000000")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--legacy-max-rows", type=int, default=2000, help="skip the iterrows() baseline above this size")
+    args = ap.parse_args()
+
+    base = pd.read_csv(args.csv)
+    report = []
+    for n in [int(x) for x in args.sizes.split(",")]:
+        df = base if n == len(base) else synth_frame(base, n)
+        queries = make_queries(df, args.queries)
+        t = time.perf_counter(); idx = InstituteIndex.from_frame(df); build_s = time.perf_counter() - t
+        entry = {"rows": n, "distinct_names": len(idx), "build_s": round(build_s, 3), "index": time_lookups(idx.best, queries)}
+        if n <= args.legacy_max_rows:
+            entry["legacy_iterrows"] = time_lookups(lambda q: legacy_lookup(df, q), queries[:20])
+        report.append(entry)
+        print(json.dumps(entry))
+    return report
+
+
+if __name__ == "__main__":
+    main()
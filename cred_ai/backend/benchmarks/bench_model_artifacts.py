@@ -0,0 +1,93 @@
+# backend/benchmarks/bench_model_artifacts.py
+# Load time, artifact size and inference latency: joblib sklearn forests vs the
+# compact mmap export (compact_forest.py). Exports to a temp dir, so models/ is untouched.
+# Run from backend/:  python benchmarks/bench_model_artifacts.py [--threshold-dtype float16] [--max-loss 0.005]
+import argparse, json, os, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import compact_forest  # noqa: E402
+import train_agent  # noqa: E402
+
+# Fresh interpreter per load so the page cache / allocator state of earlier loads doesn't leak in
+LOAD_SNIPPET = """
+import sys, time, resource
+sys.path.insert(0, {backend!r})
+t = time.perf_counter()
+{load}
+secs = time.perf_counter() - t
+print(secs, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def _load_in_subprocess(load_code):
+    code = LOAD_SNIPPET.format(backend=str(Path(__file__).resolve().parents[1]), load=load_code)
+    secs, rss_kb = subprocess.check_output([sys.executable, "-c", code]).split()
+    return {"load_ms": round(float(secs) * 1000, 2), "process_max_rss_mb": round(int(rss_kb) / 1024, 1)}
+
+
+def _latency(fn, X, repeat):
+    lat = []
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(X); lat.append(time.perf_counter() - t)
+    lat = np.array(lat) * 1000
+    return {"p50_ms": round(float(np.percentile(lat, 50)), 4), "p95_ms": round(float(np.percentile(lat, 95)), 4)}
+
+
+def _dir_bytes(path):
+    return sum(f.stat().st_size for f in Path(path).iterdir())
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model-dir", default=str(train_agent.OUT_DIR))
+    ap.add_argument("--csv", default=None)
+    ap.add_argument("--threshold-dtype", default="float32", choices=["float32", "float16"])
+    ap.add_argument("--max-loss", type=float, default=0.0)
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=256)
+    args = ap.parse_args()
+
+    X, y, _ = train_agent.load_features(args.csv or train_agent.default_csv())
+    rng = np.random.default_rng(0)
+    one = X[rng.integers(0, len(X), 1)].astype(np.float64)
+    batch = X[rng.integers(0, len(X), args.batch)].astype(np.float64)
+    tmp = Path(tempfile.mkdtemp(prefix="compact-bench-"))
+    report = []
+    try:
+        for name, method in ((train_agent.CLASSIFIER_NAME, "predict_proba"), (train_agent.ANOMALY_NAME, "decision_function")):
+            src = Path(args.model_dir) / name
+            if not src.exists():
+                print("skip:", src, "not found", file=sys.stderr)
+                continue
+            path = tmp / name
+            shutil.copyfile(src, path)
+            model = joblib.load(path)
+            export = compact_forest.export(model, str(path), X, y, args.threshold_dtype, max_loss=args.max_loss)
+            compact = compact_forest.CompactForest.load(compact_forest.compact_path(path))
+            entry = {
+                "model": name, "trees": export["trees"], "trees_source": export["trees_source"],
+                "label_agreement": export["label_agreement"], "max_abs_diff": export["max_abs_diff"],
+                "size_bytes": {"joblib": os.path.getsize(path), "compact": _dir_bytes(compact_forest.compact_path(path))},
+                "load": {"joblib": _load_in_subprocess(f"import joblib; m = joblib.load({str(path)!r})"),
+                         "compact_mmap": _load_in_subprocess(
+                             f"import compact_forest; m = compact_forest.CompactForest.load({str(compact_forest.compact_path(path))!r})")},
+                "single_row": {"sklearn": _latency(getattr(model, method), one, args.repeat),
+                               "compact": _latency(getattr(compact, method), one, args.repeat)},
+                f"batch_{args.batch}": {"sklearn": _latency(getattr(model, method), batch, max(5, args.repeat // 20)),
+                                         "compact": _latency(getattr(compact, method), batch, max(5, args.repeat // 20))},
+            }
+            if "accuracy" in export:
+                entry["accuracy_compact"] = export["accuracy"]
+            report.append(entry)
+            print(json.dumps(entry))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# backend/benchmarks/bench_ocr.py
+# OCR time per image and field-level accuracy: full-page Tesseract vs the fast
+# path (ocr_fastpath.py) in region mode and with per-layout field-box templates.
+# Certificates are rendered from rows of the trusted CSV like bench_verifier's
+# corpus; --skew tilts each scan by a random angle to exercise deskewing.
+# Run from backend/:  python benchmarks/bench_ocr.py [--images 40] [--skew 3] [--out ocr.json]
+import argparse, io, json, random, sys, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import field_extractor  # noqa: E402
+import imaging  # noqa: E402
+import ocr_fastpath  # noqa: E402
+from bench_field_extractor import LAYOUTS, _norm  # noqa: E402
+from bench_verifier import DEFAULT_CSV, NAMES, _font, render_certificate  # noqa: E402
+
+# placeholder in a layout line -> extracted field
+PLACEHOLDERS = {"name": "name", "credential_title": "degree", "marks_percent": "marks",
+                "issuance_date": "issuance_date", "institute_name": "institute", "certificate_serial_number": "serial"}
+# render_certificate geometry
+X0, Y0, LINE_H, TEXT_H, PAGE = 120, 160, 70, 50, (1240, 1754)
+
+
+def layout_boxes(layout):
+    """Value boxes (page fractions) per field for a LAYOUTS entry, from the rendered text geometry."""
+    font, boxes = _font(34), {}
+    for row, line in enumerate(layout):
+        for ph, field in PLACEHOLDERS.items():
+            tag = "{" + ph + "}"
+            if tag not in line or field in boxes or line.strip() == tag:
+                continue
+            x = X0 + font.getlength(line.split(tag)[0])
+            y = Y0 + LINE_H * row
+            boxes[field] = [(x - 6) / PAGE[0], (y - 8) / PAGE[1], 1180 / PAGE[0], (y + TEXT_H) / PAGE[1]]
+    return boxes
+
+
+def corpus(csv_path, n, skew, seed=0):
+    rnd = random.Random(seed)
+    df = pd.read_csv(csv_path).fillna({"marks_percent": 0})
+    docs = []
+    for i in range(n):
+        r = df.iloc[rnd.randrange(len(df))].to_dict()
+        r["name"] = f"{rnd.choice(NAMES[0])} {rnd.choice(NAMES[1])}"
+        li = i % len(LAYOUTS)
+        jpeg, _ = render_certificate([l.format(**r) for l in LAYOUTS[li]], size=PAGE)
+        angle = rnd.uniform(-skew, skew) if skew else 0.0
+        if angle:
+            img = Image.open(io.BytesIO(jpeg)).rotate(angle, resample=Image.BICUBIC, fillcolor="white")
+            buf = io.BytesIO()
+            img.save(buf, "JPEG", quality=90)
+            jpeg = buf.getvalue()
+        truth = {"name": r["name"], "degree": r["credential_title"], "marks": str(r["marks_percent"]),
+                 "issuance_date": r["issuance_date"], "institute": r["institute_name"], "serial": r["certificate_serial_number"]}
+        docs.append({"jpeg": jpeg, "truth": truth, "layout": li, "angle": round(angle, 2)})
+    return docs
+
+
+def evaluate(name, docs, ocr):
+    lat, correct, total = [], {}, {}
+    for d in docs:
+        img = Image.open(io.BytesIO(d["jpeg"])).convert("RGB")
+        t = time.perf_counter()
+        text = ocr(img, d)
+        lat.append(time.perf_counter() - t)
+        out = field_extractor.extract_fields(text)
+        for f, v in d["truth"].items():
+            total[f] = total.get(f, 0) + 1
+            correct[f] = correct.get(f, 0) + int(_norm(out.get(f)) == _norm(v))
+    lat = np.array(lat) * 1000
+    acc = {f: round(correct[f] / total[f], 3) for f in total}
+    return {"mode": name, "mean_ms": round(float(lat.mean()), 1), "p50_ms": round(float(np.percentile(lat, 50)), 1),
+            "p95_ms": round(float(np.percentile(lat, 95)), 1), "field_accuracy": acc,
+            "mean_accuracy": round(float(np.mean(list(acc.values()))), 3)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(DEFAULT_CSV))
+    ap.add_argument("--images", type=int, default=30)
+    ap.add_argument("--skew", type=float, default=0.0, help="max random tilt in degrees")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    docs = corpus(args.csv, args.images, args.skew)
+    boxes = [layout_boxes(l) for l in LAYOUTS]
+
+    def templated(img, d):
+        # one synthetic "institute" per layout; fields the template has no box for come from region text
+        key = f"bench layout {d['layout']}"
+        ocr_fastpath.register_layout(key, {"boxes": boxes[d["layout"]], "full_text": True})
+        return imaging.ocr_image(img, key, mode="fast")
+
+    runs = [evaluate("full_page", docs, lambda img, d: imaging.ocr_full_page(img)),
+            evaluate("fast_regions", docs, lambda img, d: imaging.ocr_image(img, None, mode="fast"))]
+    if not args.skew:   # box fractions assume an unrotated page
+        runs.append(evaluate("fast_template", docs, templated))
+    base = runs[0]["mean_ms"]
+    for r in runs:
+        r["speedup"] = round(base / r["mean_ms"], 2) if r["mean_ms"] else None
+    report = {"images": len(docs), "skew": args.skew, "target_dpi": ocr_fastpath.OCR_TARGET_DPI, "runs": runs}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# backend/benchmarks/bench_phash.py
+# Near-duplicate lookup in the perceptual-hash index (phash_index.py) at scale:
+# build time, memory, query latency and recall of multi-index hashing vs a
+# brute-force popcount scan, on random 64-bit hashes with planted near-duplicates.
+# Also times hashing a rendered certificate JPEG (full decode vs draft mode).
+# Run from backend/:  python benchmarks/bench_phash.py [--rows 1000000] [--radius 10]
+import argparse, io, json, sys, time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import phash_index  # noqa: E402
+from bench_verifier import render_certificate  # noqa: E402
+
+
+def _pct(lat):
+    lat = np.array(lat) * 1000
+    return {"p50_ms": round(float(np.percentile(lat, 50)), 4), "p99_ms": round(float(np.percentile(lat, 99)), 4)}
+
+
+def flip_bits(rng, h, n):
+    for b in rng.choice(64, n, replace=False):
+        h ^= 1 << int(b)
+    return h
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--radius", type=int, default=10)
+    ap.add_argument("--brute-queries", type=int, default=50)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+
+    hashes = rng.integers(0, np.iinfo(np.int64).max, args.rows, dtype=np.int64).astype(np.uint64)
+    hashes |= rng.integers(0, 2, args.rows).astype(np.uint64) << np.uint64(63)
+    keys = np.char.encode(np.char.add("S", np.arange(args.rows).astype(str)))
+    t = time.perf_counter()
+    idx = phash_index.HashIndex()
+    idx._base = phash_index._Base(hashes, keys)
+    build_s = time.perf_counter() - t
+
+    targets = rng.integers(0, args.rows, args.queries)
+    dists = rng.integers(0, args.radius + 1, args.queries)
+    queries = [flip_bits(rng, int(hashes[i]), int(d)) for i, d in zip(targets, dists)]
+
+    lat, found = [], 0
+    for q, i in zip(queries, targets):
+        t = time.perf_counter()
+        hits = idx.query(q, args.radius)
+        lat.append(time.perf_counter() - t)
+        found += any(h["key"] == keys[i].decode() for h in hits)
+
+    brute = []
+    for q in queries[:args.brute_queries]:
+        t = time.perf_counter()
+        d = phash_index.popcount(hashes ^ np.uint64(q))
+        np.flatnonzero(d <= args.radius)
+        brute.append(time.perf_counter() - t)
+
+    jpeg, _ = render_certificate(["Certificate", "Name: Asha Sharma", "Marks: 81.5%"])
+    hash_full, hash_draft = [], []
+    for _ in range(20):
+        t = time.perf_counter(); phash_index.phash(Image.open(io.BytesIO(jpeg))); hash_full.append(time.perf_counter() - t)
+        t = time.perf_counter(); phash_index.phash_bytes(jpeg); hash_draft.append(time.perf_counter() - t)
+
+    base = idx._base
+    report = {
+        "rows": args.rows, "radius": args.radius, "build_s": round(build_s, 2),
+        "index_mb": round(sum(a.nbytes for a in (base.hashes, base.keys, base.order, base.offsets)) / 1e6, 1),
+        "mih_query": _pct(lat), "recall": round(found / len(queries), 4),
+        "brute_force_query": _pct(brute),
+        "hash_jpeg": {"full_decode": _pct(hash_full), "draft_decode": _pct(hash_draft)},
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
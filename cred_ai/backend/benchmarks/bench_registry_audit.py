@@ -0,0 +1,125 @@
+# backend/benchmarks/bench_registry_audit.py
+# The offline registry audit (registry_audit.py) on a large synthetic registry:
+# rows of the trusted CSV tiled to --rows with unique serials, then planted
+# duplicate serials, inverted / ISO-format / garbage dates and out-of-range marks.
+# Reports the audit's stage timings, whether every planted problem was flagged,
+# a per-row Python loop over the same checks (timed on --loop-rows and
+# extrapolated), and the online per-serial lookup latency.
+# Run from backend/:  python benchmarks/bench_registry_audit.py [--rows 1000000] [--out audit.json]
+import argparse, datetime, json, sys, tempfile, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import registry_audit  # noqa: E402
+from bench_verifier import DEFAULT_CSV  # noqa: E402
+
+
+def synthesize(csv_path, rows, plant, seed=0):
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(csv_path, dtype=str)
+    df = base.iloc[np.arange(rows) % len(base)].reset_index(drop=True)
+    df["certificate_serial_number"] = [f"SN{i:09d}" for i in range(rows)]
+    picks = rng.choice(rows, 5 * plant, replace=False).reshape(5, plant)
+    dup, inverted, iso, garbage, marks = picks
+    df.loc[dup, "certificate_serial_number"] = df.loc[(dup + 1) % rows, "certificate_serial_number"].to_numpy()
+    df.loc[inverted, "issuance_date"] = "01-07-2023"
+    df.loc[inverted, "convocation_date"] = "01-01-2023"
+    df.loc[iso, "issuance_date"] = "2022-05-29"          # ISO rows (deltas) must still parse
+    df.loc[garbage, "convocation_date"] = "31-02-20x2"
+    df.loc[marks, "marks_percent"] = "104.5"
+    return df, {"duplicate_serial": dup, "convocation_before_issuance": inverted,
+                "convocation_unparseable": garbage, "marks_out_of_range": marks, "iso_dates": iso}
+
+
+def per_row(df):
+    """The same checks one row at a time, the way the online path does them."""
+    seen, flags = {}, []
+    for r in df.itertuples(index=False):
+        seen[r.certificate_serial_number] = seen.get(r.certificate_serial_number, 0) + 1
+    today = datetime.date.today()
+    for r in df.itertuples(index=False):
+        f = 0
+        if seen[r.certificate_serial_number] > 1:
+            f |= 1
+        dates = []
+        for v in (r.issuance_date, r.convocation_date):
+            d = None
+            for fmt in registry_audit.DATE_FORMATS:
+                try:
+                    d = datetime.datetime.strptime(str(v), fmt).date()
+                    break
+                except ValueError:
+                    pass
+            dates.append(d)
+        if dates[0] and dates[1] and dates[1] < dates[0]:
+            f |= 2
+        if dates[0] and dates[0] > today:
+            f |= 16
+        try:
+            m = float(r.marks_percent)
+            if m == m and not 0 <= m <= 100:      # a missing mark is not out of range
+                f |= 32
+        except (TypeError, ValueError):
+            pass
+        flags.append(f)
+    return flags
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(DEFAULT_CSV))
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--plant", type=int, default=1000)
+    ap.add_argument("--loop-rows", type=int, default=50_000)
+    ap.add_argument("--lookups", type=int, default=100_000)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    df, planted = synthesize(args.csv, args.rows, args.plant)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "registry.csv"
+        df.to_csv(csv_path, index=False)
+        t = time.perf_counter()
+        report = registry_audit.audit(str(csv_path), str(Path(tmp) / "audit"))
+        wall = time.perf_counter() - t
+        flagged = pd.read_csv(Path(tmp) / "audit" / "flagged_rows.csv", dtype=str)
+        flags = registry_audit.SerialFlags.load(str(Path(tmp) / "audit"))
+
+    by_serial = flagged.groupby("certificate_serial_number")["flags"].agg(";".join)
+    serials = df["certificate_serial_number"]
+    recall = {}
+    for name, idx in planted.items():
+        if name == "iso_dates":
+            continue
+        hit = serials.iloc[idx].map(by_serial).fillna("").str.contains(name, regex=False)
+        recall[name] = round(float(hit.mean()), 4)
+    iso_rows = serials.iloc[planted["iso_dates"]].map(by_serial).fillna("")
+    recall["iso_dates_parsed"] = round(float((~iso_rows.str.contains("issuance_unparseable", regex=False)).mean()), 4)
+
+    sample = df.head(args.loop_rows)
+    t = time.perf_counter()
+    per_row(sample)
+    loop_s = (time.perf_counter() - t) * args.rows / max(1, len(sample))
+
+    keys = serials.sample(args.lookups, replace=True, random_state=0).tolist()
+    t = time.perf_counter()
+    for k in keys:
+        flags.lookup(k)
+    lookup_us = (time.perf_counter() - t) / len(keys) * 1e6
+
+    out = {"rows": args.rows, "audit_wall_s": round(wall, 3), "audit": {k: report[k] for k in (
+               "timings_s", "rows_flagged", "serials_flagged", "flag_counts", "anomaly_model")},
+           "planted_recall": recall,
+           "per_row_loop_s_extrapolated": round(loop_s, 2), "speedup": round(loop_s / max(wall, 1e-9), 1),
+           "lookup_us": round(lookup_us, 3)}
+    print(json.dumps(out, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(out, indent=2))
+    return out
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# backend/benchmarks/bench_response.py
+# Payload size and serialization time of one /agent_ai result: FastAPI's default
+# path (jsonable_encoder + json.dumps) vs response_format.dumps at each verbosity.
+# The result is built from real registry rows (numpy scalars included) with a
+# reused serial, so serial_check carries several rows, plus full-size OCR text
+# and a page snippet.
+# Run from backend/:  python benchmarks/bench_response.py [--serial-rows 8] [--repeat 2000]
+import argparse, json, sys, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import response_format  # noqa: E402
+from bench_verifier import DEFAULT_CSV  # noqa: E402
+
+
+def sample_result(csv_path, serial_rows):
+    df = pd.read_csv(csv_path).head(max(1, serial_rows))
+    rows = [{k: v for k, v in r.items()} for _, r in df.iterrows()]      # numpy / NaN values as pandas gives them
+    ref = lambda r: str(r.get("unique_registration_roll_number"))
+    return {
+        "student_id": "STU1", "tenant": None, "registry_version": "abc123def456",
+        "institution_evidence": {"checks": {
+            "trusted_csv": {"found": True, "match_score": np.int64(100), "ref": ref(rows[0]), "row": rows[0]},
+            "website": {"ok": True, "status_code": 200, "title": "Institute", "text_snippet": "lorem ipsum " * 170,
+                        "semantic_score": np.int64(88)},
+            "whois_age_days": 3650, "mx_ok": True, "domain_cache": {"website": "hit"}},
+            "institution_score": 100},
+        "credential_evidence": {
+            "ocr_text": ("Name: Asha Sharma\nMarks: 81.5%\n" * 200)[:5000],
+            "fields": {"name": "Asha Sharma", "marks": "81.5"}, "consistency_score": 92,
+            "ela": np.float64(3.2), "ela_heatmap": {"score": 3.2, "grid": np.random.rand(4, 4).round(3).tolist()},
+            "serial_check": {"found": True, "count": len(rows), "refs": [ref(r) for r in rows], "rows": rows,
+                             "reused": len(rows) > 1},
+            "accreditation_ok": True, "date_check": {"ok": True}},
+        "features": {f"f{i}": np.float32(i) for i in range(9)},
+        "model_scores": {"tamper_prob": np.float64(0.12), "anomaly_score": np.float64(0.05)},
+        "decision": {"verdict": "VERIFIED", "score": 88, "reasons": []},
+        "institute_verified": True, "certificate_verified": True,
+    }
+
+
+def _time(fn, repeat):
+    t = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return round((time.perf_counter() - t) / repeat * 1e6, 1), len(out)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(DEFAULT_CSV))
+    ap.add_argument("--serial-rows", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+    result = sample_result(args.csv, args.serial_rows)
+    report = {"encoder": "orjson" if response_format.orjson is not None else "json", "runs": {}}
+    try:
+        from fastapi.encoders import jsonable_encoder
+        # what FastAPI does with a returned dict; it rejects numpy ints, so it gets a plain-Python copy
+        plain = json.loads(json.dumps(result, default=response_format._default))
+        baseline = lambda: json.dumps(jsonable_encoder(plain)).encode()
+        us, size = _time(baseline, args.repeat)
+        report["runs"]["fastapi_default_full"] = {"us": us, "bytes": size}
+    except ImportError:
+        pass
+    for level in response_format.VERBOSITY_LEVELS:
+        us, size = _time(lambda: response_format.dumps(response_format.shape(result, level)), args.repeat)
+        report["runs"][level] = {"us": us, "bytes": size}
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# backend/benchmarks/bench_semantic.py
+# Institute-name matching: the fuzzy path (InstituteIndex, token_set_ratio) vs
+# the embedding path (semantic_index.SemanticEngine) vs the combined rule
+# find_in_trusted applies (fuzzy, rescued by embeddings below 75).
+# Queries are registry names rewritten the way uploads spell them: one-character
+# typos, reordered tokens, expanded / abbreviated acronyms, a "campus" suffix.
+# Held-out institutes (removed from the index) measure false accepts.
+# Latency: single lookups, and --threads concurrent lookups with micro-batching
+# on vs off (SEMANTIC_BATCH_MAX=1).
+# Run from backend/:  python benchmarks/bench_semantic.py [--queries 400] [--threads 16] [--out semantic.json]
+import argparse, json, random, re, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import semantic_index  # noqa: E402
+from trusted_index import InstituteIndex, normalize_name  # noqa: E402
+from bench_verifier import DEFAULT_CSV  # noqa: E402
+
+ACCEPT = 75
+ACRONYMS = {
+    "IIIT": "Indian Institute of Information Technology",
+    "IIT": "Indian Institute of Technology",
+    "NIT": "National Institute of Technology",
+    "MNNIT": "Motilal Nehru National Institute of Technology",
+    "BIT": "Birla Institute of Technology",
+    "IIM": "Indian Institute of Management",
+}
+_EXPANDED = {v.lower(): k for k, v in ACRONYMS.items()}
+
+
+def variants(name, rnd):
+    out = {}
+    if len(name) > 4:
+        i = rnd.randrange(len(name))
+        out["typo"] = name[:i] + rnd.choice("abcdefghijklmnopqrstuvwxyz") + name[i + 1:]
+    toks = name.split()
+    if len(toks) > 1:
+        out["reorder"] = " ".join(toks[1:] + toks[:1])
+    for short, long in ACRONYMS.items():
+        if re.search(rf"\b{short}\b", name):
+            out["acronym"] = re.sub(rf"\b{short}\b", long, name)
+            break
+    else:
+        for long, short in _EXPANDED.items():
+            if long in name.lower():
+                out["acronym"] = re.sub(re.escape(long), short, name, flags=re.I)
+                break
+    out["campus"] = f"{name} Main Campus"
+    return out
+
+
+def fuzzy_best(index, q):
+    top = index.top_k(q, k=1)
+    return top[0] if top else (None, 0)
+
+
+def embed_best(engine, index, q):
+    top = engine.top_k(q, index, k=1)
+    return top[0] if top else (None, 0.0)
+
+
+def combined(index, engine, q, min_score):
+    i, s = fuzzy_best(index, q)
+    if s < ACCEPT and engine is not None:
+        j, e = embed_best(engine, index, q)
+        if e >= min_score and e > s:
+            return j, e
+    return i, s
+
+
+def _pct(lat):
+    lat = np.array(lat) * 1000
+    return {"p50_ms": round(float(np.percentile(lat, 50)), 3), "p99_ms": round(float(np.percentile(lat, 99)), 3)}
+
+
+def evaluate(fn, queries, held_out):
+    by_kind, lat = {}, []
+    for kind, q, truth in queries:
+        t = time.perf_counter()
+        i, s = fn(q)
+        lat.append(time.perf_counter() - t)
+        k = by_kind.setdefault(kind, {"n": 0, "top1": 0, "accepted_correct": 0})
+        k["n"] += 1
+        k["top1"] += int(i == truth)
+        k["accepted_correct"] += int(i == truth and s >= ACCEPT)
+    false_accepts = sum(int(fn(q)[1] >= ACCEPT) for q in held_out)
+    quality = {kind: {"top1": round(v["top1"] / v["n"], 3), "accepted_correct": round(v["accepted_correct"] / v["n"], 3)}
+               for kind, v in by_kind.items()}
+    return {"quality": quality, "false_accept_rate": round(false_accepts / max(1, len(held_out)), 3), **_pct(lat)}
+
+
+def concurrent(engine, index, queries, threads):
+    """Fresh query texts (no vector cache) looked up from `threads` threads at once."""
+    engine._cache.clear()
+    t = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(lambda q: engine.top_k(q, index, k=1), queries))
+    secs = time.perf_counter() - t
+    return {"qps": round(len(queries) / secs, 1), "batcher": dict(engine.batcher.stats)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(DEFAULT_CSV))
+    ap.add_argument("--queries", type=int, default=400)
+    ap.add_argument("--held-out", type=float, default=0.1)
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--model", default=semantic_index.SEMANTIC_MODEL)
+    ap.add_argument("--min-score", type=float, default=85)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    rnd = random.Random(0)
+
+    names = pd.read_csv(args.csv, usecols=["institute_name"])["institute_name"].dropna().astype(str).unique().tolist()
+    rnd.shuffle(names)
+    n_out = max(1, int(len(names) * args.held_out))
+    held, kept = names[:n_out], names[n_out:]
+    index = InstituteIndex.from_frame(pd.DataFrame({"institute_name": kept}))
+    ids = {n: i for i, n in enumerate(index.names)}
+    queries = []
+    while len(queries) < args.queries:
+        name = rnd.choice(kept)
+        for kind, q in variants(name, rnd).items():
+            queries.append((kind, q, ids[normalize_name(name)]))
+    held_queries = [q for n in held for q in variants(n, rnd).values()]
+
+    report = {"institutes": len(index), "queries": len(queries), "held_out_queries": len(held_queries),
+              "fuzzy": evaluate(lambda q: fuzzy_best(index, q), queries, held_queries)}
+    engine = semantic_index.SemanticEngine.load(args.model, tempfile.mkdtemp())
+    if engine is None:
+        report["embedding"] = None
+        print(json.dumps(report, indent=2))
+        return report
+    t = time.perf_counter()
+    report["build"] = engine.build(index.names, [])
+    report["build"]["wall_s"] = round(time.perf_counter() - t, 2)
+    report["embedding"] = evaluate(lambda q: embed_best(engine, index, q), queries, held_queries)
+    report["combined"] = evaluate(lambda q: combined(index, engine, q, args.min_score), queries, held_queries)
+
+    fresh = [f"{q} {i}" for i, (_, q, _) in enumerate(queries)]
+    report["concurrent_batched"] = concurrent(engine, index, fresh, args.threads)
+    engine.batcher = semantic_index.MicroBatcher(engine.encoder.encode, max_batch=1, wait_ms=0)
+    report["concurrent_unbatched"] = concurrent(engine, index, fresh, args.threads)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# backend/benchmarks/bench_verifier.py
+# End-to-end throughput / latency / memory of the verification pipeline on a
+# synthetic certificate corpus built from rows of the trusted CSV (genuine rows
+# plus tampered variants for every tamper_type in the dataset).
+# Run from backend/:
+#   python benchmarks/bench_verifier.py                                   # all targets, concurrency 1,8
+#   python benchmarks/bench_verifier.py --targets endpoint --concurrency 32 --out after.json
+#   python benchmarks/bench_verifier.py --compare before.json --out after.json
+# HTTP, whois and DNS are replaced by local stubs (--stub-latency-ms), so runs are
+# repeatable offline. Results are JSON; --compare prints ratios against an earlier run.
+import argparse, asyncio, datetime, io, json, os, platform, random, resource, subprocess, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from bench_field_extractor import LAYOUTS  # noqa: E402
+
+DEFAULT_CSV = Path(__file__).resolve().parents[2] / "data" / "NIT_SILCHAR Dataset.csv"
+TAMPER_TYPES = ["marks_changed", "marks_removed", "serial_reused", "metadata_mismatch", "inst_name_changed"]
+NAMES = (["Asha", "Ravi", "Meera", "Arjun", "Neha", "Kiran"], ["Sharma", "Das", "Iyer", "Singh", "Bose"])
+
+
+# ---------- corpus ----------
+def _iso(d):
+    try:
+        return datetime.datetime.strptime(str(d), "%d-%m-%Y").date().isoformat()
+    except ValueError:
+        return str(d) if d == d else None
+
+
+def _font(size):
+    for name in ("DejaVuSans.ttf", "Arial.ttf", "arial.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            pass
+    return ImageFont.load_default()
+
+
+def render_certificate(lines, size=(1240, 1754), quality=92):
+    """Printed-page style JPEG: one field per line, large enough for Tesseract."""
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    font = _font(34)
+    y = 160
+    for line in lines:
+        draw.text((120, y), line, fill=(20, 20, 20), font=font)
+        y += 70
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue(), y
+
+
+def edit_region(jpeg, box, text, quality=95):
+    """Paste new text over part of an already-compressed scan and re-save (leaves an ELA trace)."""
+    img = Image.open(io.BytesIO(jpeg)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle(box, fill="white")
+    draw.text((box[0], box[1]), text, fill=(20, 20, 20), font=_font(34))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def synth_corpus(csv_path, n, tampered_share=0.4, seed=0, images=True):
+    """-> list of {"payload", "tamper_type", "label"}; payloads match what /agent_ai builds."""
+    rnd = random.Random(seed)
+    df = pd.read_csv(csv_path)
+    serials = df["certificate_serial_number"].dropna().astype(str).tolist()
+    items = []
+    for i in range(n):
+        r = {k: (v.item() if isinstance(v, np.generic) else v) for k, v in df.iloc[rnd.randrange(len(df))].items()}
+        tamper = rnd.choice(TAMPER_TYPES) if rnd.random() < tampered_share else None
+        name = f"{rnd.choice(NAMES[0])} {rnd.choice(NAMES[1])}"
+        marks = r.get("marks_percent")
+        marks = round(float(marks), 2) if marks == marks and marks is not None else round(rnd.uniform(55, 95), 2)
+        printed = {"name": name, "institute_name": r["institute_name"], "credential_title": r["credential_title"],
+                   "marks_percent": marks, "certificate_serial_number": r["certificate_serial_number"],
+                   "issuance_date": r["issuance_date"]}
+        meta = {"recipient_name": name, "issuer_name": r["institute_name"], "institute_name": r["institute_name"],
+                "institute_code": None, "certificate_serial_number": r["certificate_serial_number"],
+                "credential_category": r.get("credential_category"), "credential_title": r["credential_title"],
+                "marks_percent": marks, "num_subjects": r.get("num_subjects"),
+                "signed_hash_present": r.get("signed_hash_present"),
+                "accreditation_statement": r.get("accreditation_statement"),
+                "issuance_date": _iso(r.get("issuance_date")), "convocation_date": _iso(r.get("convocation_date"))}
+        if tamper == "serial_reused":
+            meta["certificate_serial_number"] = printed["certificate_serial_number"] = rnd.choice(serials)
+        elif tamper == "metadata_mismatch":
+            meta["recipient_name"] = f"{rnd.choice(NAMES[0])} {rnd.choice(NAMES[1])}"
+            meta["convocation_date"], meta["issuance_date"] = meta["issuance_date"], meta["convocation_date"]
+        elif tamper == "inst_name_changed":
+            printed["institute_name"] = r["institute_name"].replace("Institute", "Instiute") + " Centre"
+        elif tamper == "marks_removed":
+            meta["marks_removed_flag"] = 1
+        layout = LAYOUTS[i % len(LAYOUTS)]
+        if tamper == "marks_removed":
+            layout = [l for l in layout if "{marks_percent}" not in l]
+        lines = [l.format(**printed) for l in layout]
+        meta = {k: (None if isinstance(v, float) and v != v else v) for k, v in meta.items()}
+        payload = {"student_id": r.get("student_id"), "institute_name": r["institute_name"],
+                   "institute_website": r.get("institute_website"), "institute_code": meta["certificate_serial_number"],
+                   "metadata": meta, "image_bytes": None, "historical_stats": None, "local_trusted_csv": None}
+        if images:
+            jpeg, _ = render_certificate(lines)
+            if tamper == "marks_changed":
+                row = next(k for k, l in enumerate(layout) if "{marks_percent}" in l)
+                y = 160 + 70 * row
+                jpeg = edit_region(jpeg, (120, y, 1100, y + 50), layout[row].format(**dict(printed, marks_percent=round(marks + rnd.uniform(8, 20), 2))))
+            payload["image_bytes"] = jpeg
+        else:
+            if tamper == "marks_changed":
+                lines = [l.replace(str(marks), str(round(marks + 12, 2))) for l in lines]
+            meta["raw_text"] = "\n".join(lines)
+        items.append({"payload": payload, "tamper_type": tamper, "label": "tampered" if tamper else "genuine"})
+    return items
+
+
+# ---------- network stubs ----------
+def install_stubs(agent_ai, latency_ms, cache=False):
+    """Swap the live website/whois/MX probes for local stubs with a fixed simulated latency
+    (and, unless cache, no per-domain caching so every call pays it)."""
+    from domain_intel import DomainIntel
+    delay = latency_ms / 1000.0
+
+    def fetch(url, session=None):
+        time.sleep(delay)
+        host = url.split("//")[-1].split("/")[0]
+        return {"ok": True, "status_code": 200, "title": host, "text_snippet": f"<html><title>{host}</title></html>"}
+
+    def whois_fn(domain):
+        time.sleep(delay)
+        return 3650
+
+    def mx_fn(domain):
+        time.sleep(delay)
+        return True
+
+    ttls = None if cache else {"website": 0, "whois": 0, "mx": 0}
+    agent_ai._DOMAIN_INTEL = DomainIntel(fetch=fetch, whois_fn=whois_fn, mx_fn=mx_fn, ttls=ttls,
+                                         negative_ttl=600 if cache else 0, cache_path=None)
+    # in-memory image hash index: runs must not write fingerprints into cache/phash
+    from phash_index import HashIndex
+    agent_ai._PHASH.replace(HashIndex())
+
+
+def disable_result_cache(agent_ai):
+    from result_cache import VerificationCache
+    agent_ai._RESULT_CACHE = VerificationCache(ttls={"credential": 0, "institution": 0})
+
+
+# ---------- measurement ----------
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # ru_maxrss: KiB on Linux, bytes on macOS
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return r if sys.platform == "darwin" else r * 1024
+
+
+class PeakRSS:
+    """Samples resident memory in the background; .peak is the max seen inside the block."""
+
+    def __init__(self, interval=0.01):
+        self.interval, self.peak = interval, 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+        return False
+
+
+def summarize(latencies_s, wall_s, errors, peak_rss, extra=None):
+    lat = np.array(latencies_s) * 1000 if latencies_s else np.array([np.nan])
+    out = {"requests": len(latencies_s), "errors": errors, "wall_s": round(wall_s, 3),
+           "throughput_rps": round(len(latencies_s) / wall_s, 2) if wall_s else None,
+           "mean_ms": round(float(np.nanmean(lat)), 3)}
+    for p in (50, 95, 99):
+        out[f"p{p}_ms"] = round(float(np.nanpercentile(lat, p)), 3)
+    out["peak_rss_mb"] = round(peak_rss / 2 ** 20, 1)
+    out.update(extra or {})
+    return out
+
+
+def detection(results, items):
+    """Verdict counts split by genuine / tamper_type (a sanity check that speedups keep accuracy)."""
+    out = {}
+    for res, item in zip(results, items):
+        if not isinstance(res, dict):
+            continue
+        verdict = (res.get("decision") or {}).get("verdict") or "n/a"
+        bucket = out.setdefault(item["tamper_type"] or "genuine", {})
+        bucket[verdict] = bucket.get(verdict, 0) + 1
+    return out
+
+
+def run_sync(fn, items, concurrency):
+    """fn(item) on a thread pool of `concurrency` workers -> (latencies, results, errors, wall)."""
+    lat, results, errors = [None] * len(items), [None] * len(items), 0
+
+    def one(i):
+        t = time.perf_counter()
+        try:
+            results[i] = fn(items[i])
+            return None
+        except Exception as e:
+            return e
+        finally:
+            lat[i] = time.perf_counter() - t
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        errors = sum(e is not None for e in ex.map(one, range(len(items))))
+    return lat, results, errors, time.perf_counter() - t0
+
+
+async def _run_endpoint(app, items, concurrency):
+    import httpx
+    sem = asyncio.Semaphore(concurrency)
+    lat, results = [None] * len(items), [None] * len(items)
+
+    async def one(client, i):
+        p = items[i]["payload"]
+        data = {"student_id": str(p["student_id"]), "institute_name": p["institute_name"],
+                "metadata_json": json.dumps(p["metadata"])}
+        if p.get("institute_website"):
+            data["institute_website"] = p["institute_website"]
+        files = {"file": ("cert.jpg", p["image_bytes"], "image/jpeg")} if p.get("image_bytes") else None
+        async with sem:
+            t = time.perf_counter()
+            r = await client.post("/agent_ai", data=data, files=files)
+            lat[i] = time.perf_counter() - t
+        body = r.json()
+        results[i] = body
+        return r.status_code != 200 or "error" in body
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        t0 = time.perf_counter()
+        errs = await asyncio.gather(*(one(client, i) for i in range(len(items))))
+        wall = time.perf_counter() - t0
+    return lat, results, sum(errs), wall
+
+
+def bench_target(target, items, concurrency, agent_ai):
+    with PeakRSS() as rss:
+        if target == "credential_verifier":
+            lat, results, errors, wall = run_sync(
+                lambda it: agent_ai.credential_verifier(it["payload"]["metadata"], it["payload"]["image_bytes"]),
+                items, concurrency)
+            extra = {}
+        elif target == "institution_authenticator":
+            lat, results, errors, wall = run_sync(
+                lambda it: agent_ai.institution_authenticator(it["payload"]["institute_name"],
+                                                              it["payload"]["institute_website"],
+                                                              it["payload"]["institute_code"]),
+                items, concurrency)
+            extra = {}
+        elif target == "endpoint":
+            import app as app_module
+            lat, results, errors, wall = asyncio.run(_run_endpoint(app_module.app, items, concurrency))
+            extra = {"verdicts": detection(results, items)}
+        else:
+            raise ValueError(f"unknown target {target}")
+    return summarize([x for x in lat if x is not None], wall, errors, rss.peak, extra)
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline):
+    """{target: {concurrency: {metric: new/old}}} for the latency, throughput and RSS numbers."""
+    out = {}
+    for target, runs in report["results"].items():
+        for conc, cur in runs.items():
+            old = baseline.get("results", {}).get(target, {}).get(conc)
+            if not old:
+                continue
+            out.setdefault(target, {})[conc] = {
+                k: round(cur[k] / old[k], 3) for k in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+                if cur.get(k) and old.get(k)}
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(DEFAULT_CSV))
+    ap.add_argument("--items", type=int, default=200)
+    ap.add_argument("--tampered-share", type=float, default=0.4)
+    ap.add_argument("--targets", default="credential_verifier,institution_authenticator,endpoint")
+    ap.add_argument("--concurrency", default="1,8", help="comma-separated levels")
+    ap.add_argument("--text-only", action="store_true", help="send OCR text in metadata instead of rendered images")
+    ap.add_argument("--stub-latency-ms", type=float, default=50.0, help="simulated website/whois/MX latency")
+    ap.add_argument("--cache", action="store_true", help="keep the evidence and domain caches on (default: every call computes)")
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--compare", default=None, help="earlier --out JSON to compare against")
+    args = ap.parse_args()
+
+    import agent_ai
+    import startup
+    install_stubs(agent_ai, args.stub_latency_ms, args.cache)
+    if not args.cache:
+        disable_result_cache(agent_ai)
+    t = time.perf_counter(); startup.warm_up(); warm_s = time.perf_counter() - t
+
+    items = synth_corpus(args.csv, args.items, args.tampered_share, args.seed, images=not args.text_only)
+    report = {"meta": {"git": _git_rev(), "python": platform.python_version(), "cpus": os.cpu_count(),
+                       "started": datetime.datetime.now().isoformat(timespec="seconds"), "warm_up_s": round(warm_s, 3),
+                       "corpus": {"items": len(items), "images": not args.text_only,
+                                  "tamper_types": {k or "genuine": sum(1 for it in items if it["tamper_type"] == k)
+                                                   for k in [None] + TAMPER_TYPES}},
+                       "args": vars(args)},
+              "results": {}}
+    for target in [x.strip() for x in args.targets.split(",") if x.strip()]:
+        try:
+            bench_target(target, items[: args.warmup], 1, agent_ai)
+        except Exception as e:
+            report["results"][target] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        for conc in [int(c) for c in args.concurrency.split(",")]:
+            entry = bench_target(target, items, conc, agent_ai)
+            report["results"].setdefault(target, {})[str(conc)] = entry
+            print(json.dumps({"target": target, "concurrency": conc, **{k: v for k, v in entry.items() if k != "verdicts"}}),
+                  file=sys.stderr)
+    if args.compare:
+        report["compare"] = compare(report, json.loads(Path(args.compare).read_text()))
+    text = json.dumps(report, indent=2, default=str)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# backend/columnar_store.py
+# Typed, columnar on-disk copy of the trusted CSV.
+#
+# Two formats:
+#   *.parquet   Parquet with dictionary-encoded categoricals (needs pyarrow)
+#   *.cols      NumPy bundle directory: manifest.json plus raw files per column
+#               (c<id>.*, ids in the manifest)
+#                 numeric   -> .bin, memory-mapped on load
+#                 category  -> .codes (int32, -1 = missing) + categories in the manifest
+#                 string    -> .offsets (int64) + .data (utf-8) + .null
+# Conversion streams the CSV in chunks and load() reads only the requested
+# columns, so neither conversion nor startup has to hold a full object-dtype
+# parse of the registry. Column kinds are fixed by the first rows; a later
+# non-numeric value in a numeric column restarts the conversion with that
+# column stored as text instead of being coerced to NaN.
+#
+#   python columnar_store.py convert --csv data.csv --out cache/trusted.cols
+import os, json, shutil, argparse
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = int(os.environ.get("COLUMNAR_CHUNK_ROWS", 200_000))
+FORMAT = os.environ.get("TRUSTED_STORE_FORMAT", "auto")   # auto | parquet | npy
+# Always stored as categories; other text columns become categories when
+# their first chunk is repetitive enough.
+CATEGORICAL_COLUMNS = ("institute_type", "institute_name", "institute_website", "accreditation_statement",
+                       "credential_category", "credential_title", "label", "tamper_type")
+CATEGORY_RATIO = 0.05
+
+_MANIFEST = "manifest.json"
+
+
+def _have_pyarrow() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_format(fmt: Optional[str] = None) -> str:
+    fmt = (fmt or FORMAT).lower()
+    if fmt == "auto":
+        return "parquet" if _have_pyarrow() else "npy"
+    return fmt
+
+
+def store_path(base: str, fmt: Optional[str] = None) -> str:
+    """base path without extension -> the path the chosen format uses."""
+    return base + ".parquet" if resolve_format(fmt) == "parquet" else base + ".cols"
+
+
+class _TextInNumericColumn(ValueError):
+    """A chunk has text in a column the first rows typed as numeric."""
+
+    def __init__(self, column: str, value: Any):
+        super().__init__(f"column {column!r} was typed numeric but holds {value!r}")
+        self.column = column
+
+
+def _check_numeric(col: str, s: pd.Series, values: np.ndarray):
+    """values = pd.to_numeric(s, errors="coerce"); raise if a non-null value became NaN."""
+    coerced = pd.isna(values) & s.notna().to_numpy()
+    if coerced.any():
+        raise _TextInNumericColumn(col, s.to_numpy()[coerced.argmax()])
+
+
+# ---------------------------
+# NumPy bundle
+# ---------------------------
+def _kind(series: pd.Series, name: str) -> str:
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return "numeric"
+    if name in CATEGORICAL_COLUMNS:
+        return "category"
+    n = int(series.notna().sum())
+    return "category" if n and series.nunique() <= max(1, CATEGORY_RATIO * n) else "string"
+
+
+class _BundleWriter:
+    def __init__(self, out_dir: str):
+        self.dir = out_dir
+        self.rows = 0
+        self.columns: Dict[str, Dict[str, Any]] = {}
+        self._cat_ids: Dict[str, Dict[str, int]] = {}
+        self._str_pos: Dict[str, int] = {}
+        os.makedirs(out_dir)
+
+    def append(self, chunk: pd.DataFrame):
+        for col in chunk.columns:
+            s = chunk[col]
+            meta = self.columns.get(col)
+            if meta is None:
+                meta = {"id": len(self.columns), "kind": _kind(s, col)}
+                self.columns[col] = meta
+                if meta["kind"] == "numeric":
+                    meta["dtype"] = s.dtype.str if s.dtype != bool else "|b1"
+                elif meta["kind"] == "category":
+                    self._cat_ids[col] = {}
+                else:
+                    self._str_pos[col] = 0
+                    with open(self._path(col, "offsets"), "wb") as f:
+                        np.zeros(1, dtype=np.int64).tofile(f)
+            getattr(self, "_append_" + meta["kind"])(col, meta, s)
+        self.rows += len(chunk)
+
+    def _path(self, col: str, ext: str) -> str:
+        return os.path.join(self.dir, f"c{self.columns[col]['id']}.{ext}")
+
+    def _append_numeric(self, col, meta, s):
+        values = pd.to_numeric(s, errors="coerce").to_numpy()
+        _check_numeric(col, s, values)
+        dtype = np.dtype(meta["dtype"])
+        if not np.can_cast(values.dtype, dtype, casting="same_kind"):
+            # an int column met a NaN/float in a later chunk: rewrite what we have as float64
+            self._promote(col, meta, np.dtype(np.float64))
+            dtype = np.dtype(np.float64)
+        with open(self._path(col, "bin"), "ab") as f:
+            values.astype(dtype).tofile(f)
+
+    def _promote(self, col, meta, dtype):
+        path = self._path(col, "bin")
+        old = np.fromfile(path, dtype=np.dtype(meta["dtype"])) if os.path.exists(path) else np.empty(0)
+        old.astype(dtype).tofile(path)
+        meta["dtype"] = dtype.str
+
+    def _append_category(self, col, meta, s):
+        ids = self._cat_ids[col]
+        codes = np.fromiter((-1 if v is None or v != v else ids.setdefault(str(v), len(ids)) for v in s.to_numpy(dtype=object)),
+                            dtype=np.int32, count=len(s))
+        with open(self._path(col, "codes"), "ab") as f:
+            codes.tofile(f)
+
+    def _append_string(self, col, meta, s):
+        vals = s.to_numpy(dtype=object)
+        null = pd.isna(vals)
+        enc = [b"" if m else str(v).encode("utf-8") for v, m in zip(vals, null)]
+        lengths = np.fromiter((len(b) for b in enc), dtype=np.int64, count=len(enc))
+        offsets = self._str_pos[col] + np.cumsum(lengths)
+        self._str_pos[col] = int(offsets[-1]) if len(offsets) else self._str_pos[col]
+        with open(self._path(col, "data"), "ab") as f:
+            f.write(b"".join(enc))
+        with open(self._path(col, "offsets"), "ab") as f:
+            offsets.astype(np.int64).tofile(f)
+        with open(self._path(col, "null"), "ab") as f:
+            null.astype(np.bool_).tofile(f)
+
+    def close(self, source: Dict[str, Any]):
+        for col, ids in self._cat_ids.items():
+            self.columns[col]["categories"] = list(ids)
+        manifest = {"format": "npy", "version": 1, "rows": self.rows, "source": source, "columns": self.columns}
+        with open(os.path.join(self.dir, _MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        return manifest
+
+
+def _memmap(path: str, dtype, count: int) -> np.ndarray:
+    if count == 0 or not os.path.exists(path):
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def _load_bundle(path: str, columns: Optional[Iterable[str]]) -> pd.DataFrame:
+    with open(os.path.join(path, _MANIFEST)) as f:
+        manifest = json.load(f)
+    n, cols = manifest["rows"], manifest["columns"]
+    out = {}
+    for col in (list(columns) if columns is not None else list(cols)):
+        meta = cols.get(col)
+        if meta is None:
+            continue
+        base = os.path.join(path, f"c{meta['id']}")
+        if meta["kind"] == "numeric":
+            out[col] = pd.Series(_memmap(base + ".bin", np.dtype(meta["dtype"]), n), copy=False)
+        elif meta["kind"] == "category":
+            codes = _memmap(base + ".codes", np.int32, n)
+            out[col] = pd.Series(pd.Categorical.from_codes(codes, categories=meta["categories"]))
+        else:
+            offs = _memmap(base + ".offsets", np.int64, n + 1)
+            null = _memmap(base + ".null", np.bool_, n)
+            raw = np.fromfile(base + ".data", dtype=np.uint8).tobytes() if n else b""
+            bounds = offs.tolist()
+            vals = [None if m else raw[a:b].decode("utf-8") for a, b, m in zip(bounds[:-1], bounds[1:], null.tolist())]
+            out[col] = pd.Series(vals, dtype=object)
+    return pd.DataFrame(out, copy=False)
+
+
+# ---------------------------
+# Parquet (optional: pyarrow)
+# ---------------------------
+def _convert_parquet(csv_path: str, out_path: str, chunk_rows: int, dtypes: Dict[str, Any]):
+    import pyarrow as pa, pyarrow.parquet as pq
+    writer, schema = None, None
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype=dtypes):
+            for c in chunk.columns:
+                if c not in dtypes and not pd.api.types.is_numeric_dtype(chunk[c]) \
+                        and not pd.api.types.is_bool_dtype(chunk[c]):
+                    _check_numeric(c, chunk[c], pd.to_numeric(chunk[c], errors="coerce").to_numpy())
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                dict_cols = [c for c in chunk.columns if _kind(chunk[c], c) == "category"]
+                writer = pq.ParquetWriter(out_path, schema, use_dictionary=dict_cols or False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _load_parquet(path: str, columns: Optional[Iterable[str]]) -> pd.DataFrame:
+    import pyarrow.parquet as pq
+    pf = pq.ParquetFile(path, memory_map=True)
+    names = pf.schema_arrow.names
+    cols = [c for c in columns if c in names] if columns is not None else names
+    dict_cols = [c for c in cols if c in CATEGORICAL_COLUMNS]
+    table = pq.read_table(path, columns=cols, memory_map=True, read_dictionary=dict_cols)
+    return table.to_pandas()
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+def _text_dtypes(csv_path: str) -> Dict[str, Any]:
+    """Pin text columns (per the first rows) to str so a later all-digit chunk isn't read as numbers."""
+    head = pd.read_csv(csv_path, nrows=min(CHUNK_ROWS, 10_000))
+    return {c: str for c in head.columns if not pd.api.types.is_numeric_dtype(head[c])
+            and not pd.api.types.is_bool_dtype(head[c])}
+
+
+def convert(csv_path: str, out_path: str, chunk_rows: int = CHUNK_ROWS) -> str:
+    """CSV -> columnar store at out_path (.parquet file or bundle directory). Atomic replace."""
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp, ignore_errors=True)
+    st = os.stat(csv_path)
+    source = {"csv": os.path.abspath(csv_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    dtypes = _text_dtypes(csv_path)
+    while True:
+        try:
+            if out_path.endswith(".parquet"):
+                _convert_parquet(csv_path, tmp, chunk_rows, dtypes)
+            else:
+                w = _BundleWriter(tmp)
+                for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype=dtypes):
+                    w.append(chunk)
+                w.close(source)
+            break
+        except _TextInNumericColumn as e:
+            # at most one restart per column: each one pins another column to text
+            print("columnar_store:", e, "- storing it as text")
+            dtypes[e.column] = str
+            if os.path.isdir(tmp):
+                shutil.rmtree(tmp)
+            elif os.path.exists(tmp):
+                os.remove(tmp)
+    if os.path.isdir(out_path):
+        shutil.rmtree(out_path)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def load(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Only the requested columns are read (missing ones are skipped)."""
+    if path.endswith(".parquet"):
+        return _load_parquet(path, columns)
+    return _load_bundle(path, columns)
+
+
+def available_columns(path: str) -> List[str]:
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).schema_arrow.names
+    with open(os.path.join(path, _MANIFEST)) as f:
+        return list(json.load(f)["columns"])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Convert the trusted CSV to a columnar store")
+    ap.add_argument("command", choices=["convert", "info"])
+    ap.add_argument("--csv", help="source CSV (convert)")
+    ap.add_argument("--out", required=True, help="output base path; .parquet or .cols is added per format")
+    ap.add_argument("--format", default=None, choices=["auto", "parquet", "npy"])
+    args = ap.parse_args()
+    out = args.out if args.out.endswith((".parquet", ".cols")) else store_path(args.out, args.format)
+    if args.command == "convert":
+        print("wrote", convert(args.csv, out))
+    df = load(out)
+    print(len(df), "rows"); print(df.dtypes.to_string())
@@ -0,0 +1,265 @@
+# backend/compact_forest.py
+# Array-backed serving format for the two forests (RandomForestClassifier,
+# IsolationForest). A model is a directory of .npy files, so every uvicorn
+# worker np.load(mmap_mode="r")s the same pages instead of unpickling its own copy:
+#   <model>.forest/meta.json    kind, n_trees, class/offset constants, source fingerprint
+#   offsets.npy   int64 [n_trees]       first node of each tree
+#   feature.npy   int16 [n_nodes]       split feature (-1 at leaves)
+#   threshold.npy float32|float16       go left when x <= threshold
+#   left/right.npy int16|int32          child index within the tree (-1 at leaves)
+#   value.npy     float32|float16       leaf output: P(tampered) or isolation path length
+# float32 thresholds are rounded down from sklearn's float64 ones, which gives
+# the same decisions as sklearn (it compares float32 inputs); float16 and fewer
+# trees trade accuracy for size, and export() reports the measured loss.
+#   python compact_forest.py export [--threshold-dtype float16] [--max-loss 0.005]
+import os, json, hashlib, argparse
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+SUFFIX = ".forest"
+ARRAYS = ("offsets", "feature", "threshold", "left", "right", "value")
+
+
+def file_sha256(path) -> Optional[str]:
+    if not path or not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _average_path_length(n) -> np.ndarray:
+    """Expected path length of an unsuccessful BST search over n points (as in sklearn's IsolationForest)."""
+    n = np.asarray(n, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+def _round_down(thr: np.ndarray, dtype) -> np.ndarray:
+    """Largest value of `dtype` <= thr, so float32 x <= t matches sklearn's x <= thr64."""
+    t = thr.astype(dtype)
+    over = t.astype(np.float64) > thr
+    t[over] = np.nextafter(t[over], np.array(-np.inf, dtype=dtype))
+    return t
+
+
+def _node_depths(left, right) -> np.ndarray:
+    depth = np.zeros(len(left), dtype=np.int32)
+    for node in range(len(left)):      # sklearn numbers parents before children
+        if left[node] >= 0:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+    return depth
+
+
+def _tree_arrays(est, kind, features_map=None, class_index=1):
+    t = est.tree_
+    left, right = t.children_left.astype(np.int64), t.children_right.astype(np.int64)
+    leaf = left < 0
+    feature = t.feature.astype(np.int64)
+    if features_map is not None:        # bagged estimators see a column subset/permutation
+        feature = np.where(leaf, -1, np.asarray(features_map)[np.maximum(feature, 0)])
+    feature[leaf] = -1
+    if kind == "classifier":
+        v = t.value[:, 0, :].astype(np.float64)
+        value = v[:, class_index] / np.maximum(v.sum(axis=1), 1e-12)
+    else:
+        value = _node_depths(left, right) + _average_path_length(t.n_node_samples)
+    value[~leaf] = 0.0
+    return feature, t.threshold.astype(np.float64), left, right, value
+
+
+class CompactForest:
+    """Forest inference over flat node arrays; mirrors the sklearn methods score_features uses."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self.meta = meta
+        self.kind = meta["kind"]
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.n_trees = int(len(self.offsets))
+        self.classes_ = np.array(meta.get("classes", [0, 1]))
+        self.n_features_in_ = int(meta["n_features"])
+
+    # ---- building ----
+    @classmethod
+    def from_sklearn(cls, model, threshold_dtype="float32", value_dtype="float32", n_trees=None):
+        from sklearn.ensemble import IsolationForest
+        kind = "anomaly" if isinstance(model, IsolationForest) else "classifier"
+        ests = list(model.estimators_)[: n_trees or None]
+        fmaps = [None] * len(ests)
+        if kind == "anomaly" and getattr(model, "_max_features", model.n_features_in_) != model.n_features_in_:
+            fmaps = list(model.estimators_features_)[: len(ests)]
+        classes = [c.item() if hasattr(c, "item") else c for c in getattr(model, "classes_", [0, 1])]
+        class_index = classes.index(1) if 1 in classes else len(classes) - 1
+        parts = [_tree_arrays(e, kind, fm, class_index) for e, fm in zip(ests, fmaps)]
+        sizes = np.array([len(p[0]) for p in parts], dtype=np.int64)
+        child_dtype = np.int16 if sizes.max() < np.iinfo(np.int16).max else np.int32
+        arrays = {
+            "offsets": np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64),
+            "feature": np.concatenate([p[0] for p in parts]).astype(np.int16),
+            "threshold": _round_down(np.concatenate([p[1] for p in parts]), np.dtype(threshold_dtype)),
+            "left": np.concatenate([p[2] for p in parts]).astype(child_dtype),
+            "right": np.concatenate([p[3] for p in parts]).astype(child_dtype),
+            "value": np.concatenate([p[4] for p in parts]).astype(value_dtype),
+        }
+        meta = {"kind": kind, "n_trees": len(ests), "n_trees_source": len(model.estimators_),
+                "n_features": int(model.n_features_in_), "classes": classes,
+                "threshold_dtype": str(np.dtype(threshold_dtype)), "value_dtype": str(np.dtype(value_dtype))}
+        if kind == "anomaly":
+            meta["offset"] = float(model.offset_)
+            meta["path_norm"] = float(_average_path_length([model.max_samples_])[0])
+        return cls(arrays, meta)
+
+    # ---- storage ----
+    def save(self, path, source: Optional[str] = None):
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        meta = dict(self.meta, source_sha256=file_sha256(source) if source else self.meta.get("source_sha256"))
+        (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+        if path.exists():
+            for f in path.iterdir():
+                f.unlink()
+            path.rmdir()
+        os.replace(tmp, path)
+        self.meta = meta
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "CompactForest":
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        arrays = {n: np.load(path / f"{n}.npy", mmap_mode="r" if mmap else None) for n in ARRAYS}
+        return cls(arrays, meta)
+
+    def nbytes(self) -> int:
+        return int(sum(getattr(self, n).nbytes for n in ARRAYS))
+
+    # ---- inference ----
+    def _leaf_values(self, X) -> np.ndarray:
+        """-> float64 [n_rows, n_trees] leaf outputs; all trees advance one level per step."""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        offsets = np.asarray(self.offsets)
+        feature, threshold, left, right = self.feature, self.threshold, self.left, self.right
+        node = np.broadcast_to(offsets, (len(X), self.n_trees)).copy()
+        rows = np.arange(len(X))[:, None]
+        active = np.ones(node.shape, dtype=bool)
+        while True:
+            l = np.asarray(left[node])
+            active &= l >= 0
+            if not active.any():
+                break
+            f = np.asarray(feature[node]).astype(np.int64)
+            go_left = X[rows, np.maximum(f, 0)] <= np.asarray(threshold[node])
+            child = np.where(go_left, l, np.asarray(right[node]))
+            node = np.where(active, offsets + child, node)
+        return np.asarray(self.value[node], dtype=np.float64)
+
+    def predict_proba(self, X) -> np.ndarray:
+        p1 = self._leaf_values(X).mean(axis=1)
+        i1 = list(self.classes_).index(1) if 1 in list(self.classes_) else len(self.classes_) - 1
+        out = np.empty((len(p1), len(self.classes_)))
+        out[:, i1] = p1
+        if len(self.classes_) == 2:
+            out[:, 1 - i1] = 1.0 - p1
+        return out
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def score_samples(self, X) -> np.ndarray:
+        depths = self._leaf_values(X).mean(axis=1)
+        return -(2.0 ** (-depths / self.meta["path_norm"]))
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.score_samples(X) - self.meta["offset"]
+
+
+def compact_path(joblib_path) -> Path:
+    p = Path(joblib_path)
+    return p.with_name(p.stem + SUFFIX)
+
+
+def load_for(joblib_path, mmap: bool = True) -> Optional[CompactForest]:
+    """The compact export next to a joblib artifact, if it exists and was built from that exact file."""
+    cp = compact_path(joblib_path)
+    if not (cp / "meta.json").exists():
+        return None
+    forest = CompactForest.load(cp, mmap=mmap)
+    src = forest.meta.get("source_sha256")
+    if os.path.exists(joblib_path) and src != file_sha256(joblib_path):
+        print("compact model", cp, "is stale (built from a different", Path(joblib_path).name + "); ignoring it")
+        return None
+    return forest
+
+
+# ---------- export ----------
+def _agreement(kind, ref, cand, X, y=None) -> Dict[str, float]:
+    if kind == "classifier":
+        a, b = ref.predict_proba(X)[:, 1], cand.predict_proba(X)[:, 1]
+        out = {"label_agreement": float(np.mean((a >= 0.5) == (b >= 0.5))), "max_abs_diff": float(np.max(np.abs(a - b)))}
+        if y is not None:
+            out["accuracy"] = float(np.mean((b >= 0.5) == (y == 1)))
+        return out
+    a, b = ref.decision_function(X), cand.decision_function(X)
+    return {"label_agreement": float(np.mean((a < 0) == (b < 0))), "max_abs_diff": float(np.max(np.abs(a - b)))}
+
+
+def export(model, joblib_path, X, y=None, threshold_dtype="float32", value_dtype="float32",
+           max_loss: float = 0.0, min_trees: int = 10, step: int = 10) -> Dict[str, Any]:
+    """
+    Write <joblib_path stem>.forest. With max_loss > 0 keep the smallest prefix of
+    trees whose label agreement with the full sklearn model on X stays >= 1 - max_loss.
+    """
+    kind = "anomaly" if hasattr(model, "offset_") else "classifier"
+    full = len(model.estimators_)
+    n_trees = full
+    if max_loss > 0:
+        for k in list(range(min(min_trees, full), full, step)) + [full]:
+            cand = CompactForest.from_sklearn(model, threshold_dtype, value_dtype, n_trees=k)
+            if _agreement(kind, model, cand, X)["label_agreement"] >= 1.0 - max_loss:
+                n_trees = k
+                break
+    forest = CompactForest.from_sklearn(model, threshold_dtype, value_dtype, n_trees=n_trees)
+    forest.save(compact_path(joblib_path), source=joblib_path)
+    report = {"path": str(compact_path(joblib_path)), "kind": kind, "trees": n_trees, "trees_source": full,
+              "bytes": forest.nbytes(), "joblib_bytes": os.path.getsize(joblib_path)}
+    report.update(_agreement(kind, model, forest, X, y if kind == "classifier" else None))
+    return report
+
+
+def main():
+    import joblib
+    import train_agent
+    ap = argparse.ArgumentParser(description="Export the served joblib forests to the compact mmap format.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export")
+    p.add_argument("--model-dir", default=str(train_agent.OUT_DIR))
+    p.add_argument("--csv", default=None, help="rows to measure agreement / accuracy on (default: training CSV)")
+    p.add_argument("--threshold-dtype", default="float32", choices=["float32", "float16"])
+    p.add_argument("--value-dtype", default="float32", choices=["float32", "float16"])
+    p.add_argument("--max-loss", type=float, default=0.0, help="allowed label disagreement when dropping trees")
+    args = ap.parse_args()
+
+    csv_path = args.csv or train_agent.default_csv()
+    X, y, _ = train_agent.load_features(csv_path)
+    reports = []
+    for name in (train_agent.CLASSIFIER_NAME, train_agent.ANOMALY_NAME):
+        path = Path(args.model_dir) / name
+        if not path.exists():
+            print("skip:", path, "not found")
+            continue
+        reports.append(export(joblib.load(path), str(path), X, y, args.threshold_dtype, args.value_dtype, args.max_loss))
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
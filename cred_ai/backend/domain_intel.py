@@ -0,0 +1,223 @@
+# backend/domain_intel.py
+# Per-domain cache for the website / whois / MX probes used by
+# institution_authenticator. The same few hundred institute domains repeat on
+# every request, so results are kept with per-probe TTLs (short TTLs for
+# failures) and the three probes for a domain run concurrently over a shared,
+# pooled HTTP session. The cache is an LRU of at most DOMAIN_CACHE_MAX entries;
+# expired entries are dropped before anything live is evicted.
+#
+# Warm-up (pre-populate from every institute_website in the trusted CSV):
+#   python domain_intel.py warm [--csv path] [--out cache/domain_cache.json]
+# The server loads the same file (DOMAIN_CACHE_PATH; "" disables it) at import.
+import os, json, time, threading, argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TTLS = {
+    "website": int(os.environ.get("DOMAIN_TTL_WEBSITE", 6 * 3600)),
+    "whois": int(os.environ.get("DOMAIN_TTL_WHOIS", 7 * 24 * 3600)),
+    "mx": int(os.environ.get("DOMAIN_TTL_MX", 24 * 3600)),
+}
+NEGATIVE_TTL = int(os.environ.get("DOMAIN_TTL_NEGATIVE", 600))
+DOMAIN_CACHE_PATH = os.environ.get("DOMAIN_CACHE_PATH", "cache/domain_cache.json") or None
+DOMAIN_CACHE_MAX = int(os.environ.get("DOMAIN_CACHE_MAX", 20000))     # (probe, key) entries
+
+
+def normalize_url(url: str) -> str:
+    url = str(url).strip()
+    if not url.startswith("http"):
+        url = "http://" + url
+    return url
+
+
+def domain_of(url: str) -> str:
+    domain = urlparse(normalize_url(url)).netloc or str(url)
+    domain = domain.split(":")[0].lower()
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain
+
+
+def _url_key(url: str) -> str:
+    p = urlparse(normalize_url(url))
+    return (p.netloc.lower() + p.path).rstrip("/")
+
+
+def _is_failure(probe: str, value) -> bool:
+    if probe == "website":
+        return not (isinstance(value, dict) and value.get("ok"))
+    if probe == "whois":
+        return value is None
+    return not value
+
+
+class DomainIntel:
+    """
+    probes: callables fetch(url, session) -> dict, whois_fn(domain) -> days|None,
+    mx_fn(domain) -> bool. Injectable so tests can use local stubs.
+    """
+
+    def __init__(self, fetch: Callable, whois_fn: Callable, mx_fn: Callable,
+                 ttls: Optional[Dict[str, int]] = None, negative_ttl: int = NEGATIVE_TTL,
+                 max_workers: int = 16, pool_size: int = 32, max_entries: int = DOMAIN_CACHE_MAX,
+                 cache_path: Optional[str] = DOMAIN_CACHE_PATH):
+        self.probes = {"website": fetch, "whois": whois_fn, "mx": mx_fn}
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.negative_ttl = negative_ttl
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="domain-intel")
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()    # (probe, key) -> (value, expires_at), LRU first
+        self._inflight: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        if cache_path and os.path.exists(cache_path):
+            self.load(cache_path)
+
+    # ---- cache primitives ----
+    def _get(self, ck):
+        with self._lock:
+            item = self._cache.get(ck)
+            if item is not None and item[1] > time.time():
+                self._cache.move_to_end(ck)
+                self.stats["hits"] += 1
+                return True, item[0]
+            self.stats["misses"] += 1
+            return False, None
+
+    def _put(self, ck, value, expires_at: float):
+        """Insert under self._lock; over max_entries, expired entries go first, then the least recently used."""
+        self._cache[ck] = (value, expires_at)
+        self._cache.move_to_end(ck)
+        if len(self._cache) <= self.max_entries:
+            return
+        now = time.time()
+        for k in [k for k, (_, exp) in self._cache.items() if exp <= now]:
+            del self._cache[k]
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _run(self, ck, arg):
+        probe = ck[0]
+        try:
+            value = self.probes[probe](arg, self.session) if probe == "website" else self.probes[probe](arg)
+        except Exception as e:
+            value = {"ok": False, "error": str(e)} if probe == "website" else (None if probe == "whois" else False)
+        ttl = self.negative_ttl if _is_failure(probe, value) else self.ttls[probe]
+        with self._lock:
+            self._put(ck, value, time.time() + ttl)
+            self._inflight.pop(ck, None)
+        return value
+
+    def _submit(self, ck, arg) -> Future:
+        """Single-flight: concurrent requests for the same key share one probe."""
+        with self._lock:
+            fut = self._inflight.get(ck)
+            item = self._cache.get(ck)
+            if fut is None and item is not None and item[1] > time.time():
+                # the probe finished between this caller's cache miss and now
+                fut = Future()
+                fut.set_result(item[0])
+            elif fut is None:
+                fut = self._executor.submit(self._run, ck, arg)
+                self._inflight[ck] = fut
+            return fut
+
+    # ---- public API ----
+    def probe(self, url: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """-> {"domain", "website", "whois_age_days", "mx_ok", "cache": {probe: hit}}"""
+        domain = domain_of(url)
+        jobs = {"website": (("website", _url_key(url)), normalize_url(url)),
+                "whois": (("whois", domain), domain),
+                "mx": (("mx", domain), domain)}
+        out: Dict[str, Any] = {"domain": domain, "cache": {}}
+        pending = {}
+        for name, (ck, arg) in jobs.items():
+            hit, value = self._get(ck)
+            out["cache"][name] = hit
+            if hit:
+                out[name] = value
+            else:
+                pending[name] = self._submit(ck, arg)
+        for name, fut in pending.items():
+            try:
+                out[name] = fut.result(timeout=timeout)
+            except Exception as e:
+                out[name] = {"ok": False, "error": str(e)} if name == "website" else None
+        website = out.pop("website")
+        out["website"] = dict(website) if isinstance(website, dict) else {"ok": False}
+        out["whois_age_days"] = out.pop("whois")
+        out["mx_ok"] = bool(out.pop("mx"))
+        return out
+
+    def warm_up(self, urls: Iterable[str], save: bool = True) -> Dict[str, Any]:
+        urls = sorted({str(u).strip() for u in urls if u and str(u).strip() and str(u) != "nan"})
+        t0 = time.time()
+        ok = 0
+        # outer calls get their own pool: probe() itself blocks on self._executor
+        with ThreadPoolExecutor(max_workers=self.max_workers) as outer:
+            for res in outer.map(self.probe, urls):
+                ok += int(bool(res["website"].get("ok")))
+        if save and self.cache_path:
+            self.save(self.cache_path)
+        return {"urls": len(urls), "website_ok": ok, "seconds": round(time.time() - t0, 2)}
+
+    def websites(self) -> List[Dict[str, Any]]:
+        """Unexpired successful page probes (title, snippet) currently in the cache."""
+        now = time.time()
+        with self._lock:
+            return [v for (probe, _), (v, exp) in self._cache.items()
+                    if probe == "website" and exp > now and isinstance(v, dict) and v.get("ok")]
+
+    def save(self, path: str):
+        now = time.time()
+        with self._lock:
+            rows = [[k[0], k[1], v, exp] for k, (v, exp) in self._cache.items() if exp > now]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(rows, f)
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        try:
+            with open(path) as f:
+                rows = json.load(f)
+        except Exception as e:
+            print("domain_intel: could not load cache:", e)
+            return
+        now = time.time()
+        with self._lock:
+            for probe, key, value, exp in rows:
+                if exp > now:
+                    self._put((probe, key), value, exp)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Domain-intelligence cache tools")
+    ap.add_argument("command", choices=["warm"])
+    ap.add_argument("--csv", default=None, help="trusted CSV (defaults to the one agent_ai loads)")
+    ap.add_argument("--out", default=DOMAIN_CACHE_PATH or "cache/domain_cache.json")
+    args = ap.parse_args()
+
+    import pandas as pd
+    import agent_ai
+    csv_path = args.csv or agent_ai.LOCAL_TRUSTED_CSV
+    if not csv_path:
+        raise SystemExit("no trusted CSV found; pass --csv")
+    sites = pd.read_csv(csv_path, usecols=["institute_website"])["institute_website"].dropna().unique()
+    intel = agent_ai._DOMAIN_INTEL
+    intel.cache_path = args.out
+    print("warm-up:", intel.warm_up(sites))
+    print("saved domain cache to", args.out)
@@ -0,0 +1,240 @@
+# backend/field_extractor.py
+# Single-pass field extraction from OCR text.
+#
+# Lines are cut at their first colon with str methods (no regex per line);
+# each label is resolved once (cached on the raw label) against a
+# precompiled keyword alternation, and the best-scoring keyword decides the
+# field. Colon-less lines are regex-searched for the no-colon keywords
+# ("Issued on ...") only when one of their words occurs in the text at all.
+# Per field the highest-confidence line wins (earliest on ties), instead of
+# the last matching line. Keywords/weights live in templates so institutes
+# with unusual layouts can ship their own (FIELD_TEMPLATES_PATH, JSON).
+import os, re, json, math
+from typing import Any, Dict, Optional, Tuple
+
+FIELDS = ("name", "degree", "marks", "issuance_date", "institute", "serial")
+
+# keyword -> (field, weight). Specific phrases outweigh generic words, so
+# "Institute Name:" is an institute line and "Date of Birth:" is nothing.
+DEFAULT_TEMPLATE: Dict[str, Any] = {
+    "keywords": {
+        "student name": ("name", 1.0), "name of the student": ("name", 1.0), "name of student": ("name", 1.0),
+        "candidate name": ("name", 0.95), "awarded to": ("name", 0.9), "name": ("name", 0.6), "student": ("name", 0.5),
+        "degree": ("degree", 0.9), "programme": ("degree", 0.8), "program": ("degree", 0.8), "course": ("degree", 0.7),
+        "marks": ("marks", 0.9), "percentage": ("marks", 0.95), "cgpa": ("marks", 0.95), "gpa": ("marks", 0.9),
+        "issued on": ("issuance_date", 1.0), "date of issue": ("issuance_date", 1.0), "issuance": ("issuance_date", 0.95),
+        "date": ("issuance_date", 0.6),
+        "institute": ("institute", 0.9), "university": ("institute", 0.9), "college": ("institute", 0.85),
+        "serial": ("serial", 0.95), "certificate no": ("serial", 1.0), "certificate number": ("serial", 1.0),
+    },
+    # a keyword that means the line is *not* the field it would otherwise hit
+    "ignore": ["date of birth", "dob", "father's name", "mother's name", "father name", "mother name"],
+    # keywords allowed without a ":" separator (value = rest of the line)
+    "no_colon": ["issued on", "issuance", "date of issue"],
+}
+
+_MISS = object()
+_DIGIT_RE = re.compile(r"\d")
+_NUM_RE = re.compile(r"\d+(\.\d+)?")
+_PCT_RE = re.compile(r"(\d{1,3}\.\d+|\d{1,3})\s*%")
+_DATE_RE = re.compile(r"\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}|\d{1,2}\s+[A-Za-z]{3,9}\s+\d{4}")
+
+
+# value plausibility per field (fields not listed: 1.0); multiplies the label score
+_QUALITY = {
+    "marks": lambda v: 1.0 if _NUM_RE.search(v) else 0.5,
+    "issuance_date": lambda v: 1.0 if _DATE_RE.search(v) else 0.6,
+    "name": lambda v: 0.7 if _DIGIT_RE.search(v) else 1.0,
+}
+
+
+def _first_percent(text: str):
+    """_PCT_RE.search(text), but the regex only runs just before each "%"."""
+    lo, p = 0, text.find("%")
+    while p >= 0:
+        m = _PCT_RE.search(text, max(lo, p - 64), p + 1)
+        if m:
+            return m
+        lo, p = p + 1, text.find("%", p + 1)
+    return None
+
+
+def first_number(v) -> Optional[float]:
+    if v is None:
+        return None
+    if isinstance(v, (int, float)) or type(v).__module__ == "numpy":
+        f = float(v)
+        return None if math.isnan(f) else f
+    m = _NUM_RE.search(str(v))
+    return float(m.group(0)) if m else None
+
+
+def _alternation(words) -> "re.Pattern":
+    words = sorted(set(words), key=len, reverse=True)   # longest phrase first
+    return re.compile(r"\b(?:" + "|".join(re.escape(w) for w in words) + r")\b", re.I)
+
+
+class FieldExtractor:
+    def __init__(self, template: Optional[Dict[str, Any]] = None):
+        tpl = template or DEFAULT_TEMPLATE
+        self.keywords = {k.lower(): tuple(v) for k, v in tpl.get("keywords", {}).items()}
+        self.ignore = [w.lower() for w in tpl.get("ignore", [])]
+        self.no_colon = [w.lower() for w in tpl.get("no_colon", [])]
+        self._kw_re = _alternation(self.keywords)
+        self._ignore_re = _alternation(self.ignore) if self.ignore else None
+        # only lines without a ":" are searched for these
+        self._nc_re = _alternation(self.no_colon) if self.no_colon else None
+        # literal prefilter: the longest word of each no-colon phrase, minus words containing another
+        words = {max(w.split(), key=len) for w in self.no_colon if w.split()}
+        self._nc_words = sorted(w for w in words if not any(o != w and o in w for o in words))
+        self._labels: Dict[str, Optional[Tuple[float, str, str]]] = {}   # raw label -> hit
+
+    def _resolve_label(self, label: str) -> Optional[Tuple[float, str, str]]:
+        """label (text before the colon) -> (score, field, keyword) or None. Cached: labels repeat across documents."""
+        key = label.strip().lower()
+        hit = None
+        if self._ignore_re is None or not self._ignore_re.search(key):
+            for kw in self._kw_re.findall(key):
+                field, weight = self.keywords[kw]
+                score = weight * (1.0 if kw == key.strip() else 0.9)
+                if hit is None or score > hit[0]:
+                    hit = (score, field, kw)
+        if len(self._labels) < 4096:
+            self._labels[label] = hit
+        return hit
+
+    def _scan(self, text: str) -> Tuple[Dict[str, list], list]:
+        """
+        ({field: [confidence, value, line number, keyword, cut]}, lines): the winning
+        line per field, cut being where its value part begins (after the colon / keyword).
+        """
+        labels, resolve, nc_re = self._labels, self._resolve_label, self._nc_re
+        best: Dict[str, list] = {}
+        # literal prefilter: colon-less lines are only searched when a no-colon word occurs at all
+        nc_lines = None
+        if nc_re is not None:
+            low = text.lower()
+            if any(w in low for w in self._nc_words):
+                nc_lines = []
+        lines = text.split("\n")
+        # "label: value" lines, cut at the first colon (ASCII or full-width) with str methods
+        for i, line in enumerate(lines):
+            if ":" in line:
+                label, _, rest = line.partition(":")
+                if "：" in label:
+                    label, _, rest = line.partition("：")
+            elif "：" in line:
+                label, _, rest = line.partition("：")
+            else:
+                if nc_lines is not None:
+                    nc_lines.append(i)
+                continue
+            hit = labels.get(label, _MISS)
+            if hit is _MISS:
+                hit = resolve(label)
+            if hit is None:
+                continue
+            score, field, kw = hit
+            cur = best.get(field)
+            if cur is not None and score <= cur[0]:     # value quality <= 1 can't lift it past cur
+                continue
+            value = rest.strip()
+            if not value:
+                continue
+            quality = _QUALITY.get(field)
+            conf = score * quality(value) if quality is not None else score
+            if cur is None or conf > cur[0]:
+                best[field] = [conf, value, i, kw, len(label) + 1]
+        # lines without a colon carrying a no-colon keyword ("Issued on ..."); colon lines win ties
+        for i in nc_lines or ():
+            m = nc_re.search(lines[i])
+            if m is None:
+                continue
+            kw = m.group(0).lower()
+            field, weight = self.keywords.get(kw, ("issuance_date", 0.8))
+            value = lines[i][m.end():].strip()
+            if not value:
+                continue
+            quality = _QUALITY.get(field)
+            conf = weight * 0.85 * (quality(value) if quality is not None else 1.0)
+            cur = best.get(field)
+            if cur is None or conf > cur[0] or (conf == cur[0] and i < cur[2]):
+                best[field] = [conf, value, i, kw, m.end()]
+        return best, lines
+
+    def extract_detailed(self, text: str) -> Dict[str, Dict[str, Any]]:
+        """{field: {"value", "confidence", "line", "start", "end", "keyword"}} for fields found."""
+        text = str(text or "")
+        out = {}
+        best, lines = self._scan(text)
+        for f, (conf, value, i, kw, cut) in best.items():
+            rest = lines[i][cut:]
+            start = sum(map(len, lines[:i])) + i + cut + len(rest) - len(rest.lstrip())
+            out[f] = {"value": value, "confidence": round(conf, 3), "line": i, "start": start,
+                      "end": start + len(value), "keyword": kw}
+        if "marks" not in out:
+            pm = _first_percent(text)
+            if pm:
+                out["marks"] = {"value": pm.group(1) + "%", "confidence": 0.4, "line": text.count("\n", 0, pm.start()),
+                                "start": pm.start(), "end": pm.end(), "keyword": "%"}
+        return out
+
+    def extract(self, text: str) -> Dict[str, Optional[str]]:
+        text = str(text or "")
+        best = self._scan(text)[0]
+        out = {f: (best[f][1] if f in best else None) for f in FIELDS}
+        if out["marks"] is None:
+            pm = _first_percent(text)
+            if pm:
+                out["marks"] = pm.group(1) + "%"
+        return out
+
+
+# ---------------------------
+# Templates (per institute)
+# ---------------------------
+_EXTRACTORS: Dict[str, FieldExtractor] = {"default": FieldExtractor(DEFAULT_TEMPLATE)}
+
+
+def _norm(name: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(name).lower()).split())
+
+
+def register_template(institute: str, template: Dict[str, Any], extend_default: bool = True):
+    """template: {"keywords": {kw: [field, weight]}, "ignore": [...], "no_colon": [...]}"""
+    if extend_default:
+        merged = {"keywords": dict(DEFAULT_TEMPLATE["keywords"], **template.get("keywords", {})),
+                  "ignore": DEFAULT_TEMPLATE["ignore"] + list(template.get("ignore", [])),
+                  "no_colon": DEFAULT_TEMPLATE["no_colon"] + list(template.get("no_colon", []))}
+    else:
+        merged = template
+    _EXTRACTORS[_norm(institute)] = FieldExtractor(merged)
+
+
+def load_templates(path: str):
+    with open(path) as f:
+        for institute, tpl in json.load(f).items():
+            register_template(institute, tpl, tpl.get("extend_default", True))
+
+
+def extractor_for(institute: Optional[str] = None) -> FieldExtractor:
+    if institute:
+        ex = _EXTRACTORS.get(_norm(institute))
+        if ex is not None:
+            return ex
+    return _EXTRACTORS["default"]
+
+
+def extract_fields(ocr_text, institute: Optional[str] = None) -> Dict[str, Optional[str]]:
+    return extractor_for(institute).extract(ocr_text)
+
+
+def extract_fields_detailed(ocr_text, institute: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    return extractor_for(institute).extract_detailed(ocr_text)
+
+
+if os.environ.get("FIELD_TEMPLATES_PATH"):
+    try:
+        load_templates(os.environ["FIELD_TEMPLATES_PATH"])
+    except Exception as e:
+        print("field_extractor: could not load templates:", e)
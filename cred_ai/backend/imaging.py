@@ -0,0 +1,204 @@
+# backend/imaging.py
+# Image-only checks (OCR, ELA). Kept free of the registry/model globals in
+# agent_ai so process-pool workers can import it cheaply.
+import os, tempfile
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageChops, ImageOps
+
+import ingest
+from metrics import timed
+
+# ELA settings. ELA_MAX_PIXELS=0 keeps native resolution; otherwise larger
+# scans are downscaled to that pixel budget before recompression. The image is
+# recompressed in ELA_STRIP_ROWS bands (a multiple of the 16-row JPEG MCU, so the
+# block grid is unchanged), so only one band's JPEG, decode and difference are
+# alive at a time instead of three more full-size copies of the scan.
+ELA_JPEG_QUALITY = int(os.environ.get("ELA_JPEG_QUALITY", 90))
+ELA_MAX_PIXELS = int(os.environ.get("ELA_MAX_PIXELS", 0))
+ELA_GRID = int(os.environ.get("ELA_GRID", 4))
+ELA_STRIP_ROWS = max(16, int(os.environ.get("ELA_STRIP_ROWS", 512)) // 16 * 16)
+
+# PDF intake: pages are rendered one at a time and OCR'd by a small pool, so peak
+# memory is bounded by PDF_OCR_WORKERS pages rather than by the document.
+PDF_DPI = int(os.environ.get("PDF_DPI", 200))
+PDF_OCR_WORKERS = int(os.environ.get("PDF_OCR_WORKERS", 2))
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", 30))
+PDF_REQUIRED_FIELDS = tuple(f for f in os.environ.get("PDF_REQUIRED_FIELDS", "name,institute,marks").split(",") if f)
+
+# OCR_MODE=fast preprocesses and reads only text regions / template boxes
+# (ocr_fastpath.py), falling back to the full page when that finds too little
+# text; OCR_MODE=full is the plain whole-page Tesseract pass.
+OCR_MODE = os.environ.get("OCR_MODE", "fast").lower()
+
+
+def ocr_full_page(pil_img: Image.Image) -> str:
+    import pytesseract  # deferred: only OCR paths pay for it
+    gray = ImageOps.grayscale(pil_img)
+    return pytesseract.image_to_string(gray, lang='eng')
+
+@timed("ocr_image")
+def ocr_image(pil_img: Image.Image, institute: Optional[str] = None, mode: Optional[str] = None) -> str:
+    if (mode or OCR_MODE) != "fast":
+        return ocr_full_page(pil_img)
+    import ocr_fastpath
+    text = ocr_fastpath.fast_ocr(pil_img, institute)["text"]
+    if len(text.strip()) < ocr_fastpath.OCR_MIN_CHARS:
+        with timed("ocr_fallback"):
+            return ocr_full_page(pil_img)
+    return text
+
+def _grid_edges(h: int, w: int, grid: int):
+    return (np.linspace(0, h, min(grid, h) + 1).astype(int),
+            np.linspace(0, w, min(grid, w) + 1).astype(int))
+
+def _add_band(sums: np.ndarray, band: np.ndarray, y0: int, rows: np.ndarray, cols: np.ndarray):
+    """Fold rows [y0, y0 + len(band)) of the value image into the per-cell sums."""
+    y1 = y0 + band.shape[0]
+    for i, (r0, r1) in enumerate(zip(rows[:-1], rows[1:])):
+        a, b = max(r0, y0), min(r1, y1)
+        if a < b:
+            # uint32 is enough for one band's column sums; the column fold is tiny
+            col = band[a - y0:b - y0].sum(axis=0, dtype=np.uint32)
+            sums[i] += np.add.reduceat(col.astype(np.uint64), cols[:-1])
+
+def ela_analysis(pil_img: Image.Image, quality: int = None, max_pixels: Optional[int] = None,
+                 grid: int = None, strip_rows: int = None) -> Dict[str, Any]:
+    """
+    Error-level analysis: recompress each band of rows to an in-memory JPEG, take
+    the difference against the single RGB copy and fold it into grid-cell sums.
+    Returns the global mean plus grid-cell means as a heatmap.
+    """
+    quality = ELA_JPEG_QUALITY if quality is None else quality
+    max_pixels = ELA_MAX_PIXELS if max_pixels is None else max_pixels
+    grid = ELA_GRID if grid is None else grid
+    strip_rows = ELA_STRIP_ROWS if strip_rows is None else max(16, strip_rows // 16 * 16)
+
+    rgb = pil_img if pil_img.mode == "RGB" else pil_img.convert("RGB")
+    w, h = rgb.size
+    downscaled = False
+    if max_pixels and w * h > max_pixels:
+        f = (max_pixels / float(w * h)) ** 0.5
+        rgb = rgb.resize((max(1, int(w * f)), max(1, int(h * f))), Image.BILINEAR)
+        downscaled = True
+    w, h = rgb.size
+
+    rows, cols = _grid_edges(h, w, grid)
+    sums = np.zeros((len(rows) - 1, len(cols) - 1), dtype=np.uint64)
+    for y0 in range(0, h, strip_rows):
+        band = rgb if strip_rows >= h else rgb.crop((0, y0, w, min(h, y0 + strip_rows)))
+        buf = BytesIO()
+        band.save(buf, "JPEG", quality=quality)
+        buf.seek(0)
+        saved = Image.open(buf)
+        saved.load()
+        # per-pixel |a-b| and the luma fold stay in Pillow's C loops; NumPy only sums
+        _add_band(sums, np.asarray(ImageChops.difference(band, saved).convert("L")), y0, rows, cols)
+
+    cells = sums / np.outer(np.diff(rows), np.diff(cols))
+    r, c = np.unravel_index(int(np.argmax(cells)), cells.shape)
+    return {
+        "score": float(sums.sum() / (w * h)),
+        "grid": np.round(cells, 3).tolist(),
+        "grid_max": float(cells.max()),
+        "max_cell": [int(r), int(c)],
+        "size": [int(w), int(h)],
+        "downscaled": downscaled,
+    }
+
+def ela_score_from_image(pil_img: Image.Image) -> float:
+    return ela_analysis(pil_img)["score"]
+
+# ---------- PDF certificates ----------
+def is_pdf(data: bytes) -> bool:
+    return bool(data) and data[:1024].lstrip().startswith(b"%PDF-")
+
+def _pdf_page_count(path: str) -> int:
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(path).get("Pages", 0))
+
+def _render_page(path: str, page_no: int, dpi: int) -> Image.Image:
+    from pdf2image import convert_from_path
+    return convert_from_path(path, dpi=dpi, first_page=page_no, last_page=page_no)[0]
+
+def iter_pdf_pages(path: str, dpi: int = None, max_pages: int = None,
+                   page_count: int = None) -> Iterator[Tuple[int, Image.Image]]:
+    """Render one page at a time (poppler only ever holds a single page)."""
+    dpi = dpi or PDF_DPI
+    n = page_count if page_count is not None else _pdf_page_count(path)
+    for page_no in range(1, min(n, max_pages or PDF_MAX_PAGES) + 1):
+        yield page_no, _render_page(path, page_no, dpi)
+
+def _ocr_page(img: Image.Image) -> str:
+    try:
+        return ocr_image(img)
+    finally:
+        img.close()
+
+def _pdf_fields_found(text: str, required=PDF_REQUIRED_FIELDS) -> bool:
+    from field_extractor import extract_fields
+    fields = extract_fields(text)
+    return all(fields.get(f) for f in required)
+
+@timed("ocr_pdf")
+def ocr_pdf(pdf_bytes: bytes, dpi: int = None, workers: int = None, max_pages: int = None,
+            done: Optional[Callable[[str], bool]] = _pdf_fields_found) -> Dict[str, Any]:
+    """
+    Streaming OCR for PDF transcripts. Pages are rendered sequentially and OCR'd
+    by `workers` threads with at most `workers` pages in flight; text is joined
+    in page order and, once done(text) is satisfied, rendering stops early.
+    """
+    workers = max(1, workers or PDF_OCR_WORKERS)
+    texts: Dict[int, str] = {}
+    pages_total = 0
+    stopped_early = False
+    with tempfile.TemporaryDirectory() as td:
+        path = os.path.join(td, "upload.pdf")
+        with open(path, "wb") as f:
+            f.write(pdf_bytes)
+        pages_total = _pdf_page_count(path)
+        inflight = {}
+        next_page = 1          # next page expected for in-order joining
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-ocr") as ex:
+            pages = iter_pdf_pages(path, dpi, max_pages, pages_total)
+            exhausted = False
+            while not stopped_early:
+                while not exhausted and len(inflight) < workers:
+                    try:
+                        page_no, img = next(pages)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    inflight[page_no] = ex.submit(_ocr_page, img)
+                if next_page not in inflight:
+                    break
+                texts[next_page] = inflight.pop(next_page).result()
+                next_page += 1
+                if done is not None and done("\n".join(texts[p] for p in sorted(texts))):
+                    stopped_early = next_page <= min(pages_total, max_pages or PDF_MAX_PAGES)
+                    break
+            for fut in inflight.values():
+                fut.cancel()
+    return {"ocr_text": "\n".join(texts[p] for p in sorted(texts)),
+            "pdf": {"pages_total": pages_total, "pages_ocr": len(texts), "dpi": dpi or PDF_DPI,
+                    "stopped_early": stopped_early}}
+
+def analyze_image(image_bytes: bytes, institute: Optional[str] = None) -> Dict[str, Any]:
+    """OCR + ELA for one upload. Top-level so it can run in a ProcessPoolExecutor."""
+    try:
+        if is_pdf(image_bytes):
+            # rendered pages carry no JPEG history, so ELA doesn't apply
+            out = ocr_pdf(image_bytes)
+            out["ela"] = None
+            return out
+        with timed("decode"):
+            img = ingest.decode(image_bytes)["image"]
+        ela = ela_analysis(ingest.decode_full(image_bytes, img))
+        return {"ocr_text": ocr_image(img, institute), "ela": ela["score"], "ela_heatmap": ela}
+    except Exception as e:
+        # some library errors (e.g. TesseractNotFoundError) can't be unpickled
+        # and would break the whole pool; re-raise as a plain RuntimeError
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
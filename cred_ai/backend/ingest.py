@@ -0,0 +1,89 @@
+# backend/ingest.py
+# Upload intake: bounded reads and one right-sized decode per image.
+#   bytes  : uploads are read in chunks and refused past UPLOAD_MAX_BYTES (the
+#            app also refuses an oversized Content-Length before reading the body)
+#   pixels : the header is checked against UPLOAD_MAX_PIXELS before decoding
+#   decode : JPEGs decode in draft mode at the largest 1/2, 1/4, 1/8 scale that fits
+#            INGEST_MAX_PIXELS (the DCT is scaled, the full bitmap never exists);
+#            other formats decode once and are box-reduced to the same budget
+# The decoded RGB image is shared read-only by OCR and the hash check. ELA
+# measures JPEG recompression error on the original 8x8 block grid, so it takes
+# decode_full() instead, which reuses the shared image only when it kept full size.
+import os, math
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", 20 * 1024 * 1024))
+UPLOAD_MAX_PIXELS = int(os.environ.get("UPLOAD_MAX_PIXELS", 100_000_000))
+INGEST_MAX_PIXELS = int(os.environ.get("INGEST_MAX_PIXELS", 12_000_000))    # ~A4 at 350 dpi
+READ_CHUNK = 1 << 20
+
+
+class UploadTooLarge(ValueError):
+    """An upload over a byte or pixel limit; `limit` names which one."""
+
+    def __init__(self, limit: str, detail: str):
+        super().__init__(detail)
+        self.limit = limit
+
+
+async def read_upload(file, max_bytes: int = None) -> bytes:
+    """Read a starlette UploadFile in chunks, stopping as soon as it passes max_bytes."""
+    max_bytes = max_bytes or UPLOAD_MAX_BYTES
+    size = getattr(file, "size", None)
+    if size is not None and size > max_bytes:
+        raise UploadTooLarge("bytes", f"upload is {size} bytes, limit {max_bytes}")
+    buf = bytearray()
+    while True:
+        chunk = await file.read(READ_CHUNK)
+        if not chunk:
+            return bytes(buf)
+        buf += chunk
+        if len(buf) > max_bytes:
+            raise UploadTooLarge("bytes", f"upload exceeds {max_bytes} bytes")
+
+
+def check_bytes(data: bytes, max_bytes: int = None):
+    max_bytes = max_bytes or UPLOAD_MAX_BYTES
+    if len(data) > max_bytes:
+        raise UploadTooLarge("bytes", f"upload is {len(data)} bytes, limit {max_bytes}")
+
+
+def decode(image_bytes: bytes, max_pixels: int = None) -> Dict[str, Any]:
+    """-> {"image": RGB image within max_pixels, "source_size", "size", "scale", "draft"}"""
+    max_pixels = max_pixels or INGEST_MAX_PIXELS
+    img = Image.open(BytesIO(image_bytes))
+    w, h = img.size
+    if w * h > UPLOAD_MAX_PIXELS:
+        raise UploadTooLarge("pixels", f"image is {w}x{h}, limit {UPLOAD_MAX_PIXELS} pixels")
+    dpi = img.info.get("dpi")
+    drafted = False
+    if w * h > max_pixels and img.format == "JPEG":
+        # draft picks the smallest scale >= the requested size; asking for half the
+        # budget's side lands the result between max_pixels / 4 and max_pixels
+        f = (max_pixels / float(w * h)) ** 0.5 / 2
+        drafted = img.draft("RGB", (max(1, int(w * f)), max(1, int(h * f)))) is not None
+    rgb = img if img.mode == "RGB" else img.convert("RGB")
+    rgb.load()
+    if rgb.width * rgb.height > max_pixels:
+        rgb = rgb.reduce(max(2, math.ceil((rgb.width * rgb.height / float(max_pixels)) ** 0.5)))
+    scale = rgb.width / float(w)
+    if dpi and dpi[0]:
+        rgb.info["dpi"] = (dpi[0] * scale, dpi[1] * scale)
+    return {"image": rgb, "source_size": [w, h], "size": [rgb.width, rgb.height],
+            "scale": round(scale, 4), "draft": drafted}
+
+
+def decode_full(image_bytes: bytes, image: Optional[Image.Image] = None) -> Image.Image:
+    """Native-resolution RGB decode; `image` (a decode() result) is returned as-is when it wasn't scaled."""
+    img = Image.open(BytesIO(image_bytes))
+    w, h = img.size
+    if image is not None and image.size == (w, h):
+        return image
+    if w * h > UPLOAD_MAX_PIXELS:
+        raise UploadTooLarge("pixels", f"image is {w}x{h}, limit {UPLOAD_MAX_PIXELS} pixels")
+    rgb = img if img.mode == "RGB" else img.convert("RGB")
+    rgb.load()
+    return rgb
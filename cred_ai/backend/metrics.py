@@ -0,0 +1,205 @@
+# backend/metrics.py
+# In-process latency histograms for the verifier hot path, rendered in the
+# Prometheus text format by GET /metrics.
+#   stages   : timed("ocr_image") as a decorator or context manager; every call
+#              lands in verifier_stage_seconds{stage=...} and bumps an in-flight gauge
+#   requests : the same for whole endpoints (verifier_request_seconds)
+#   collect  : callables that report extra samples at scrape time (cache stats)
+# A request can also collect its own per-stage milliseconds (request_timings());
+# the dict travels in a contextvar, so executor calls made with a copied
+# context (pipeline.py, run_in_threadpool) add to it too.
+import os, time, threading, functools, contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds; OCR on a large scan can take several seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Attach a "timings" block to every /agent_ai response (also per request via the form field)
+RESPONSE_TIMINGS = os.environ.get("METRICS_RESPONSE_TIMINGS", "0").lower() in ("1", "true", "yes")
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)     # last slot: +Inf
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, seconds: float):
+        i = 0
+        while i < len(self.buckets) and seconds > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += seconds
+        self.n += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Bucket upper bound holding the q-th observation (None when empty)."""
+        if not self.n:
+            return None
+        rank, seen = q * self.n, 0
+        for bound, c in zip(self.buckets + (float("inf"),), self.counts):
+            seen += c
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._hist: Dict[Tuple[str, str], Histogram] = {}
+        self._inflight: Dict[Tuple[str, str], int] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, family: str, label: str, seconds: float, error: bool = False):
+        with self._lock:
+            h = self._hist.get((family, label))
+            if h is None:
+                h = self._hist[(family, label)] = Histogram(self.buckets)
+            h.observe(seconds)
+            if error:
+                self._errors[(family, label)] = self._errors.get((family, label), 0) + 1
+
+    def _track(self, family: str, label: str, delta: int):
+        with self._lock:
+            self._inflight[(family, label)] = self._inflight.get((family, label), 0) + delta
+
+    def collector(self, fn: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]):
+        """fn() -> [(metric_name, labels, value), ...], called at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
+        """{family: {label: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "inflight"}}} for JSON views.
+        A quantile past the last bucket reports that bucket's bound (as histogram_quantile does); JSON has no inf."""
+        out: Dict[str, Dict[str, Dict[str, Optional[float]]]] = {}
+        with self._lock:
+            for (family, label), h in self._hist.items():
+                q = {}
+                for p in (0.5, 0.95, 0.99):
+                    bound = h.quantile(p)
+                    q[f"p{int(p * 100)}_ms"] = None if bound is None else min(bound, h.buckets[-1]) * 1000
+                out.setdefault(family, {})[label] = dict(
+                    count=h.n, mean_ms=round(h.total / h.n * 1000, 3) if h.n else None,
+                    inflight=self._inflight.get((family, label), 0), **q)
+        return out
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            hist = sorted(self._hist.items())
+            inflight = sorted(self._inflight.items())
+            errors = sorted(self._errors.items())
+            for i, ((family, label), h) in enumerate(hist):
+                name, key = _family_name(family), _label_key(family)
+                if i == 0 or hist[i - 1][0][0] != family:
+                    lines.append(f"# TYPE {name} histogram")
+                cum = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    cum += c
+                    lines.append(f'{name}_bucket{{{key}="{label}",le="{bound:g}"}} {cum}')
+                lines.append(f'{name}_bucket{{{key}="{label}",le="+Inf"}} {h.n}')
+                lines.append(f'{name}_sum{{{key}="{label}"}} {h.total:.6f}')
+                lines.append(f'{name}_count{{{key}="{label}"}} {h.n}')
+        for title, kind, rows in (("in_flight", "gauge", inflight), ("errors_total", "counter", errors)):
+            for i, ((family, label), v) in enumerate(rows):
+                name = f"verifier_{family}_{title}"
+                if i == 0 or rows[i - 1][0][0] != family:
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(f'{name}{{{_label_key(family)}="{label}"}} {v}')
+        typed = set()
+        for fn in self._collectors:
+            try:
+                samples = list(fn())
+            except Exception as e:
+                print("metrics: collector failed:", e)
+                continue
+            for name, labels, value in samples:
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+                lab = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+                lines.append(f"{name}{{{lab}}} {float(value):g}" if lab else f"{name} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+def _family_name(family: str) -> str:
+    return f"verifier_{family}_seconds"
+
+
+def _label_key(family: str) -> str:
+    return {"stage": "stage", "check": "check", "request": "endpoint"}.get(family, "name")
+
+
+REGISTRY = Registry()
+
+# per-request {stage: ms}; None outside request_timings()
+_TIMINGS: contextvars.ContextVar = contextvars.ContextVar("stage_timings", default=None)
+_TIMINGS_LOCK = threading.Lock()
+
+
+def _record_request(stage: str, seconds: float):
+    timings = _TIMINGS.get()
+    if timings is not None:
+        with _TIMINGS_LOCK:
+            timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 3)
+
+
+class timed:
+    """Time a stage: `@timed("serial_check")` or `with timed("decode"):`."""
+
+    def __init__(self, stage: str, family: str = "stage", registry: Registry = None):
+        self.stage, self.family = stage, family
+        self.registry = registry or REGISTRY
+        self._t0 = []
+
+    def __enter__(self):
+        self.registry._track(self.family, self.stage, 1)
+        self._t0.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._t0.pop()
+        self.registry._track(self.family, self.stage, -1)
+        self.registry.observe(self.family, self.stage, seconds, error=exc_type is not None)
+        _record_request(self.stage, seconds)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage, self.family, self.registry):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def observe(stage: str, seconds: float, family: str = "stage", error: bool = False):
+    """Record a duration measured elsewhere (e.g. pipeline check times)."""
+    REGISTRY.observe(family, stage, seconds, error=error)
+
+
+@contextmanager
+def request_timings():
+    """Collect {stage: ms} for everything timed inside the block (and its copied contexts)."""
+    timings: Dict[str, float] = {}
+    token = _TIMINGS.set(timings)
+    try:
+        yield timings
+    finally:
+        _TIMINGS.reset(token)
+
+
+def collector(fn):
+    return REGISTRY.collector(fn)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def snapshot():
+    return REGISTRY.snapshot()
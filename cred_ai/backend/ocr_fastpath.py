@@ -0,0 +1,229 @@
+# backend/ocr_fastpath.py
+# Preprocessing ahead of Tesseract so it only reads the text on a certificate:
+#   1. resolution  : downscale to OCR_TARGET_DPI (from the image's DPI tag, else
+#                    assuming the long side is an A4 page) - phone photos shrink a
+#                    lot; only scans under OCR_MIN_DPI are upsampled
+#   2. binarize    : Otsu threshold on the grayscale histogram
+#   3. deskew      : best angle in +-OCR_MAX_SKEW by projection-profile variance,
+#                    scored on a small thumbnail
+#   4. regions     : text-line bands from the row/column ink profiles; photos,
+#                    logos and empty margins are dropped
+#   5. OCR         : regions are stacked into one compact strip and read by a
+#                    single Tesseract call (--psm 6), since each call costs a process
+# Layout templates (per institute, OCR_LAYOUTS_PATH JSON, same shape of registry
+# as field_extractor's templates) name fixed field boxes as page fractions:
+#   {"Some University": {"boxes": {"name": [0.1, 0.32, 0.9, 0.38], "serial": [...]}}}
+# Boxed fields are OCR'd directly (one call, words mapped back by position) and
+# returned as "Label: value" lines that field_extractor resolves.
+import os, re, json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from metrics import timed
+
+OCR_TARGET_DPI = int(os.environ.get("OCR_TARGET_DPI", 300))
+OCR_MIN_DPI = int(os.environ.get("OCR_MIN_DPI", 150))                 # only scans below this are upsampled
+OCR_PAGE_INCHES = float(os.environ.get("OCR_PAGE_INCHES", 11.69))    # assumed long side when untagged (A4)
+OCR_MAX_SKEW = float(os.environ.get("OCR_MAX_SKEW", 5.0))
+OCR_MIN_CHARS = int(os.environ.get("OCR_MIN_CHARS", 20))               # fewer -> fall back to full page
+OCR_REGION_PAD = 8
+OCR_STACK_GAP = 24
+
+# field -> label field_extractor resolves to that field
+FIELD_LABELS = {"name": "Student Name", "degree": "Degree", "marks": "Percentage", "issuance_date": "Date of Issue",
+                "institute": "Institute", "serial": "Certificate No"}
+
+
+# ---------- preprocessing ----------
+def normalize_resolution(img: Image.Image, target_dpi: int = None) -> Tuple[Image.Image, float]:
+    """-> (grayscale image at ~target_dpi, scale applied)."""
+    target_dpi = target_dpi or OCR_TARGET_DPI
+    gray = img if img.mode == "L" else ImageOps.grayscale(img)
+    long_side = max(gray.size)
+    dpi = img.info.get("dpi")
+    src_dpi = float(dpi[0]) if dpi and dpi[0] and dpi[0] > 1 else 0.0
+    if not 4 <= long_side / max(src_dpi, 1e-6) <= 20:    # untagged, or a tag no certificate fits (72 dpi phone photos)
+        src_dpi = long_side / OCR_PAGE_INCHES
+    if src_dpi > target_dpi:
+        scale = max(target_dpi / src_dpi, 0.2)
+    elif src_dpi < OCR_MIN_DPI:
+        scale = min(target_dpi / src_dpi, 2.0)
+    else:
+        scale = 1.0
+    if abs(scale - 1.0) < 0.1:
+        return gray, 1.0
+    size = (max(1, int(gray.width * scale)), max(1, int(gray.height * scale)))
+    return gray.resize(size, Image.BILINEAR if scale < 1 else Image.BICUBIC), scale
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    w0 = np.cumsum(hist)
+    w1 = w0[-1] - w0
+    m = np.cumsum(hist * np.arange(256))
+    mu0 = m / np.maximum(w0, 1)
+    mu1 = (m[-1] - m) / np.maximum(w1, 1)
+    between = w0 * w1 * (mu0 - mu1) ** 2
+    return int(np.argmax(between))
+
+
+def binarize(gray: Image.Image) -> np.ndarray:
+    """-> bool ink mask (True = text), inverted when the page is dark-on-light the other way round."""
+    a = np.asarray(gray)
+    ink = a <= otsu_threshold(a)
+    if ink.mean() > 0.5:
+        ink = ~ink
+    return ink
+
+
+def estimate_skew(ink: np.ndarray, max_angle: float = None, step: float = 0.25, thumb: int = 600) -> float:
+    """Angle (degrees, PIL rotate convention) that makes text rows most sharply separated."""
+    max_angle = OCR_MAX_SKEW if max_angle is None else max_angle
+    if max_angle <= 0 or not ink.any():
+        return 0.0
+    im = Image.fromarray((ink * 255).astype(np.uint8))
+    f = thumb / float(max(im.size))
+    if f < 1:
+        im = im.resize((max(1, int(im.width * f)), max(1, int(im.height * f))), Image.BILINEAR)
+    best, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + 1e-9, step):
+        rows = np.asarray(im.rotate(float(angle), resample=Image.NEAREST, fillcolor=0)).sum(axis=1, dtype=np.float64)
+        score = float(np.var(rows))
+        if score > best_score:
+            best, best_score = float(angle), score
+    return best
+
+
+def text_regions(ink: np.ndarray, min_height: int = 6, max_density: float = 0.45, pad: int = OCR_REGION_PAD) -> List[Tuple[int, int, int, int]]:
+    """Text-line boxes (x0, y0, x1, y1), top to bottom, from the ink projection profiles."""
+    h, w = ink.shape
+    # drop page frames and rules first, or a border would merge the whole page into one band
+    ink = ink & ~(ink.mean(axis=0) > 0.5)[None, :] & ~(ink.mean(axis=1) > 0.5)[:, None]
+    row_ink = ink.sum(axis=1)
+    on = row_ink > max(2, int(0.002 * w))
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], on.astype(np.int8), [0]])))
+    boxes = []
+    for y0, y1 in zip(edges[::2], edges[1::2]):
+        if y1 - y0 < min_height:
+            continue
+        band = ink[y0:y1]
+        cols = np.flatnonzero(band.any(axis=0))
+        x0, x1 = int(cols[0]), int(cols[-1]) + 1
+        density = band[:, x0:x1].mean()
+        if density > max_density:      # solid blocks: photos, logos, seals
+            continue
+        boxes.append((max(0, x0 - pad), max(0, int(y0) - pad), min(w, x1 + pad), min(h, int(y1) + pad)))
+    return boxes
+
+
+@timed("ocr_preprocess")
+def preprocess(img: Image.Image) -> Dict[str, Any]:
+    """-> {"page": deskewed binarized page (L), "ink": mask, "scale", "skew"}"""
+    gray, scale = normalize_resolution(img)
+    ink = binarize(gray)
+    skew = estimate_skew(ink)
+    if abs(skew) >= 0.25:
+        gray = gray.rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=255)
+        ink = binarize(gray)
+    page = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+    return {"page": page, "ink": ink, "scale": scale, "skew": skew}
+
+
+def stack(page: Image.Image, boxes) -> Tuple[Image.Image, List[Tuple[int, int]]]:
+    """Crops stacked top to bottom on white -> (strip, [(y_start, y_end)] per crop)."""
+    crops = [page.crop(b) for b in boxes]
+    width = max(c.width for c in crops) + 2 * OCR_STACK_GAP
+    height = sum(c.height for c in crops) + OCR_STACK_GAP * (len(crops) + 1)
+    strip = Image.new("L", (width, height), 255)
+    spans, y = [], OCR_STACK_GAP
+    for c in crops:
+        strip.paste(c, (OCR_STACK_GAP, y))
+        spans.append((y, y + c.height))
+        y += c.height + OCR_STACK_GAP
+    return strip, spans
+
+
+# ---------- layout templates ----------
+_LAYOUTS: Dict[str, Dict[str, Any]] = {}
+
+
+def _norm(name: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(name).lower()).split())
+
+
+def register_layout(institute: str, layout: Dict[str, Any]):
+    """layout: {"boxes": {field: [x0, y0, x1, y1] as fractions of the deskewed page}}"""
+    _LAYOUTS[_norm(institute)] = layout
+
+
+def load_layouts(path: str):
+    with open(path) as f:
+        for institute, layout in json.load(f).items():
+            register_layout(institute, layout)
+
+
+def layout_for(institute: Optional[str]) -> Optional[Dict[str, Any]]:
+    return _LAYOUTS.get(_norm(institute)) if institute else None
+
+
+# ---------- OCR ----------
+def _tesseract_string(img: Image.Image, psm: int) -> str:
+    import pytesseract
+    return pytesseract.image_to_string(img, lang="eng", config=f"--psm {psm}")
+
+
+def _tesseract_words_by_span(img: Image.Image, spans, psm: int = 6) -> List[str]:
+    """One Tesseract call; words grouped back to the stacked crop they sit in."""
+    import pytesseract
+    data = pytesseract.image_to_data(img, lang="eng", config=f"--psm {psm}", output_type=pytesseract.Output.DICT)
+    out: List[List[str]] = [[] for _ in spans]
+    centers = np.array([(a + b) / 2.0 for a, b in spans])
+    for word, top, height in zip(data["text"], data["top"], data["height"]):
+        word = str(word).strip()
+        if not word:
+            continue
+        out[int(np.argmin(np.abs(centers - (top + height / 2.0))))].append(word)
+    return [" ".join(ws) for ws in out]
+
+
+def ocr_template(prep: Dict[str, Any], layout: Dict[str, Any]) -> Dict[str, str]:
+    page = prep["page"]
+    w, h = page.size
+    fields = list(layout["boxes"])
+    boxes = [tuple(int(round(v * s)) for v, s in zip(layout["boxes"][f], (w, h, w, h))) for f in fields]
+    strip, spans = stack(page, boxes)
+    values = _tesseract_words_by_span(strip, spans, layout.get("psm", 6))
+    return {f: v for f, v in zip(fields, values) if v}
+
+
+def ocr_regions(prep: Dict[str, Any]) -> str:
+    boxes = text_regions(prep["ink"])
+    if not boxes:
+        return ""
+    strip, _ = stack(prep["page"], boxes)
+    return _tesseract_string(strip, 6)
+
+
+def fast_ocr(img: Image.Image, institute: Optional[str] = None) -> Dict[str, Any]:
+    """-> {"text", "mode": "template"|"regions", "fields" (template only), "skew", "scale"}"""
+    prep = preprocess(img)
+    out: Dict[str, Any] = {"skew": prep["skew"], "scale": round(prep["scale"], 3)}
+    layout = layout_for(institute)
+    if layout and layout.get("boxes"):
+        fields = ocr_template(prep, layout)
+        out.update(mode="template", fields=fields,
+                   text="\n".join(f"{FIELD_LABELS.get(f, f)}: {v}" for f, v in fields.items()))
+        if layout.get("full_text"):     # template fields first, region text after for everything else
+            out["text"] += "\n" + ocr_regions(prep)
+        return out
+    out.update(mode="regions", text=ocr_regions(prep))
+    return out
+
+
+if os.environ.get("OCR_LAYOUTS_PATH"):
+    try:
+        load_layouts(os.environ["OCR_LAYOUTS_PATH"])
+    except Exception as e:
+        print("ocr_fastpath: could not load layouts:", e)
@@ -0,0 +1,345 @@
+# backend/phash_index.py
+# Near-duplicate detection for certificate scans. Every registered or verified
+# image gets a 64-bit perceptual hash (DCT pHash: survives recompression,
+# rescaling and small text edits), and uploads are matched by Hamming distance.
+#
+# The index is multi-index hashing over array-backed tables: the hash is split
+# into 4 chunks of 16 bits, and any hash within distance r shares at least one
+# chunk within r // 4 of the query's (pigeonhole). Per chunk, rows are kept
+# sorted by chunk value with a 65537-entry offsets table, so a probe is an
+# offsets lookup + a slice; candidates are then checked with one vectorized
+# popcount. Work per query is ~n / 65536 candidates per probed bucket, which
+# stays well under a millisecond at millions of rows. On disk (all mmap-able):
+#   <dir>/meta.json     count, chunk layout
+#   hashes.npy  uint64 [n]          keys.npy  bytes [n] (certificate serial / id)
+#   order.npy   int32 [4, n]        offsets.npy int64 [4, 65537]
+#   delta.jsonl appended {"hash": hex, "key": ...} lines (serving adds, all workers tail it)
+#
+#   python phash_index.py build --csv "../data/NIT_SILCHAR Dataset.csv" --out cache/phash
+#   python phash_index.py compact --dir cache/phash      # fold delta.jsonl into the arrays
+#   python phash_index.py query --dir cache/phash --image scan.jpg [--radius 10]
+import os, json, time, threading, argparse
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+CHUNKS, CHUNK_BITS = 4, 16
+_BUCKETS = 1 << CHUNK_BITS
+_SHIFTS = np.array([CHUNK_BITS * j for j in range(CHUNKS)], dtype=np.uint64)
+_MASK = np.uint64(_BUCKETS - 1)
+PHASH_DELTA_MERGE = int(os.environ.get("PHASH_DELTA_MERGE", 20000))   # delta rows before an in-memory rebuild
+PHASH_POLL_SECONDS = float(os.environ.get("PHASH_POLL_SECONDS", 2))
+
+
+# ---------- hashing ----------
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)
+    d = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2.0 / n)
+    d[0] /= np.sqrt(2.0)
+    return d
+
+_DCT32 = _dct_matrix(32)
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(64, dtype=np.uint64))
+
+
+def phash(img: Image.Image) -> int:
+    """64-bit DCT hash: low 8x8 frequencies of a 32x32 grayscale thumbnail vs their median."""
+    a = np.asarray(img.convert("L").resize((32, 32), Image.BILINEAR), dtype=np.float64)
+    low = (_DCT32 @ a @ _DCT32.T)[:8, :8].ravel()
+    bits = low > np.median(low[1:])
+    return int((bits.astype(np.uint64) * _BIT_WEIGHTS).sum())
+
+
+def phash_bytes(image_bytes: bytes) -> int:
+    img = Image.open(BytesIO(image_bytes))
+    img.draft("L", (128, 128))     # JPEG: decode at 1/2..1/8 scale, the hash only needs 32x32
+    return phash(img)
+
+
+def popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return _POP8[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+_POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _chunk_masks(max_weight: int) -> List[np.ndarray]:
+    """Per r: every 16-bit mask with popcount <= r (probe set for chunk radius r)."""
+    all_masks = np.arange(_BUCKETS, dtype=np.uint64)
+    weights = popcount(all_masks)
+    return [all_masks[weights <= r] for r in range(max_weight + 1)]
+
+_PROBES = _chunk_masks(3)
+
+
+# ---------- index ----------
+def _build_tables(hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(hashes)
+    order = np.empty((CHUNKS, n), dtype=np.int32)
+    offsets = np.empty((CHUNKS, _BUCKETS + 1), dtype=np.int64)
+    for j in range(CHUNKS):
+        chunk = ((hashes >> _SHIFTS[j]) & _MASK).astype(np.int64)
+        order[j] = np.argsort(chunk, kind="stable")
+        offsets[j, 0] = 0
+        offsets[j, 1:] = np.cumsum(np.bincount(chunk, minlength=_BUCKETS))
+    return order, offsets
+
+
+class _Base:
+    """Immutable arrays for one build; swapped whole on merge."""
+    __slots__ = ("hashes", "keys", "order", "offsets")
+
+    def __init__(self, hashes, keys, order=None, offsets=None):
+        self.hashes, self.keys = hashes, keys
+        if order is None:
+            order, offsets = _build_tables(hashes)
+        self.order, self.offsets = order, offsets
+
+
+class HashIndex:
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._base = _Base(np.zeros(0, dtype=np.uint64), np.zeros(0, dtype="S1"))
+        self._dh: List[int] = []           # delta rows not yet in the arrays
+        self._dk: List[bytes] = []
+        self._delta_view = (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype="S1"))
+        self._lock = threading.Lock()
+        self._log_offset = 0
+        self._next_poll = 0.0
+        self._merging = False
+
+    def __len__(self):
+        return len(self._base.hashes) + len(self._dh)
+
+    # ---- persistence ----
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "HashIndex":
+        idx = cls(path)
+        p = Path(path)
+        if (p / "meta.json").exists():
+            mode = "r" if mmap else None
+            idx._base = _Base(np.load(p / "hashes.npy", mmap_mode=mode), np.load(p / "keys.npy", mmap_mode=mode),
+                              np.load(p / "order.npy", mmap_mode=mode), np.load(p / "offsets.npy", mmap_mode=mode))
+        idx._tail_log(force=True)
+        return idx
+
+    def save(self, path: Optional[str] = None):
+        """Write base + delta as fresh arrays (tmp files, then rename) and clear the delta log."""
+        p = Path(path) if path else self.path
+        p.mkdir(parents=True, exist_ok=True)
+        hashes, keys = self._all()
+        base = self._base
+        if len(hashes) == len(base.hashes):
+            order, offsets = base.order, base.offsets
+        else:
+            order, offsets = _build_tables(hashes)
+        for name, arr in (("hashes", hashes), ("keys", keys), ("order", order), ("offsets", offsets)):
+            tmp = p / f".{name}.tmp.npy"
+            np.save(tmp, arr)
+            os.replace(tmp, p / f"{name}.npy")
+        (p / "meta.json").write_text(json.dumps({"count": int(len(hashes)), "chunks": CHUNKS, "chunk_bits": CHUNK_BITS}))
+        (p / "delta.jsonl").write_text("")
+        return {"path": str(p), "count": int(len(hashes))}
+
+    def _all(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            dh, dk = list(self._dh), list(self._dk)
+        base = self._base
+        keys = np.concatenate([base.keys.astype("S"), np.array(dk, dtype="S")]) if dk else np.asarray(base.keys)
+        return np.concatenate([np.asarray(base.hashes), np.array(dh, dtype=np.uint64)]), keys
+
+    def _tail_log(self, force: bool = False):
+        """Pick up rows other workers appended to delta.jsonl."""
+        if self.path is None or (not force and time.monotonic() < self._next_poll):
+            return
+        self._next_poll = time.monotonic() + PHASH_POLL_SECONDS
+        log = self.path / "delta.jsonl"
+        try:
+            size = log.stat().st_size
+        except OSError:
+            return
+        if size < self._log_offset:        # compacted elsewhere: the arrays now hold those rows
+            fresh = HashIndex.load(str(self.path))
+            with self._lock:
+                self._base, self._dh, self._dk = fresh._base, fresh._dh, fresh._dk
+                self._log_offset = fresh._log_offset
+                self._refresh_delta()
+            return
+        with self._lock:        # one reader at a time, or two threads would both take the same rows
+            if size <= self._log_offset:
+                return
+            with open(log, "rb") as f:
+                f.seek(self._log_offset)
+                chunk = f.read(size - self._log_offset)
+            end = chunk.rfind(b"\n") + 1        # a line still being written is read next time
+            rows = [json.loads(line) for line in chunk[:end].splitlines() if line.strip()]
+            self._log_offset += end
+            for r in rows:
+                self._dh.append(int(r["hash"], 16))
+                self._dk.append(str(r["key"]).encode())
+            self._refresh_delta()
+        self._maybe_merge()
+
+    def _refresh_delta(self):
+        self._delta_view = (np.array(self._dh, dtype=np.uint64), np.array(self._dk, dtype="S"))
+
+    # ---- updates ----
+    def add(self, h: int, key: str, persist: bool = True):
+        if persist and self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            line = json.dumps({"hash": format(h, "016x"), "key": str(key)}) + "\n"
+            # one O_APPEND write per row, so concurrent workers never interleave lines;
+            # the row comes back to this worker through _tail_log like everyone else's
+            fd = os.open(self.path / "delta.jsonl", os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+            self._tail_log(force=True)
+            return
+        with self._lock:
+            self._dh.append(int(h))
+            self._dk.append(str(key).encode())
+            self._refresh_delta()
+        self._maybe_merge()
+
+    def add_many(self, hashes: Iterable[int], keys: Iterable[str]):
+        with self._lock:
+            self._dh.extend(int(h) for h in hashes)
+            self._dk.extend(str(k).encode() for k in keys)
+            self._refresh_delta()
+        self._maybe_merge(block=True)
+
+    def _maybe_merge(self, block: bool = False):
+        with self._lock:
+            if self._merging or len(self._dh) < (1 if block else PHASH_DELTA_MERGE):
+                return
+            self._merging = True
+        if block:
+            self._merge()
+        else:
+            threading.Thread(target=self._merge, name="phash-merge", daemon=True).start()
+
+    def _merge(self):
+        """Fold the current delta into new arrays off the query path; rows added meanwhile stay in the delta."""
+        try:
+            with self._lock:
+                k = len(self._dh)
+                dh, dk = self._dh[:k], self._dk[:k]
+            base = self._base
+            hashes = np.concatenate([np.asarray(base.hashes), np.array(dh, dtype=np.uint64)])
+            keys = np.concatenate([np.asarray(base.keys).astype("S"), np.array(dk, dtype="S")])
+            new = _Base(hashes, keys)
+            with self._lock:
+                self._base = new
+                del self._dh[:k], self._dk[:k]
+                self._refresh_delta()
+        finally:
+            self._merging = False
+
+    # ---- queries ----
+    def query(self, h: int, radius: int = 8, k: int = 5) -> List[Dict[str, Any]]:
+        """Up to k rows within Hamming distance `radius` of h, nearest first (exhaustive up to radius 15)."""
+        self._tail_log()
+        q = np.uint64(h)
+        base, (dh, dk) = self._base, self._delta_view
+        r_chunk = min(radius // CHUNKS, len(_PROBES) - 1)
+        probes = _PROBES[r_chunk]
+        parts = []
+        if len(base.hashes):
+            for j in range(CHUNKS):
+                buckets = ((q >> _SHIFTS[j]) & _MASK) ^ probes
+                lo = base.offsets[j][buckets.astype(np.int64)]
+                hi = base.offsets[j][buckets.astype(np.int64) + 1]
+                nonempty = hi > lo
+                lo, hi = lo[nonempty], hi[nonempty]
+                if not len(lo):
+                    continue
+                lens = hi - lo
+                # concatenated slices order[j][lo:hi] without a Python loop
+                starts = np.repeat(lo - np.concatenate([[0], np.cumsum(lens)[:-1]]), lens)
+                parts.append(np.asarray(base.order[j])[starts + np.arange(lens.sum())])
+        hits = []
+        if parts:
+            cand = np.unique(np.concatenate(parts))
+            d = popcount(np.asarray(base.hashes)[cand] ^ q)
+            ok = d <= radius
+            hits += list(zip(d[ok].tolist(), (base.keys[i] for i in cand[ok])))
+        if len(dh):
+            d = popcount(dh ^ q)
+            ok = np.flatnonzero(d <= radius)
+            hits += list(zip(d[ok].tolist(), dk[ok]))
+        hits.sort(key=lambda t: t[0])
+        return [{"key": key.decode() if isinstance(key, bytes) else str(key), "distance": int(dist)}
+                for dist, key in hits[:k]]
+
+    def status(self) -> Dict[str, Any]:
+        return {"path": str(self.path) if self.path else None, "rows": len(self),
+                "base_rows": int(len(self._base.hashes)), "delta_rows": len(self._dh)}
+
+
+# ---------- offline ----------
+def _hash_file(path: str) -> Optional[int]:
+    try:
+        with open(path, "rb") as f:
+            return phash_bytes(f.read())
+    except Exception:
+        return None
+
+
+def build(csv_path: str, out: str, image_col: str = "image_file", key_col: str = "certificate_serial_number",
+          workers: int = None) -> Dict[str, Any]:
+    """Hash every registry row's image (paths relative to the CSV) into a fresh index at `out`."""
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+    df = pd.read_csv(csv_path, usecols=[image_col, key_col]).dropna()
+    root = Path(csv_path).resolve().parent
+    paths = [str(root / p) for p in df[image_col].astype(str)]
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        hashes = list(ex.map(_hash_file, paths, chunksize=256))
+    ok = [i for i, h in enumerate(hashes) if h is not None]
+    idx = HashIndex(out)
+    keys = df[key_col].astype(str).tolist()
+    idx.add_many((hashes[i] for i in ok), (keys[i] for i in ok))
+    info = idx.save()
+    info.update(rows=len(df), missing=len(df) - len(ok), seconds=round(time.perf_counter() - t0, 2))
+    print(json.dumps(info))
+    return info
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Perceptual-hash index tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("build", help="hash the registry's certificate images")
+    p.add_argument("--csv", required=True)
+    p.add_argument("--out", default="cache/phash")
+    p.add_argument("--image-col", default="image_file")
+    p.add_argument("--key-col", default="certificate_serial_number")
+    p.add_argument("--workers", type=int, default=None)
+    p = sub.add_parser("compact", help="fold delta.jsonl into the arrays (run while serving is stopped)")
+    p.add_argument("--dir", default="cache/phash")
+    p = sub.add_parser("query", help="nearest registered images to a scan")
+    p.add_argument("--dir", default="cache/phash")
+    p.add_argument("--image", required=True)
+    p.add_argument("--radius", type=int, default=10)
+    p.add_argument("-k", type=int, default=5)
+    args = ap.parse_args()
+    if args.cmd == "build":
+        build(args.csv, args.out, args.image_col, args.key_col, args.workers)
+    elif args.cmd == "compact":
+        print(json.dumps(HashIndex.load(args.dir, mmap=False).save()))
+    else:
+        h = _hash_file(args.image)
+        t = time.perf_counter()
+        matches = HashIndex.load(args.dir).query(h, args.radius, args.k)
+        print(json.dumps({"phash": format(h, "016x"), "matches": matches,
+                          "query_ms": round((time.perf_counter() - t) * 1000, 3)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# backend/pipeline.py
+# Async verification DAG used by /agent_ai.
+#
+#   registry ──┐
+#   domain ────┴──> institution ──────────────┐
+#   ocr ──> fields ──> serial (from OCR) ──────┤
+#   ela ───────────────────────────────────────┼──> features ──> models ──> decision
+#   serial (from metadata), accreditation,     │
+#   dates ─────────────────────────────────────┘
+#   phash (near-duplicate scans) ──────────────────────────────────────> decision
+#
+# Independent checks run concurrently; blocking work goes to executors (OCR and
+# network probes to their own bounded pools, the rest to the loop's default one). Every check has a
+# deadline (DEADLINE_<CHECK> seconds), started only once the startup components
+# have loaded, so a cold component never eats into a check's budget. A check
+# that times out or fails is reported under result["checks"] / result["partial"]
+# and the verdict is made from what did finish; evidence with a missing check is not cached. An upload
+# decoded once by ingest.decode (payload["image"]) is shared by OCR and phash; ELA
+# decodes at native resolution unless that decode kept full size.
+import os, time, asyncio, functools, contextvars, weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import agent_ai
+import metrics
+import startup
+
+_DEFAULT_DEADLINES = {"registry": 2, "domain": 8, "ocr": 45, "ela": 15, "fields": 2,
+                      "serial": 2, "accreditation": 2, "dates": 1, "phash": 2, "models": 5}
+DEADLINES = {name: float(os.environ.get("DEADLINE_" + name.upper(), default))
+             for name, default in _DEFAULT_DEADLINES.items()}
+NET_SLOTS = int(os.environ.get("PIPELINE_NET_SLOTS", 32))     # concurrent outbound domain probes
+OCR_SLOTS = int(os.environ.get("PIPELINE_OCR_SLOTS", max(1, os.cpu_count() or 1)))
+
+# tesseract runs as a subprocess, so threads are enough to keep OCR off the event loop;
+# network probes mostly wait, so they get their own pool instead of the small default one
+_OCR_EXECUTOR = ThreadPoolExecutor(max_workers=OCR_SLOTS, thread_name_prefix="ocr")
+_NET_EXECUTOR = ThreadPoolExecutor(max_workers=NET_SLOTS, thread_name_prefix="net")
+
+_CREDENTIAL_CHECKS = ("ocr", "ela", "fields", "serial", "accreditation", "dates")
+_INSTITUTION_CHECKS = ("registry", "domain")
+
+
+# semaphores belong to one event loop (tests and reloads may run several)
+_LIMITS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def _limits(loop) -> Dict[str, asyncio.Semaphore]:
+    lim = _LIMITS.get(loop)
+    if lim is None:
+        lim = {"net": asyncio.Semaphore(NET_SLOTS), "ocr": asyncio.Semaphore(OCR_SLOTS)}
+        _LIMITS[loop] = lim
+    return lim
+
+
+def _release(sem: asyncio.Semaphore, fut: asyncio.Future):
+    sem.release()
+    if not fut.cancelled():
+        fut.exception()     # retrieved, so a check that failed after its deadline isn't logged as unhandled
+
+
+async def _check(checks: Dict[str, Any], name: str, fn, *args, executor=None, slot: Optional[str] = None):
+    """Run fn(*args) off the loop under the check's deadline; record status and time in checks[name]."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args)   # keeps the pinned registry snapshot
+
+    async def run():
+        if slot is None:
+            return await loop.run_in_executor(executor, call)
+        sem = _limits(loop)[slot]
+        await sem.acquire()
+        try:
+            fut = loop.run_in_executor(executor, call)
+        except BaseException:
+            sem.release()
+            raise
+        # the slot is held until the worker thread is done, not just until the deadline:
+        # a timed-out check keeps running, and freeing its slot would oversubscribe the pool
+        fut.add_done_callback(functools.partial(_release, sem))
+        return await asyncio.shield(fut)
+
+    t0 = time.perf_counter()
+    entry: Dict[str, Any] = {"status": "ok"}
+    try:
+        result = await asyncio.wait_for(run(), DEADLINES[name])
+    except asyncio.TimeoutError:
+        result, entry["status"] = None, "timeout"
+    except Exception as e:
+        result, entry["status"], entry["error"] = None, "error", str(e)
+    elapsed = time.perf_counter() - t0
+    entry["ms"] = round(elapsed * 1000, 1)
+    metrics.observe(name, elapsed, family="check", error=entry["status"] != "ok")
+    checks[name] = entry
+    return result
+
+
+def _complete(checks, names) -> bool:
+    return all(checks[n]["status"] == "ok" for n in names if n in checks)
+
+
+async def _institution(payload, checks) -> Dict[str, Any]:
+    name, website, code = payload.get("institute_name"), payload.get("institute_website"), payload.get("institute_code")
+    key = agent_ai.institution_cache_key(name, website, code)
+    got = agent_ai._RESULT_CACHE.get("institution", key)
+    if got is not None:
+        evidence, info = got
+        evidence["cache"] = info
+        return evidence
+    registry = asyncio.ensure_future(_check(checks, "registry", agent_ai.find_in_trusted, name, code))
+    domain = None
+    if website:
+        probe = functools.partial(agent_ai._DOMAIN_INTEL.probe, website, timeout=DEADLINES["domain"])
+        domain = asyncio.ensure_future(_check(checks, "domain", probe, executor=_NET_EXECUTOR, slot="net"))
+    trusted = await registry or (False, None, 0)
+    intel = None
+    if domain is not None:
+        intel = await domain or {"website": {"ok": False, "status": checks["domain"]["status"]},
+                                 "whois_age_days": None, "mx_ok": False, "cache": {}}
+    evidence = agent_ai.institution_evidence(name, code, trusted, intel)
+    if _complete(checks, _INSTITUTION_CHECKS):
+        agent_ai._RESULT_CACHE.put("institution", key, evidence)
+    evidence["cache"] = {"hit": False}
+    return evidence
+
+
+async def _credential(payload, metadata, checks) -> Dict[str, Any]:
+    image_bytes, analysis, image = payload.get("image_bytes"), payload.get("image_analysis"), payload.get("image")
+    key = agent_ai.credential_cache_key(metadata, image_bytes, analysis)
+    got = agent_ai._RESULT_CACHE.get("credential", key)
+    if got is not None:
+        evidence, info = got
+        evidence["cache"] = info
+        return evidence
+
+    evidence = agent_ai.new_credential_evidence()
+    has_image = bool(image_bytes) and analysis is None
+    ocr = asyncio.ensure_future(_check(
+        checks, "ocr", agent_ai.image_evidence, metadata, image_bytes, analysis, True, False, image,
+        executor=_OCR_EXECUTOR if has_image else None, slot="ocr" if has_image else None))
+    ela = None
+    if has_image and not agent_ai.is_pdf(image_bytes):
+        ela = asyncio.ensure_future(_check(checks, "ela", agent_ai.image_evidence, metadata, image_bytes, None, False, True, image,
+                                           slot="ocr"))
+    meta_serial = metadata.get("certificate_serial_number")
+    serial = asyncio.ensure_future(_check(checks, "serial", agent_ai.serial_check, meta_serial)) if meta_serial else None
+    accreditation = asyncio.ensure_future(_check(checks, "accreditation", agent_ai.accreditation_check, metadata))
+    dates = asyncio.ensure_future(_check(checks, "dates", agent_ai.date_check, metadata))
+
+    ocr_text, image_e = await ocr or ("", {})
+    evidence.update(image_e)
+    fields_e = await _check(checks, "fields", agent_ai.field_evidence, metadata, ocr_text)
+    evidence.update(fields_e or agent_ai.field_evidence(metadata, ""))
+    if serial is None and evidence["fields"].get("serial"):
+        serial = asyncio.ensure_future(_check(checks, "serial", agent_ai.serial_check, evidence["fields"]["serial"]))
+    if ela is not None:
+        evidence.update((await ela or ("", {}))[1])
+    if serial is not None:
+        evidence["serial_check"] = await serial
+    evidence["accreditation_ok"] = await accreditation
+    evidence["date_check"] = await dates
+    if _complete(checks, _CREDENTIAL_CHECKS):
+        agent_ai._RESULT_CACHE.put("credential", key, evidence)
+    evidence["cache"] = {"hit": False}
+    return evidence
+
+
+async def run_agent_async(payload) -> Dict[str, Any]:
+    """Async counterpart of agent_ai.run_agent: same result, plus "checks" and, if any check missed, "partial"."""
+    metadata = payload.get("metadata") or {}
+    loop = asyncio.get_running_loop()
+    # deadlines cover the checks, not component loading: wait out startup before any clock starts
+    if startup.pending():
+        await loop.run_in_executor(None, startup.ensure_loaded)
+    # first call may load the tenant's shard
+    tenant, snapshot = await loop.run_in_executor(None, agent_ai.snapshot_for, payload)
+    token = agent_ai._SNAPSHOT.set(snapshot)
+    try:
+        version = agent_ai.registry_version()
+        checks: Dict[str, Any] = {}
+        image_bytes, image = payload.get("image_bytes"), payload.get("image")
+        # outside the credential cache: the answer changes as scans are added to the index
+        match = asyncio.ensure_future(_check(checks, "phash", agent_ai.image_match, metadata, image_bytes, image)) \
+            if image_bytes else None
+        inst_e, cred_e = await asyncio.gather(_institution(payload, checks), _credential(payload, metadata, checks))
+        match = await match if match is not None else None
+        feats = agent_ai.build_features(metadata, cred_e, payload.get("image_bytes"))
+        scores = await _check(checks, "models", agent_ai.score_features, feats[None, :]) or {}
+        ms = {k: (float(v[0]) if v is not None else None) for k, v in scores.items()} \
+            or {"tamper_prob": None, "anomaly_score": None}
+    finally:
+        agent_ai._SNAPSHOT.reset(token)
+    result = agent_ai.assemble_result(payload, inst_e, cred_e, feats, ms, version, tenant, match)
+    missed = [n for n, c in checks.items() if c["status"] != "ok"]
+    if missed:
+        result["partial"] = missed
+        result["decision"]["reasons"] += [f"check_{checks[n]['status']}:{n}" for n in missed]
+    result["checks"] = checks
+    return result
@@ -0,0 +1,194 @@
+# backend/registry.py
+# Hot-reloadable trusted registry.
+#
+# The base CSV is loaded once (through the shared index artifact, see
+# trusted_index.load_trusted); after that only new bytes are parsed:
+#   - rows appended to the base CSV
+#   - append-only delta files (*.csv with a header row, or *.jsonl) in the
+#     delta directory, read from the last offset seen per file
+# Each change builds a new TrustedData with TrustedData.extended() and swaps
+# it in as one reference assignment (copy-on-write), so a request that took a
+# snapshot keeps a consistent view until it finishes. A file that shrinks or
+# is rewritten can't be applied as a delta and triggers a full reload.
+import os, io, time, hashlib, threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from trusted_index import TrustedData, load_trusted
+
+DELTA_SUFFIXES = (".csv", ".jsonl")
+_TAIL_CHECK = 64   # bytes before the offset compared to tell an append from a rewrite
+
+
+class _Tail:
+    """Read position in one append-only file."""
+
+    def __init__(self, path: str, offset: int = 0, header: bytes = b"", tail: bytes = b""):
+        self.path = path
+        self.offset = offset
+        self.header = header
+        self.tail = tail
+
+
+def _read_head_tail(f, offset: int):
+    f.seek(0)
+    header = f.readline()
+    f.seek(max(0, offset - _TAIL_CHECK))
+    return header, f.read(min(offset, _TAIL_CHECK))
+
+
+def _parse(path: str, header: bytes, chunk: bytes) -> pd.DataFrame:
+    if path.endswith(".jsonl"):
+        return pd.read_json(io.BytesIO(chunk), lines=True)
+    return pd.read_csv(io.BytesIO(header + chunk))
+
+
+class TrustedRegistry:
+    def __init__(self, csv_path: Optional[str], artifact_dir: Optional[str] = "cache",
+                 delta_dir: Optional[str] = None, poll_interval: float = 0.0, columns: Optional[List[str]] = None):
+        self.csv_path = csv_path
+        self.columns = columns
+        self.artifact_dir = artifact_dir
+        self.delta_dir = delta_dir
+        self.poll_interval = poll_interval
+        self._data: Optional[TrustedData] = None
+        self._tails: Dict[str, _Tail] = {}
+        self._digest = hashlib.sha256()
+        self.version: Optional[str] = None
+        self.stats = {"reloads": 0, "deltas": 0, "rows_ingested": 0, "errors": 0, "last_change": None}
+        self._lock = threading.Lock()            # serializes writers; readers never take it
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- readers ----
+    def current(self) -> Optional[TrustedData]:
+        return self._data
+
+    def status(self) -> Dict[str, Any]:
+        data = self._data
+        return {"version": self.version, "rows": len(data) if data is not None else 0,
+                "csv": self.csv_path, "delta_dir": self.delta_dir,
+                "files": {p: t.offset for p, t in self._tails.items()}, **self.stats}
+
+    # ---- writers ----
+    def load(self) -> Optional[TrustedData]:
+        """Full (re)load: base CSV via the index artifact, then every delta file from offset 0."""
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        if not (self.csv_path and os.path.exists(self.csv_path)):
+            return None
+        size = os.path.getsize(self.csv_path)
+        data = load_trusted(self.csv_path, self.artifact_dir, self.columns)
+        self._tails = {}
+        self._digest = hashlib.sha256(f"{os.path.abspath(self.csv_path)}|{size}|{len(data)}".encode())
+        with open(self.csv_path, "rb") as f:
+            header, tail = _read_head_tail(f, size)
+        self._tails[self.csv_path] = _Tail(self.csv_path, size, header, tail)
+        self._swap(data)
+        self.stats["reloads"] += 1
+        self._poll()
+        return self._data
+
+    def _swap(self, data: TrustedData):
+        self.version = data.version = self._digest.hexdigest()[:12]
+        self._data = data
+        self.stats["last_change"] = time.time()
+
+    def _delta_files(self):
+        if not (self.delta_dir and os.path.isdir(self.delta_dir)):
+            return []
+        return sorted(str(p) for p in Path(self.delta_dir).iterdir()
+                      if p.is_file() and p.suffix.lower() in DELTA_SUFFIXES)
+
+    def _read_new(self, path: str):
+        """-> (frame of complete new lines | None, needs_full_reload)."""
+        is_csv = not path.endswith(".jsonl")
+        size = os.path.getsize(path)
+        t = self._tails.get(path)
+        with open(path, "rb") as f:
+            if t is None:
+                header = f.readline() if is_csv else b""
+                t = _Tail(path, len(header), header)
+                _, t.tail = _read_head_tail(f, t.offset)   # a header-only file must not look rewritten next poll
+            else:
+                header, tail = _read_head_tail(f, t.offset)
+                if size < t.offset or (is_csv and header != t.header) or tail != t.tail:
+                    return None, True
+            self._tails[path] = t
+            if size <= t.offset:
+                return None, False
+            f.seek(t.offset)
+            chunk = f.read(size - t.offset)
+            chunk = chunk[:chunk.rfind(b"\n") + 1]   # a writer may be mid-line: leave it for the next poll
+            start, t.offset = t.offset, t.offset + len(chunk)
+            _, t.tail = _read_head_tail(f, t.offset)
+        if not chunk.strip():
+            return None, False
+        self._digest.update(f"{path}|{start}|{t.offset};".encode())
+        return _parse(path, t.header, chunk), False
+
+    def poll(self) -> Dict[str, Any]:
+        """Apply whatever was appended since the last poll. -> {"version", "rows_added", "reloaded"}"""
+        with self._lock:
+            return self._poll()
+
+    def _poll(self):
+        before = self.version
+        if self._data is None:
+            return {"version": self.version, "rows_added": 0, "reloaded": False}
+        frames = []
+        for path in [self.csv_path] + self._delta_files():
+            try:
+                if not os.path.exists(path):
+                    continue
+                frame, rewrite = self._read_new(path)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print("registry: could not read", path, "-", e)
+                continue
+            if rewrite:
+                print("registry:", path, "was rewritten; full reload")
+                self._load()
+                return {"version": self.version, "rows_added": 0, "reloaded": True}
+            if frame is not None and not frame.empty:
+                frames.append(frame)
+        added = sum(len(f) for f in frames)
+        if frames:
+            self._swap(self._data.extended(pd.concat(frames, ignore_index=True)))
+            self.stats["deltas"] += len(frames)
+            self.stats["rows_ingested"] += added
+            print("registry: ingested", added, "rows; version", before, "->", self.version)
+        return {"version": self.version, "rows_added": added, "reloaded": False}
+
+    def ingest(self, frame: pd.DataFrame, source: str = "api") -> Dict[str, Any]:
+        """Append rows that did not come from a watched file."""
+        with self._lock:
+            if self._data is None or frame is None or frame.empty:
+                return {"version": self.version, "rows_added": 0}
+            self._digest.update(f"{source}|{int(pd.util.hash_pandas_object(frame, index=False).sum())};".encode())
+            self._swap(self._data.extended(frame))
+            self.stats["rows_ingested"] += len(frame)
+            return {"version": self.version, "rows_added": len(frame)}
+
+    # ---- background watcher ----
+    def start(self):
+        if self.poll_interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="registry-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print("registry: poll failed:", e)
@@ -0,0 +1,227 @@
+# backend/registry_audit.py
+# Offline integrity audit of the whole trusted registry, column-wise (no per-row Python):
+#   duplicate serials   : factorize + bincount over the stripped serial column
+#   dates               : issuance / convocation parsed as DD-MM-YYYY (the CSV) then
+#                         ISO (deltas / metadata); unparseable, inverted and future dates
+#   marks               : outside 0..100
+#   anomaly             : the served IsolationForest (compact export when present)
+#                         scores every row; decision_function < 0 is an outlier
+# Row flags are a bitmask; per serial they are OR-ed together, and only flagged
+# serials are written, so the online lookup is one dict hit:
+#   <out>/report.json         counts, worst duplicate groups / anomalies, timings
+#   <out>/serial_flags.json   {"source", "generated_at", "flags": {serial: [mask, min_anomaly_score]}}
+#   <out>/flagged_rows.csv    every flagged row with its reasons
+#
+#   python registry_audit.py run [--csv data.csv] [--out cache/audit]
+import os, json, time, argparse, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import compact_forest
+import train_agent
+from result_cache import files_fingerprint
+
+SERIAL_COL = "certificate_serial_number"
+DATE_COLS = ("issuance_date", "convocation_date")
+DATE_FORMATS = ("%d-%m-%Y", "%Y-%m-%d")
+REF_COLS = ("unique_registration_roll_number", "student_id", "institute_name")
+AUDIT_DIR = os.environ.get("REGISTRY_AUDIT_DIR", "cache/audit")
+
+FLAGS = {
+    "duplicate_serial": 1,
+    "convocation_before_issuance": 2,
+    "issuance_unparseable": 4,
+    "convocation_unparseable": 8,
+    "issuance_in_future": 16,
+    "marks_out_of_range": 32,
+    "isolation_forest_outlier": 64,
+}
+
+
+def flag_names(mask: int) -> List[str]:
+    return [name for name, bit in FLAGS.items() if mask & bit]
+
+
+def parse_dates(s: pd.Series) -> pd.Series:
+    """Each format in turn over the rows still unparsed; NaT where none fits."""
+    text = s.astype("string").str.strip()
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    for fmt in DATE_FORMATS:
+        todo = out.isna() & text.notna()
+        if not todo.any():
+            break
+        out[todo] = pd.to_datetime(text[todo], format=fmt, errors="coerce")
+    return out
+
+
+def _read(csv_path: str) -> pd.DataFrame:
+    head = pd.read_csv(csv_path, nrows=0).columns
+    want = set(train_agent.FEATURES) | {SERIAL_COL, *DATE_COLS, *REF_COLS}
+    cols = [c for c in head if c in want]
+    dtypes = {c: "string" for c in (SERIAL_COL, *DATE_COLS, *REF_COLS) if c in head}
+    try:
+        return pd.read_csv(csv_path, usecols=cols, dtype=dtypes, engine="pyarrow")
+    except (ImportError, ValueError):
+        return pd.read_csv(csv_path, usecols=cols, dtype=dtypes)
+
+
+def _anomaly_model(model_dir: Path):
+    path = model_dir / train_agent.ANOMALY_NAME
+    mp = model_dir / train_agent.MANIFEST_NAME
+    manifest = json.loads(mp.read_text()) if mp.exists() else None
+    reason = train_agent.check_compatible(manifest, train_agent.FEATURES) if manifest else None
+    if reason:
+        print("registry_audit: not scoring rows:", reason)
+        return None
+    model = compact_forest.load_for(path)
+    if model is None and path.exists():
+        model = joblib.load(path)
+    return model
+
+
+def audit(csv_path: str, out_dir: str = AUDIT_DIR, model_dir: Optional[str] = None,
+          today: Optional[datetime.date] = None, top: int = 20) -> Dict[str, Any]:
+    timings = {}
+    t = time.perf_counter()
+    df = _read(csv_path)
+    n = len(df)
+    timings["read_s"] = time.perf_counter() - t
+    flags = np.zeros(n, dtype=np.uint16)
+
+    # duplicate serials
+    t = time.perf_counter()
+    serial = df[SERIAL_COL].str.strip() if SERIAL_COL in df else pd.Series(pd.NA, index=df.index, dtype="string")
+    codes, uniques = pd.factorize(serial)            # NA -> -1
+    has_serial = codes >= 0
+    group_size = np.zeros(n, dtype=np.int64)
+    counts = np.bincount(codes[has_serial], minlength=len(uniques))
+    group_size[has_serial] = counts[codes[has_serial]]
+    flags[group_size > 1] |= FLAGS["duplicate_serial"]
+    timings["serials_s"] = time.perf_counter() - t
+
+    # dates
+    t = time.perf_counter()
+    dates = {c: parse_dates(df[c]) if c in df else pd.Series(pd.NaT, index=df.index) for c in DATE_COLS}
+    iss, conv = dates["issuance_date"], dates["convocation_date"]
+    for c, name in (("issuance_date", "issuance_unparseable"), ("convocation_date", "convocation_unparseable")):
+        if c in df:
+            flags[(df[c].notna() & dates[c].isna()).to_numpy()] |= FLAGS[name]
+    flags[(conv < iss).to_numpy()] |= FLAGS["convocation_before_issuance"]
+    flags[(iss > pd.Timestamp(today or datetime.date.today())).to_numpy()] |= FLAGS["issuance_in_future"]
+    timings["dates_s"] = time.perf_counter() - t
+
+    # marks
+    marks = pd.to_numeric(df["marks_percent"], errors="coerce") if "marks_percent" in df else pd.Series(np.nan, index=df.index)
+    flags[((marks < 0) | (marks > 100)).to_numpy()] |= FLAGS["marks_out_of_range"]
+
+    # anomaly scores
+    t = time.perf_counter()
+    scores = np.full(n, np.nan, dtype=np.float32)
+    model = _anomaly_model(Path(model_dir) if model_dir else train_agent.OUT_DIR)
+    if model is not None and n:
+        X, _ = train_agent.build_features(df)
+        scores = model.decision_function(X).astype(np.float32)
+        flags[scores < 0] |= FLAGS["isolation_forest_outlier"]
+    timings["anomaly_s"] = time.perf_counter() - t
+
+    # per-serial reduction: OR of row flags, min anomaly score
+    t = time.perf_counter()
+    rows = np.flatnonzero(has_serial)
+    order = rows[np.argsort(codes[rows], kind="stable")]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]) if len(uniques) else np.zeros(0, dtype=np.int64)
+    serial_flags = np.bitwise_or.reduceat(flags[order], starts) if len(order) else np.zeros(0, dtype=np.uint16)
+    safe = np.where(np.isnan(scores), np.inf, scores)
+    serial_min = np.minimum.reduceat(safe[order], starts) if len(order) else np.zeros(0, dtype=np.float32)
+    flagged = np.flatnonzero(serial_flags)
+    table = {str(uniques[i]): [int(serial_flags[i]), None if np.isinf(serial_min[i]) else round(float(serial_min[i]), 5)]
+             for i in flagged}
+    timings["reduce_s"] = time.perf_counter() - t
+
+    # outputs
+    t = time.perf_counter()
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    source = {"csv": str(Path(csv_path).resolve()), "fingerprint": files_fingerprint([csv_path])}
+    generated = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    tmp = out / ".serial_flags.json.tmp"
+    tmp.write_text(json.dumps({"source": source, "generated_at": generated, "flag_bits": FLAGS, "flags": table}))
+    os.replace(tmp, out / "serial_flags.json")
+
+    row_mask = flags != 0
+    flagged_rows = df.loc[row_mask, [c for c in (*REF_COLS, SERIAL_COL, *DATE_COLS) if c in df]].copy()
+    flagged_rows["flags"] = [";".join(flag_names(int(m))) for m in flags[row_mask]]
+    flagged_rows["anomaly_score"] = scores[row_mask]
+    flagged_rows.to_csv(out / "flagged_rows.csv", index=False)
+
+    dup_groups = np.flatnonzero(counts > 1)
+    worst = dup_groups[np.argsort(-counts[dup_groups], kind="stable")[:top]]
+    anomalies = np.argsort(safe, kind="stable")[:top]
+    anomalies = anomalies[safe[anomalies] < 0]
+    ref = df[REF_COLS[0]] if REF_COLS[0] in df else pd.Series(pd.NA, index=df.index)
+    report = {
+        "source": source, "generated_at": generated, "rows": n,
+        "flag_counts": {name: int(np.count_nonzero(flags & bit)) for name, bit in FLAGS.items()},
+        "rows_flagged": int(row_mask.sum()), "serials": int(len(uniques)), "serials_flagged": int(len(flagged)),
+        "rows_without_serial": int((~has_serial).sum()),
+        "duplicate_groups": int(len(dup_groups)),
+        "largest_duplicate_groups": [{"serial": str(uniques[i]), "rows": int(counts[i])} for i in worst],
+        "top_anomalies": [{"ref": None if pd.isna(ref.iat[i]) else str(ref.iat[i]),
+                           "serial": None if codes[i] < 0 else str(uniques[codes[i]]),
+                           "anomaly_score": round(float(scores[i]), 5)} for i in anomalies],
+        "anomaly_model": type(model).__name__ if model is not None else None,
+    }
+    timings["write_s"] = time.perf_counter() - t
+    report["timings_s"] = {k: round(v, 3) for k, v in timings.items()}
+    report["total_s"] = round(sum(timings.values()), 3)
+    (out / "report.json").write_text(json.dumps(report, indent=2))
+    return report
+
+
+class SerialFlags:
+    """Online side: serial -> (flag names, min anomaly score) from serial_flags.json, one dict hit."""
+
+    def __init__(self, table: Dict[str, List[Any]], source: Dict[str, Any], generated_at: str):
+        self._table = table
+        self.source = source
+        self.generated_at = generated_at
+
+    @classmethod
+    def load(cls, out_dir: str = AUDIT_DIR) -> Optional["SerialFlags"]:
+        p = Path(out_dir) / "serial_flags.json"
+        if not p.exists():
+            return None
+        spec = json.loads(p.read_text())
+        return cls(spec["flags"], spec.get("source") or {}, spec.get("generated_at"))
+
+    def __len__(self):
+        return len(self._table)
+
+    def lookup(self, serial) -> Optional[Dict[str, Any]]:
+        hit = self._table.get(str(serial).strip()) if serial is not None else None
+        if hit is None:
+            return None
+        return {"flags": flag_names(hit[0]), "anomaly_score": hit[1], "audited_at": self.generated_at}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline registry integrity audit")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("run", help="audit the registry CSV and write report + per-serial flags")
+    p.add_argument("--csv", default=None)
+    p.add_argument("--out", default=AUDIT_DIR)
+    p.add_argument("--model-dir", default=None)
+    p.add_argument("--top", type=int, default=20)
+    args = ap.parse_args()
+    csv_path = args.csv or train_agent.default_csv()
+    if not csv_path:
+        ap.error("no registry CSV found; pass --csv")
+    report = audit(csv_path, args.out, args.model_dir, top=args.top)
+    print(json.dumps({k: report[k] for k in ("rows", "rows_flagged", "serials_flagged", "flag_counts", "total_s")}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
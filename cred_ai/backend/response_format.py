@@ -0,0 +1,106 @@
+# backend/response_format.py
+# Response shaping and serialization for verification results.
+#   verbosity : "verdict"  decision + the UI flags only
+#               "summary"  evidence without the bulk: no OCR text, page snippets,
+#                          ELA grid or features; registry rows become reference ids
+#               "full"     everything (the default, RESPONSE_VERBOSITY)
+#   dumps     : orjson when installed (numpy arrays / scalars natively, NaN -> null),
+#               else the stdlib encoder; pandas timestamps and NA handled by both,
+#               anything else unknown is a TypeError rather than its str()
+# Results are returned as FastJSONResponse, which skips FastAPI's jsonable_encoder
+# walk over the whole result.
+import os, json
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import Response
+
+from metrics import timed
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+VERBOSITY_LEVELS = ("verdict", "summary", "full")
+RESPONSE_VERBOSITY = os.environ.get("RESPONSE_VERBOSITY", "full").lower()
+
+# top-level keys every level keeps
+_VERDICT_KEYS = ("student_id", "tenant", "decision", "institute_verified", "certificate_verified",
+                 "registry_version", "partial", "error", "detail", "timings")
+# bulky evidence that "summary" drops (the ids/scores next to it stay)
+_CREDENTIAL_BULK = ("ocr_text", "ela_heatmap")
+
+
+def _default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if o is pd.NA or o is pd.NaT:
+        return None
+    if hasattr(o, "isoformat"):          # pandas Timestamp / datetime / date
+        return o.isoformat()
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f"{type(o).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return dumps(content)
+
+
+def valid_verbosity(v) -> bool:
+    return v is None or str(v).lower() in VERBOSITY_LEVELS
+
+
+def _summary_institution(inst_e: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(inst_e)
+    checks = dict(out.get("checks") or {})
+    if isinstance(checks.get("trusted_csv"), dict):
+        checks["trusted_csv"] = {k: v for k, v in checks["trusted_csv"].items() if k != "row"}
+    if isinstance(checks.get("website"), dict):
+        checks["website"] = {k: v for k, v in checks["website"].items() if k != "text_snippet"}
+    checks.pop("domain_cache", None)
+    out["checks"] = checks
+    return out
+
+
+def _summary_credential(cred_e: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: v for k, v in cred_e.items() if k not in _CREDENTIAL_BULK}
+    if isinstance(out.get("serial_check"), dict):
+        out["serial_check"] = {k: v for k, v in out["serial_check"].items() if k != "rows"}
+    return out
+
+
+def shape(result: Dict[str, Any], verbosity: str = None) -> Dict[str, Any]:
+    """A copy of a finalized result trimmed to `verbosity`; "full" returns it unchanged."""
+    level = (verbosity or RESPONSE_VERBOSITY).lower()
+    if level == "full" or not isinstance(result, dict):
+        return result
+    out = {k: result[k] for k in _VERDICT_KEYS if k in result}
+    if level == "verdict":
+        return out
+    if isinstance(result.get("institution_evidence"), dict):
+        out["institution_evidence"] = _summary_institution(result["institution_evidence"])
+    if isinstance(result.get("credential_evidence"), dict):
+        out["credential_evidence"] = _summary_credential(result["credential_evidence"])
+    for k in ("image_match", "model_scores", "cache", "checks", "upload"):
+        if k in result:
+            out[k] = result[k]
+    return out
@@ -0,0 +1,168 @@
+# backend/result_cache.py
+# Content-addressed cache for verification evidence.
+#   memory tier : LRU (OrderedDict) of JSON blobs
+#   disk tier   : optional SQLite file shared by workers on the same host
+# Entries carry a "generation" fingerprint of the trusted CSV and model files,
+# so editing either invalidates everything cached against the old data.
+import os, json, time, sqlite3, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+# Seconds each evidence type stays valid. Image-derived evidence only changes
+# with the image; institution evidence depends on live web/whois/DNS state.
+DEFAULT_TTLS = {
+    "credential": int(os.environ.get("CACHE_TTL_CREDENTIAL", 7 * 24 * 3600)),
+    "institution": int(os.environ.get("CACHE_TTL_INSTITUTION", 6 * 3600)),
+}
+
+
+def _json_default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    return str(o)
+
+
+def canonical_json(obj) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=_json_default)
+
+
+def make_key(*parts) -> str:
+    """sha256 over the parts; bytes are hashed raw, everything else canonicalized."""
+    h = hashlib.sha256()
+    for p in parts:
+        if isinstance(p, (bytes, bytearray, memoryview)):
+            h.update(b"b"); h.update(bytes(p))
+        else:
+            h.update(b"j"); h.update(canonical_json(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def files_fingerprint(paths: Iterable) -> str:
+    h = hashlib.sha256()
+    for p in paths:
+        if not p:
+            continue
+        try:
+            st = os.stat(p)
+            h.update(f"{p}|{st.st_size}|{st.st_mtime_ns};".encode())
+        except OSError:
+            h.update(f"{p}|missing;".encode())
+    return h.hexdigest()[:16]
+
+
+class VerificationCache:
+    def __init__(self, max_entries: int = 2048, ttls: Optional[Dict[str, int]] = None,
+                 db_path: Optional[str] = None, watch_paths: Iterable = (), check_interval: float = 5.0):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.watch_paths = list(watch_paths)
+        self.check_interval = check_interval
+        self._mem: "OrderedDict[Tuple[str, str], Tuple[str, float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = files_fingerprint(self.watch_paths)
+        self._checked_at = time.time()
+        self.stats = {"hits": 0, "misses": 0, "disk_hits": 0, "invalidations": 0}
+        self._db_path = db_path
+        self._local = threading.local()
+        if db_path:
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS entries (kind TEXT, key TEXT, generation TEXT, "
+                "created REAL, value TEXT, PRIMARY KEY (kind, key))")
+            self._db().commit()
+
+    # sqlite connections are per-thread (threadpool handlers)
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def generation(self) -> str:
+        now = time.time()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            gen = files_fingerprint(self.watch_paths)
+            if gen != self._generation:
+                with self._lock:
+                    self._mem.clear()
+                    self._generation = gen
+                    self.stats["invalidations"] += 1
+        return self._generation
+
+    def _lookup(self, kind: str, key: str):
+        gen = self.generation()
+        ttl = self.ttls.get(kind, 0)
+        now = time.time()
+        with self._lock:
+            item = self._mem.get((kind, key))
+            if item is not None:
+                blob, created, item_gen = item
+                if item_gen == gen and now - created <= ttl:
+                    self._mem.move_to_end((kind, key))
+                    return blob, "memory", now - created
+                del self._mem[(kind, key)]
+        if self._db_path:
+            try:
+                row = self._db().execute(
+                    "SELECT value, created, generation FROM entries WHERE kind=? AND key=?", (kind, key)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                blob, created, item_gen = row
+                if item_gen == gen and now - created <= ttl:
+                    self._remember(kind, key, blob, created, gen)
+                    return blob, "disk", now - created
+        return None
+
+    def contains(self, kind: str, key: str) -> bool:
+        return self._lookup(kind, key) is not None
+
+    def get(self, kind: str, key: str) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """-> (value, info) or None. info = {"hit": True, "tier": ..., "age_s": ...}."""
+        found = self._lookup(kind, key)
+        if found is None:
+            self.stats["misses"] += 1
+            return None
+        blob, tier, age = found
+        self.stats["hits"] += 1
+        if tier == "disk":
+            self.stats["disk_hits"] += 1
+        return json.loads(blob), {"hit": True, "tier": tier, "age_s": round(age, 1)}
+
+    def put(self, kind: str, key: str, value: Any):
+        if self.ttls.get(kind, 0) <= 0:
+            return
+        blob = json.dumps(value, default=_json_default)
+        created = time.time()
+        gen = self.generation()
+        self._remember(kind, key, blob, created, gen)
+        if self._db_path:
+            try:
+                conn = self._db()
+                conn.execute("INSERT OR REPLACE INTO entries VALUES (?,?,?,?,?)", (kind, key, gen, created, blob))
+                conn.commit()
+            except sqlite3.Error as e:
+                print("result cache: sqlite write failed:", e)
+
+    def _remember(self, kind, key, blob, created, gen):
+        with self._lock:
+            self._mem[(kind, key)] = (blob, created, gen)
+            self._mem.move_to_end((kind, key))
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def cached(self, kind: str, key: str, compute):
+        """Return (value, info), computing and storing value on a miss."""
+        got = self.get(kind, key)
+        if got is not None:
+            return got
+        value = compute()
+        self.put(kind, key, value)
+        return value, {"hit": False}
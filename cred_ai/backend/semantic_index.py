@@ -0,0 +1,366 @@
+# backend/semantic_index.py
+# Embedding similarity for institute matching: a small sentence-transformers
+# model on CPU, unit-normalized vectors, cosine = one dot product.
+#   VectorStore  : texts + one float32 matrix (.npy, memory-mapped on load) per
+#                  model; "institutes" holds every distinct registry name in the
+#                  institute index's order, "texts" every cached website title
+#   MicroBatcher : texts not in a store are queued by concurrent requests and
+#                  encoded together, up to SEMANTIC_BATCH_MAX texts, waiting at
+#                  most SEMANTIC_BATCH_WAIT_MS for the batch to fill
+#   SemanticEngine.best : institute lookup, one matrix-vector product over all names;
+#                  names missing from the store (registry deltas) are encoded by a
+#                  background thread through the batcher, and lookups return no
+#                  match (the fuzzy result stands) until that matrix is ready
+# Without the model (not installed, SEMANTIC_MODEL="" or failed to load) callers
+# keep the fuzzy path; agent_ai only ever raises a fuzzy score with these.
+#
+# Precompute both stores from the loaded registry and the domain cache:
+#   python semantic_index.py build
+import os, json, time, queue, threading, argparse, weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import timed
+from trusted_index import normalize_name
+
+SEMANTIC_MODEL = os.environ.get("SEMANTIC_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SEMANTIC_DIR = os.environ.get("SEMANTIC_DIR", "cache/semantic")
+SEMANTIC_BATCH_MAX = int(os.environ.get("SEMANTIC_BATCH_MAX", 64))
+SEMANTIC_BATCH_WAIT_MS = float(os.environ.get("SEMANTIC_BATCH_WAIT_MS", 2))
+SEMANTIC_TIMEOUT = float(os.environ.get("SEMANTIC_TIMEOUT", 1.0))
+SEMANTIC_QUERY_CACHE = int(os.environ.get("SEMANTIC_QUERY_CACHE", 4096))
+SNIPPET_CHARS = 300
+
+
+def website_text(title, snippet) -> str:
+    """The page text institution_evidence compares the claimed name against."""
+    return f"{title or ''} {(snippet or '')[:SNIPPET_CHARS]}"
+
+
+class StaleStore(ValueError):
+    """A store on disk that was built for another model / dimension, or is truncated."""
+
+
+def model_slug(model_name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name.strip("/"))
+
+
+class Encoder:
+    """sentence-transformers model pinned to CPU; encode(texts) -> float32 [n, dim], unit rows."""
+
+    def __init__(self, model_name: str = SEMANTIC_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        vecs = self.model.encode(list(texts), batch_size=max(1, min(len(texts), 128)), convert_to_numpy=True,
+                                 normalize_embeddings=True, show_progress_bar=False)
+        return np.ascontiguousarray(vecs, dtype=np.float32)
+
+
+class VectorStore:
+    """Texts and their vectors, row-aligned; <stem>.npy (mmap) + <stem>.json (texts, model, dim)."""
+
+    def __init__(self, texts: List[str], matrix: np.ndarray, model: str):
+        self.texts = texts
+        self.matrix = matrix
+        self.model = model
+        self._rows = {t: i for i, t in enumerate(texts)}
+
+    @classmethod
+    def load(cls, stem: Path, model: str, dim: int) -> Optional["VectorStore"]:
+        """None when the store doesn't exist; StaleStore when it can't be served with this model."""
+        meta_p, mat_p = stem.with_suffix(".json"), stem.with_suffix(".npy")
+        if not (meta_p.exists() and mat_p.exists()):
+            return None
+        meta = json.loads(meta_p.read_text())
+        if meta.get("model") != model or meta.get("dim") != dim:
+            raise StaleStore(f"{mat_p} was built with {meta.get('model')} dim {meta.get('dim')}")
+        matrix = np.load(mat_p, mmap_mode="r")
+        if matrix.shape != (len(meta["texts"]), dim):
+            raise StaleStore(f"{mat_p}: shape {matrix.shape} does not match its {len(meta['texts'])} texts")
+        return cls(meta["texts"], matrix, model)
+
+    def save(self, stem: Path):
+        stem.parent.mkdir(parents=True, exist_ok=True)
+        tmp = stem.parent / (stem.name + ".tmp.npy")
+        np.save(tmp, np.asarray(self.matrix, dtype=np.float32))
+        os.replace(tmp, stem.with_suffix(".npy"))
+        tmp = stem.parent / (stem.name + ".json.tmp")
+        tmp.write_text(json.dumps({"model": self.model, "dim": int(self.matrix.shape[1]), "texts": self.texts}))
+        os.replace(tmp, stem.with_suffix(".json"))
+
+    def __len__(self):
+        return len(self.texts)
+
+    def row(self, text: str) -> Optional[int]:
+        return self._rows.get(text)
+
+
+class MicroBatcher:
+    """Collects encode requests from concurrent callers and runs them as one model call."""
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch: int = SEMANTIC_BATCH_MAX,
+                 wait_ms: float = SEMANTIC_BATCH_WAIT_MS):
+        self._encode = encode
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000.0
+        self._q: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.stats = {"batches": 0, "requests": 0, "texts": 0}
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="semantic-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        fut: Future = Future()
+        self._ensure_thread()
+        self._q.put((list(texts), fut))
+        return fut
+
+    def _loop(self):
+        while True:
+            batch = [self._q.get()]
+            n = len(batch[0][0])
+            deadline = time.perf_counter() + self.wait
+            while n < self.max_batch:
+                left = deadline - time.perf_counter()
+                try:
+                    item = self._q.get(timeout=left) if left > 0 else self._q.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                n += len(item[0])
+            uniq = list(dict.fromkeys(t for texts, _ in batch for t in texts))
+            try:
+                with timed("semantic_encode"):
+                    vecs = self._encode(uniq)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            pos = {t: i for i, t in enumerate(uniq)}
+            for texts, fut in batch:
+                fut.set_result(vecs[[pos[t] for t in texts]])
+            self.stats["batches"] += 1
+            self.stats["requests"] += len(batch)
+            self.stats["texts"] += len(uniq)
+
+
+class SemanticEngine:
+    """
+    Vectors come from, in order: the institute / text stores (mmap), a bounded
+    LRU of recent query vectors, and the micro-batched model. Stores are
+    read-only while serving; `build` rewrites them.
+    """
+
+    def __init__(self, encoder, store_dir: str = SEMANTIC_DIR, batcher: Optional[MicroBatcher] = None,
+                 timeout: float = SEMANTIC_TIMEOUT, cache_size: int = SEMANTIC_QUERY_CACHE):
+        self.encoder = encoder
+        self.dir = Path(store_dir) / model_slug(encoder.name)
+        self.timeout = timeout
+        self.batcher = batcher or MicroBatcher(encoder.encode)
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._aligned: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._aligning: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()   # index -> build thread
+        self.stats = {"store_hits": 0, "cache_hits": 0, "encoded": 0, "stores_rejected": 0,
+                      "aligned_built": 0, "aligned_errors": 0, "aligned_not_ready": 0}
+        self.store_errors: Dict[str, str] = {}
+        self._load_stores()
+
+    @classmethod
+    def load(cls, model_name: str = SEMANTIC_MODEL, store_dir: str = SEMANTIC_DIR) -> Optional["SemanticEngine"]:
+        if not model_name:
+            return None
+        try:
+            encoder = Encoder(model_name)
+        except ImportError:
+            print("semantic_index: sentence-transformers not installed; fuzzy matching only")
+            return None
+        return cls(encoder, store_dir)
+
+    def _load_stores(self):
+        stores = {}
+        for name in ("institutes", "texts"):
+            try:
+                stores[name] = VectorStore.load(self.dir / name, self.encoder.name, self.encoder.dim)
+                self.store_errors.pop(name, None)
+            except StaleStore as e:
+                stores[name] = None
+                self.store_errors[name] = str(e)
+                self.stats["stores_rejected"] += 1
+        self.institutes, self.texts = stores["institutes"], stores["texts"]
+
+    # ---- vectors ----
+    def _stored(self, text: str) -> Optional[np.ndarray]:
+        for store in (self.institutes, self.texts):
+            if store is not None:
+                i = store.row(text)
+                if i is not None:
+                    return store.matrix[i]
+        return None
+
+    def vectors(self, texts: Sequence[str]) -> np.ndarray:
+        """Unit vectors for normalized texts; only ones seen nowhere go to the model."""
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        todo: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, t in enumerate(texts):
+                v = self._stored(t)
+                if v is not None:
+                    self.stats["store_hits"] += 1
+                else:
+                    v = self._cache.get(t)
+                    if v is not None:
+                        self._cache.move_to_end(t)
+                        self.stats["cache_hits"] += 1
+                if v is None:
+                    todo.setdefault(t, []).append(i)
+                out[i] = v
+        if todo:
+            fresh = list(todo)
+            vecs = self.batcher.submit(fresh).result(timeout=self.timeout)
+            with self._lock:
+                self.stats["encoded"] += len(fresh)
+                for t, v in zip(fresh, vecs):
+                    self._cache[t] = v
+                    for i in todo[t]:
+                        out[i] = v
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return np.vstack(out) if out else np.zeros((0, self.encoder.dim), dtype=np.float32)
+
+    # ---- scoring ----
+    @staticmethod
+    def score(cos) -> float:
+        """Cosine similarity on the 0..100 scale the fuzzy scores use."""
+        return float(np.clip(cos, 0.0, 1.0) * 100.0)
+
+    @timed("semantic_sim")
+    def similarity(self, a, b) -> float:
+        va, vb = self.vectors([normalize_name(a), normalize_name(b)])
+        return self.score(float(va @ vb))
+
+    def aligned(self, index) -> Optional[np.ndarray]:
+        """
+        Matrix row-aligned with index.names: the mmap store itself when it was built
+        for this index, else one filled in the background; None until that is ready.
+        """
+        m = self._aligned.get(index)
+        if m is not None:
+            return m
+        store = self.institutes
+        if store is not None and store.texts == index.names:
+            self._aligned[index] = store.matrix
+            return store.matrix
+        with self._lock:
+            self.stats["aligned_not_ready"] += 1
+            if index not in self._aligning:
+                t = threading.Thread(target=self._align, args=(index, store), name="semantic-align", daemon=True)
+                self._aligning[index] = t
+                t.start()
+        return None
+
+    def _align(self, index, store: Optional[VectorStore]):
+        try:
+            self._aligned[index] = self._fill(index.names, store)
+            self.stats["aligned_built"] += 1
+        except Exception:       # counted in verifier_stage_errors_total{stage="semantic_align"}; retried next lookup
+            self.stats["aligned_errors"] += 1
+        finally:
+            with self._lock:
+                self._aligning.pop(index, None)
+
+    @timed("semantic_align")
+    def _fill(self, names: List[str], store: Optional[VectorStore]) -> np.ndarray:
+        """Names added by registry deltas (or no store yet): copy stored rows, encode the rest via the batcher."""
+        m = np.empty((len(names), self.encoder.dim), dtype=np.float32)
+        missing = []
+        for i, nm in enumerate(names):
+            j = store.row(nm) if store is not None else None
+            if j is None:
+                missing.append(i)
+            else:
+                m[i] = store.matrix[j]
+        step = max(1, self.batcher.max_batch)
+        for s in range(0, len(missing), step):
+            rows = missing[s:s + step]
+            m[rows] = self.batcher.submit([names[i] for i in rows]).result()
+        return m
+
+    @timed("semantic_lookup")
+    def top_k(self, query: str, index, k: int = 5) -> List[Tuple[int, float]]:
+        """[(name_id, score)] best first, over every name in an InstituteIndex."""
+        q = normalize_name(query)
+        if not q or not len(index):
+            return []
+        m = self.aligned(index)
+        if m is None:
+            return []
+        sims = m @ self.vectors([q])[0]
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.lexsort((index.first_pos[top, 0], -sims[top]))]
+        return [(int(i), self.score(sims[i])) for i in top]
+
+    def best(self, query: str, index) -> Tuple[Optional[int], float]:
+        """(row position of the closest name or None, score), like InstituteIndex.best."""
+        top = self.top_k(query, index, k=1)
+        if not top:
+            return None, 0.0
+        i, score = top[0]
+        return int(index.first_pos[i][0]), score
+
+    # ---- precompute ----
+    def build(self, names: List[str], texts: List[str]) -> Dict[str, Any]:
+        """Encode and persist both stores (names in index order); the engine serves the new ones."""
+        t0 = time.perf_counter()
+        institutes = VectorStore(list(names), self.encoder.encode(list(names)), self.encoder.name)
+        institutes.save(self.dir / "institutes")
+        texts = list(dict.fromkeys(t for t in texts if t))
+        store = VectorStore(texts, self.encoder.encode(texts), self.encoder.name)
+        store.save(self.dir / "texts")
+        self._load_stores()
+        self._aligned = weakref.WeakKeyDictionary()
+        return {"institutes": len(institutes), "texts": len(store), "dim": self.encoder.dim,
+                "seconds": round(time.perf_counter() - t0, 2), "dir": str(self.dir)}
+
+    def status(self) -> Dict[str, Any]:
+        return {"model": self.encoder.name, "dim": self.encoder.dim,
+                "institutes": len(self.institutes) if self.institutes is not None else 0,
+                "texts": len(self.texts) if self.texts is not None else 0,
+                "query_cache": len(self._cache), "aligning": len(self._aligning), "store_errors": dict(self.store_errors),
+                **self.stats, "batcher": dict(self.batcher.stats)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Institute embedding store tools")
+    ap.add_argument("command", choices=["build"])
+    ap.add_argument("--model", default=SEMANTIC_MODEL)
+    ap.add_argument("--dir", default=SEMANTIC_DIR)
+    args = ap.parse_args()
+
+    import agent_ai
+    engine = SemanticEngine.load(args.model, args.dir)
+    if engine is None:
+        raise SystemExit("no embedding model available (install sentence-transformers, set SEMANTIC_MODEL)")
+    td = agent_ai._trusted()
+    names = td.institute_index.names if td is not None else []
+    titles = [normalize_name(website_text(w.get("title"), w.get("text_snippet")))
+              for w in agent_ai._DOMAIN_INTEL.websites()]
+    print("built:", engine.build(names, titles))
@@ -0,0 +1,93 @@
+# backend/startup.py
+# Lazy, thread-safe loading of heavy components (registry, models, OCR engine).
+# Nothing is loaded at import; each resource loads on first use, or all of them
+# load concurrently from warm_up() (run in the background by the FastAPI lifespan).
+import time, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class LazyResource:
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                t0 = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                    self.error = None
+                except Exception as e:
+                    print(f"startup: failed to load {self.name}:", e)
+                    self._value = None
+                    self.error = str(e)
+                self.seconds = round(time.perf_counter() - t0, 3)
+                self._loaded = True
+        return self._value
+
+    def replace(self, value):
+        """Swap in an already-loaded value (e.g. retrained models) without a reload window."""
+        with self._lock:
+            self._value = value
+            self.error = None
+            self._loaded = True
+
+    def reset(self):
+        with self._lock:
+            self._loaded = False
+            self._value = None
+            self.error = None
+
+    def status(self) -> Dict[str, Any]:
+        return {"loaded": self._loaded, "available": self._value is not None,
+                "seconds": self.seconds, "error": self.error}
+
+
+RESOURCES: Dict[str, LazyResource] = {}
+
+
+def register(name: str, loader: Callable[[], Any]) -> LazyResource:
+    res = LazyResource(name, loader)
+    RESOURCES[name] = res
+    return res
+
+
+def warm_up(names: Optional[Iterable[str]] = None, parallel: bool = True) -> Dict[str, Any]:
+    todo = [RESOURCES[n] for n in (names or RESOURCES)]
+    t0 = time.perf_counter()
+    if parallel and len(todo) > 1:
+        with ThreadPoolExecutor(max_workers=len(todo), thread_name_prefix="warm-up") as ex:
+            list(ex.map(lambda r: r.get(), todo))
+    else:
+        for r in todo:
+            r.get()
+    print("startup: warm-up done in", round(time.perf_counter() - t0, 3), "s")
+    return status()
+
+
+def pending() -> List[str]:
+    return [n for n, r in RESOURCES.items() if not r.loaded]
+
+
+def ensure_loaded() -> Dict[str, Any]:
+    """Block until every resource has loaded, joining a warm-up already in progress."""
+    names = pending()
+    return warm_up(names) if names else status()
+
+
+def status() -> Dict[str, Any]:
+    comps = {n: r.status() for n, r in RESOURCES.items()}
+    return {"ready": all(c["loaded"] and not c["error"] for c in comps.values()), "components": comps}
@@ -0,0 +1,242 @@
+# backend/tenants.py
+# Per-issuer (tenant) registries and rules.
+#
+# A tenants file lists the onboarded issuing institutions:
+#   {"tenants": [{"id": "mits",
+#                 "names": ["Madhav Institute of Technology & Science, Gwalior (M.P.)"],
+#                 "codes": ["MITSDU"],                    # institute codes / serial prefixes
+#                 "registry": "tenants/mits.csv",         # optional; relative to the tenants file
+#                 "known_good": [{"name": "...", "match": {...}, "reason": "..."}]}]}
+# Requests are routed by institute code (exact, then the prefix before the first
+# "/" or "-"), then by normalized institute name (exact, then fuzzy over tenant
+# names only). A routed tenant with its own registry is served from that shard;
+# shards load on first use and at most TENANT_MAX_RESIDENT stay resident (LRU),
+# so memory follows the active tenants. Unrouted requests use the global registry.
+#
+# known_good rules replace hardcoded signatures: every field in "match" must
+# hold for the submitted metadata. Operators per field:
+#   equals / iequals (case-insensitive) / contains / contains_any / in
+#
+#   python tenants.py split --csv data.csv --out tenants/     # one shard per institute_name
+import os, re, json, threading, argparse
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from trusted_index import InstituteIndex, normalize_name
+
+TENANT_MAX_RESIDENT = int(os.environ.get("TENANT_MAX_RESIDENT", 16))
+TENANT_ROUTE_MIN_SCORE = int(os.environ.get("TENANT_ROUTE_MIN_SCORE", 90))
+_CODE_SPLIT = re.compile(r"[/\-]")
+
+
+def _str(v) -> str:
+    return "" if v is None else str(v).strip()
+
+
+def _field_ok(value, spec) -> bool:
+    if not isinstance(spec, dict):
+        spec = {"equals": spec}
+    v = _str(value)
+    low = v.lower()
+    for op, want in spec.items():
+        if op == "equals" and v != _str(want):
+            return False
+        if op == "iequals" and low != _str(want).lower():
+            return False
+        if op == "contains" and _str(want).lower() not in low:
+            return False
+        if op == "contains_any" and not any(_str(w).lower() in low for w in want):
+            return False
+        if op == "in" and v not in [_str(w) for w in want]:
+            return False
+    return True
+
+
+def rule_matches(rule: Dict[str, Any], metadata: Dict[str, Any]) -> bool:
+    if not metadata or not rule.get("match"):
+        return False
+    return all(_field_ok(metadata.get(field), spec) for field, spec in rule["match"].items())
+
+
+class Tenant:
+    def __init__(self, spec: Dict[str, Any], base_dir: Path):
+        self.id = str(spec["id"])
+        self.names: List[str] = list(spec.get("names") or [])
+        self.codes: List[str] = [c.strip().lower() for c in spec.get("codes") or []]
+        reg = spec.get("registry")
+        self.registry_path: Optional[str] = str((base_dir / reg).resolve()) if reg else None
+        self.known_good: List[Dict[str, Any]] = list(spec.get("known_good") or [])
+
+    def match_known_good(self, metadata) -> Optional[Dict[str, Any]]:
+        for rule in self.known_good:
+            if rule_matches(rule, metadata):
+                return rule
+        return None
+
+
+class TenantDirectory:
+    """
+    Routing table + LRU of resident shard registries.
+    open_registry(tenant) -> a started registry.TrustedRegistry (or None); injectable for tests.
+    """
+
+    def __init__(self, tenants: List[Tenant], open_registry: Callable[[Tenant], Any],
+                 max_resident: int = TENANT_MAX_RESIDENT, min_score: int = TENANT_ROUTE_MIN_SCORE):
+        self.tenants: Dict[str, Tenant] = {t.id: t for t in tenants}
+        self.open_registry = open_registry
+        self.max_resident = max(1, max_resident)
+        self.min_score = min_score
+        self._by_code: Dict[str, str] = {c: t.id for t in tenants for c in t.codes}
+        self._by_name: Dict[str, str] = {}
+        owners: List[str] = []
+        for t in tenants:
+            for nm in t.names:
+                key = normalize_name(nm)
+                if key and key not in self._by_name:
+                    self._by_name[key] = t.id
+                    owners.append(t.id)
+        # fuzzy routing only scores tenant names, not registry rows
+        names = list(self._by_name)
+        self._owners = owners
+        self._name_index = (InstituteIndex(names, np.array([[i, 0] for i in range(len(names))], dtype=np.int64))
+                            if names else None)
+        self._resident: "OrderedDict[str, Any]" = OrderedDict()
+        self._loading: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "evictions": 0, "hits": 0, "routed": 0, "unrouted": 0}
+
+    @classmethod
+    def from_file(cls, path: str, open_registry: Callable[[Tenant], Any], **kw) -> "TenantDirectory":
+        spec = json.loads(Path(path).read_text())
+        base = Path(path).resolve().parent
+        return cls([Tenant(t, base) for t in spec.get("tenants", [])], open_registry, **kw)
+
+    def __len__(self):
+        return len(self.tenants)
+
+    # ---- routing ----
+    def route(self, institute_code=None, institute_name=None) -> Optional[Tenant]:
+        tid = None
+        code = _str(institute_code).lower()
+        if code:
+            tid = self._by_code.get(code) or self._by_code.get(_CODE_SPLIT.split(code, 1)[0])
+        if tid is None and institute_name:
+            key = normalize_name(institute_name)
+            tid = self._by_name.get(key)
+            if tid is None and key and self._name_index is not None:
+                pos, score = self._name_index.best(key)
+                if pos is not None and score >= self.min_score:
+                    tid = self._owners[pos]
+        self.stats["routed" if tid else "unrouted"] += 1
+        return self.tenants.get(tid) if tid else None
+
+    def match_known_good(self, metadata) -> Optional[Tuple[Tenant, Dict[str, Any]]]:
+        """(tenant, rule) for the first known-good signature the metadata satisfies."""
+        if not metadata:
+            return None
+        t = self.route(metadata.get("institute_code") or metadata.get("certificate_serial_number"),
+                       metadata.get("institute_name") or metadata.get("issuer_name"))
+        candidates = [t] if t is not None else list(self.tenants.values())
+        for tenant in candidates:
+            rule = tenant.match_known_good(metadata)
+            if rule is not None:
+                return tenant, rule
+        return None
+
+    # ---- shards ----
+    def registry(self, tenant: Tenant):
+        """The tenant's resident registry, loading it (once, even under concurrency) and evicting the LRU shard."""
+        if tenant.registry_path is None:
+            return None
+        while True:
+            with self._lock:
+                reg = self._resident.get(tenant.id)
+                if reg is not None:
+                    self._resident.move_to_end(tenant.id)
+                    self.stats["hits"] += 1
+                    return reg
+                waiting = self._loading.get(tenant.id)
+                if waiting is None:
+                    self._loading[tenant.id] = threading.Event()
+                    break
+            waiting.wait()
+        reg, evicted = None, []
+        try:
+            reg = self.open_registry(tenant)
+        finally:
+            with self._lock:
+                if reg is not None:
+                    self._resident[tenant.id] = reg
+                    self.stats["loads"] += 1
+                    while len(self._resident) > self.max_resident:
+                        evicted.append(self._resident.popitem(last=False))
+                        self.stats["evictions"] += 1
+                self._loading.pop(tenant.id).set()
+        for tid, old in evicted:
+            # requests holding a snapshot of the evicted shard keep using it until they finish
+            if hasattr(old, "stop"):
+                old.stop()
+        return reg
+
+    def snapshot(self, tenant: Optional[Tenant]):
+        reg = self.registry(tenant) if tenant is not None else None
+        return reg.current() if reg is not None else None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            resident = list(self._resident)
+        return {"tenants": len(self.tenants), "resident": resident, "max_resident": self.max_resident, **self.stats}
+
+
+# ---------- offline sharding ----------
+def split(csv_path: str, out_dir: str, min_rows: int = 1) -> Dict[str, Any]:
+    """
+    One CSV per institute_name plus a tenants.json routing to them. Codes come from a
+    "code" column when there is one, plus serial prefixes (before the first "/" or "-")
+    that only that institute's serials use.
+    """
+    import pandas as pd
+    df = pd.read_csv(csv_path)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    prefix_owner: Dict[str, Optional[str]] = {}
+    if "certificate_serial_number" in df.columns:
+        for name, serial in zip(df["institute_name"].astype(str), df["certificate_serial_number"]):
+            if not isinstance(serial, str) or not _CODE_SPLIT.search(serial):
+                continue
+            prefix = _CODE_SPLIT.split(serial.strip(), maxsplit=1)[0].strip()
+            if prefix:
+                prefix_owner[prefix] = name if prefix_owner.get(prefix, name) == name else None
+    tenants = []
+    for name, rows in df.groupby(df["institute_name"].astype(str), sort=True):
+        if len(rows) < min_rows:
+            continue
+        tid = re.sub(r"[^a-z0-9]+", "_", normalize_name(name)).strip("_") or "tenant"
+        rows.to_csv(out / f"{tid}.csv", index=False)
+        codes = {p for p, owner in prefix_owner.items() if owner == name}
+        if "code" in rows.columns:
+            codes |= {str(c) for c in rows["code"].dropna().unique()}
+        codes = sorted(codes)
+        tenants.append({"id": tid, "names": [name], "codes": codes, "registry": f"{tid}.csv", "known_good": []})
+    spec = {"tenants": tenants}
+    (out / "tenants.json").write_text(json.dumps(spec, indent=2))
+    print("wrote", len(tenants), "tenant shards to", out)
+    return spec
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Tenant registry tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("split", help="shard a registry CSV per institute")
+    p.add_argument("--csv", required=True)
+    p.add_argument("--out", required=True)
+    p.add_argument("--min-rows", type=int, default=1)
+    args = ap.parse_args()
+    split(args.csv, args.out, args.min_rows)
+
+
+if __name__ == "__main__":
+    main()
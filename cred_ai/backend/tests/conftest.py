@@ -0,0 +1,30 @@
+# Tests run from backend/ or the repo root; modules are imported the way the app imports them.
+import os, sys
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(0, str(BACKEND / "benchmarks"))
+
+DATA_CSV = BACKEND.parent / "data" / "NIT_SILCHAR Dataset.csv"
+
+
+@pytest.fixture(scope="session")
+def data_csv():
+    return DATA_CSV
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """The FastAPI module; it mounts static/frontend relative to the cwd, which the tree doesn't ship."""
+    www = tmp_path_factory.mktemp("www")
+    (www / "static" / "frontend").mkdir(parents=True)
+    cwd = os.getcwd()
+    os.chdir(www)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app
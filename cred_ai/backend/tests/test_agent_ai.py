@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import IsolationForest, RandomForestClassifier
+
+import agent_ai
+import train_agent
+from trusted_index import KeyIndex, TrustedData
+
+
+def legacy_serial_check(df, serial):
+    """The boolean-mask scan serial_check used before the index."""
+    matches = df[df["certificate_serial_number"].astype(str) == str(serial)]
+    if matches.shape[0] == 0:
+        return {"found": False}
+    return {"found": True, "count": int(matches.shape[0]), "rows": matches, "reused": matches.shape[0] > 1}
+
+
+def legacy_code_row(df, code):
+    matched = df[df["code"].astype(str).str.lower() == str(code).lower()]
+    return matched.iloc[0] if len(matched) else None
+
+
+@pytest.fixture(scope="module")
+def registry(data_csv):
+    df = pd.read_csv(data_csv)
+    df["code"] = df["institute_name"].str.split().str[0].str.upper()
+    return df
+
+
+@pytest.fixture
+def snapshot(registry, monkeypatch):
+    monkeypatch.setattr(agent_ai._AUDIT, "get", lambda: None)
+    td = TrustedData.from_frame(registry)
+    token = agent_ai._SNAPSHOT.set(td)
+    yield td
+    agent_ai._SNAPSHOT.reset(token)
+
+
+def test_serial_check_matches_legacy_scan(registry, snapshot):
+    serials = registry["certificate_serial_number"]
+    dupes = serials[serials.duplicated()].unique().tolist()
+    assert dupes
+    for serial in dupes + serials.iloc[:200].tolist() + ["NOT-A-SERIAL"]:
+        got, want = agent_ai.serial_check(serial), legacy_serial_check(registry, serial)
+        assert got["found"] == want["found"]
+        if not want["found"]:
+            continue
+        assert (got["count"], got["reused"]) == (want["count"], want["reused"])
+        # duplicate serials return every row, in registry order
+        assert [r["unique_registration_roll_number"] for r in got["rows"]] == \
+            want["rows"]["unique_registration_roll_number"].tolist()
+        assert got["refs"] == want["rows"]["unique_registration_roll_number"].tolist()
+
+
+def test_serial_normalisation(registry, snapshot):
+    serial = registry["certificate_serial_number"].iloc[0]
+    # surrounding whitespace is stripped (the scan compared raw strings); case is significant in both
+    assert agent_ai.serial_check(f"  {serial}\n")["count"] == legacy_serial_check(registry, serial)["count"]
+    assert agent_ai.serial_check(serial.lower()) == legacy_serial_check(registry, serial.lower()) == {"found": False}
+    assert agent_ai.serial_check(None) == {"found": False}
+
+
+def test_padded_registry_keys_are_normalised():
+    df = pd.DataFrame({"certificate_serial_number": [" AB1 ", "AB1", None, "ab1"], "code": ["NITS ", "nits", "IITD", None]})
+    serial, code = KeyIndex.from_series(df["certificate_serial_number"]), KeyIndex.from_series(df["code"], lower=True)
+    assert list(serial.positions("AB1")) == [0, 1] and list(serial.positions("ab1")) == [3]
+    assert list(code.positions(KeyIndex.normalize(" NiTs", lower=True))) == [0, 1]
+    assert len(serial.positions("missing")) == 0 and "missing" not in code
+
+
+def test_institute_code_lookup_matches_legacy(registry, snapshot):
+    for code in registry["code"].unique().tolist() + ["nit", "Nit", "UNKNOWN"]:
+        ok, row, score = agent_ai.find_in_trusted("Unrelated Name", code)
+        want = legacy_code_row(registry, code)
+        if want is None:
+            assert score < 100
+            continue
+        assert (ok, score) == (True, 100)
+        assert row["unique_registration_roll_number"] == want["unique_registration_roll_number"]
+        assert row["certificate_serial_number"] == want["certificate_serial_number"]
+
+
+def test_serial_check_parity_across_appended_rows(registry, monkeypatch):
+    monkeypatch.setattr(agent_ai._AUDIT, "get", lambda: None)
+    base, extra = registry.iloc[:1500].reset_index(drop=True), registry.iloc[:40].copy()
+    extra["unique_registration_roll_number"] = extra["unique_registration_roll_number"] + "-R"   # reissued serials
+    td = TrustedData.from_frame(base).extended(extra)
+    assert td._delta is not None
+    whole = pd.concat([base, extra], ignore_index=True)
+    token = agent_ai._SNAPSHOT.set(td)
+    try:
+        for serial in extra["certificate_serial_number"].tolist() + registry["certificate_serial_number"].iloc[1500:1520].tolist():
+            got, want = agent_ai.serial_check(serial), legacy_serial_check(whole, serial)
+            assert got["found"] == want["found"]
+            if want["found"]:
+                assert got["refs"] == want["rows"]["unique_registration_roll_number"].tolist()
+    finally:
+        agent_ai._SNAPSHOT.reset(token)
+
+
+# ---------- features, scoring, decision ----------
+
+@pytest.fixture(scope="module")
+def fitted(data_csv):
+    X, y = train_agent.build_features(train_agent.read_rows(str(data_csv)))
+    clf = RandomForestClassifier(n_estimators=8, max_depth=4, random_state=0).fit(X, y)
+    iso = IsolationForest(n_estimators=8, random_state=0).fit(X)
+    return X.astype(np.float64), clf, iso
+
+
+def _models(monkeypatch, clf, iso):
+    monkeypatch.setattr(agent_ai._CLASSIFIER, "get", lambda: clf)
+    monkeypatch.setattr(agent_ai._ANOMALY, "get", lambda: iso)
+
+
+def test_request_features_follow_the_training_schema(registry):
+    assert agent_ai.FEATURES == train_agent.FEATURES
+    rows = registry.iloc[:50]
+    X, _ = train_agent.build_features(rows.drop(columns=["ocr_vs_meta_name_match", "ocr_vs_meta_institute_match"]))
+    for x, (_, r) in zip(X, rows.iterrows()):
+        keys = ["marks_percent", "num_subjects", "signed_hash_present", "ela_score", "image_complexity_kb",
+                "marks_removed_flag"]
+        metadata = {k: r[k] for k in keys if pd.notna(r[k])}
+        np.testing.assert_allclose(agent_ai.build_features(metadata, {}), x, rtol=1e-6)
+    # no evidence at all: every feature takes the training fill value
+    fills = [fill if name != "marks_missing" else 1.0 for name, (_, fill) in train_agent.FEATURE_SCHEMA.items()]
+    assert agent_ai.build_features({}, {}).tolist() == fills
+
+
+def test_request_features_use_ocr_evidence():
+    metadata = {"recipient_name": "Asha Sharma", "institute_name": "NIT Silchar"}
+    cred = {"fields": {"name": "ASHA SHARMA", "institute": "National Institute of Technology Silchar", "marks": "81.5%"},
+            "ela": 2.5}
+    f = dict(zip(agent_ai.FEATURES, agent_ai.build_features(metadata, cred, b"\0" * 2048)))
+    assert f["ocr_vs_meta_name_match"] == 100 and 50 < f["ocr_vs_meta_institute_match"] <= 100
+    assert (f["marks_percent"], f["marks_missing"], f["ela_score"], f["image_complexity_kb"]) == (81.5, 0.0, 2.5, 2.0)
+
+
+def test_score_features_matches_the_fitted_models(fitted, monkeypatch):
+    X, clf, iso = fitted
+    _models(monkeypatch, clf, iso)
+    out = agent_ai.score_features(X[:40])
+    np.testing.assert_allclose(out["tamper_prob"], clf.predict_proba(X[:40])[:, list(clf.classes_).index(1)])
+    np.testing.assert_allclose(out["anomaly_score"], iso.decision_function(X[:40]))
+    one = agent_ai.score_features(X[3])                      # a single row is promoted to 1 x n
+    assert one["tamper_prob"].shape == (1,) and one["tamper_prob"][0] == out["tamper_prob"][3]
+
+
+@pytest.mark.parametrize("missing", ["classifier", "anomaly", "both"])
+def test_score_features_with_a_missing_model(fitted, monkeypatch, missing):
+    X, clf, iso = fitted
+    _models(monkeypatch, None if missing in ("classifier", "both") else clf, None if missing in ("anomaly", "both") else iso)
+    out = agent_ai.score_features(X[:5])
+    assert (out["tamper_prob"] is None) == (missing in ("classifier", "both"))
+    assert (out["anomaly_score"] is None) == (missing in ("anomaly", "both"))
+
+
+def test_score_features_single_class_classifier(fitted, monkeypatch):
+    X, _, iso = fitted
+    genuine_only = RandomForestClassifier(n_estimators=2, random_state=0).fit(X[:20], np.zeros(20, dtype=int))
+    _models(monkeypatch, genuine_only, iso)
+    assert agent_ai.score_features(X[:4])["tamper_prob"].tolist() == [0.0] * 4
+
+
+INST = {"institution_score": 100}
+CRED = {"fields": {"name": "x"}, "consistency_score": 100}
+
+
+@pytest.mark.parametrize("cred, scores, verdict, score, reason", [
+    (CRED, {}, "VERIFIED", 100, None),
+    (dict(CRED, serial_check={"found": True, "reused": True}), {}, "VERIFIED", 75, "serial_reused"),
+    (dict(CRED, serial_check={"found": True, "reused": True}, accreditation_ok=False), {}, "SUSPICIOUS", 65,
+     "accreditation_not_confirmed"),
+    (dict(CRED, serial_check={"found": False}), {}, "VERIFIED", 90, "serial_not_in_registry"),
+    (CRED, {"tamper_prob": 0.5}, "SUSPICIOUS", 70, "classifier_tamper_prob=0.50"),
+    (CRED, {"tamper_prob": 0.49}, "VERIFIED", 100, None),
+    (CRED, {"tamper_prob": 0.5, "anomaly_score": -0.01}, "SUSPICIOUS", 55, "isolation_forest_outlier=-0.010"),
+    (dict(CRED, date_check={"issue": "convocation_before_issuance"}, serial_check={"found": True, "reused": True}),
+     {"tamper_prob": 0.9}, "REJECTED", 25, "convocation_before_issuance"),
+    (CRED, {"anomaly_score": 0.0}, "VERIFIED", 100, None),
+])
+def test_decide_thresholds(cred, scores, verdict, score, reason):
+    out = agent_ai.decide(INST, cred, scores)
+    assert (out["verdict"], out["score"]) == (verdict, score)
+    if reason:
+        assert reason in out["reasons"]
+
+
+def test_decide_without_fields_uses_the_institution_score():
+    assert agent_ai.decide({"institution_score": 74}, {}, {}) == {"verdict": "SUSPICIOUS", "score": 74, "reasons": []}
+    out = agent_ai.decide({"institution_score": 40}, {}, {}, {"near_duplicate": True, "duplicate_of": "S1"})
+    assert out == {"verdict": "REJECTED", "score": 15,
+                   "reasons": ["institution_not_confirmed", "image_near_duplicate:S1"]}
+
+
+def test_run_agent_batch_scores_rows_in_one_call(fitted, monkeypatch):
+    X, clf, iso = fitted
+    _models(monkeypatch, clf, iso)
+    calls = []
+    real = agent_ai.score_features
+    monkeypatch.setattr(agent_ai, "score_features", lambda m: calls.append(len(m)) or real(m))
+    monkeypatch.setattr(agent_ai, "snapshot_for", lambda p: (None, None))
+
+    def evidence(p):
+        if p.get("boom"):
+            raise RuntimeError("evidence failed")
+        return {"institution_score": 100}, dict(CRED), X[p["row"]], None
+
+    monkeypatch.setattr(agent_ai, "_evidence_for", evidence)
+    payloads = [{"student_id": 1, "row": 5}, {"student_id": 2, "boom": True}, {"student_id": 3, "row": 9}]
+    out = agent_ai.run_agent_batch(payloads)
+    assert calls == [2]
+    assert out[1] == {"student_id": 2, "error": "agent_exception", "detail": "evidence failed"}
+    for res, row in ((out[0], 5), (out[2], 9)):
+        want = real(X[row])
+        assert res["model_scores"] == {"tamper_prob": float(want["tamper_prob"][0]),
+                                       "anomaly_score": float(want["anomaly_score"][0])}
+        assert res["decision"] == agent_ai.decide({"institution_score": 100}, CRED, res["model_scores"])
+        assert list(res["features"]) == train_agent.FEATURES
+    assert agent_ai.run_agent({"student_id": 4, "row": 5})["model_scores"] == out[0]["model_scores"]
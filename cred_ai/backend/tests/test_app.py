@@ -0,0 +1,60 @@
+import asyncio
+import io
+import zipfile
+
+import pytest
+
+import ingest
+
+
+class _Upload:
+    def __init__(self, data, filename="batch.zip"):
+        self._buf, self.size, self.filename = io.BytesIO(data), len(data), filename
+
+    async def read(self, n):
+        return self._buf.read(n)
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def _collect(app, data):
+    return asyncio.run(app._collect_batch(None, _Upload(data), None))
+
+
+def test_zip_batch_matches_items_to_members(app_module):
+    data = _zip({"b.jpg": b"bbb", "dir/a.jpg": b"aa",
+                 "meta.jsonl": '{"file": "a.jpg", "student_id": 1}\n{"file": "b.jpg", "student_id": 2}\n'})
+    batch = _collect(app_module, data)
+    assert [(item["student_id"], img) for item, img in batch] == [(1, b"aa"), (2, b"bbb")]
+
+
+def test_zip_item_count_is_refused_before_inflating(app_module, monkeypatch):
+    data = _zip({f"{i}.jpg": b"x" for i in range(4)})
+    monkeypatch.setattr(app_module, "BATCH_MAX_ITEMS", 3)
+    monkeypatch.setattr(zipfile.ZipFile, "open", lambda *a, **k: pytest.fail("member inflated"))
+    with pytest.raises(ingest.UploadTooLarge) as exc:
+        _collect(app_module, data)
+    assert exc.value.limit == "items"
+
+
+def test_zip_total_inflated_size_is_refused_before_inflating(app_module, monkeypatch):
+    # each member is far under UPLOAD_MAX_BYTES and compresses to a few bytes
+    data = _zip({f"{i}.jpg": b"\0" * 1000 for i in range(4)})
+    monkeypatch.setattr(app_module, "BATCH_MAX_INFLATED", 3000)
+    monkeypatch.setattr(zipfile.ZipFile, "open", lambda *a, **k: pytest.fail("member inflated"))
+    with pytest.raises(ingest.UploadTooLarge) as exc:
+        _collect(app_module, data)
+    assert exc.value.limit == "bytes"
+
+
+def test_member_reads_stop_past_the_limit(app_module):
+    with zipfile.ZipFile(io.BytesIO(_zip({"a.jpg": b"\0" * 5000}))) as zf:
+        assert len(app_module._read_member(zf, zf.getinfo("a.jpg"), 5000)) == 5000
+        with pytest.raises(ingest.UploadTooLarge):
+            app_module._read_member(zf, zf.getinfo("a.jpg"), 4096)
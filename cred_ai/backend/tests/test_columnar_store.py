@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+import columnar_store
+
+
+@pytest.fixture(params=["npy", "parquet"])
+def fmt(request):
+    if request.param == "parquet" and not columnar_store._have_pyarrow():
+        pytest.skip("pyarrow not installed")
+    return request.param
+
+
+def _convert(tmp_path, fmt, frame, monkeypatch):
+    monkeypatch.setattr(columnar_store, "CHUNK_ROWS", 5)      # kinds come from the first 5 rows
+    csv = tmp_path / "t.csv"
+    frame.to_csv(csv, index=False)
+    out = columnar_store.store_path(str(tmp_path / "t"), fmt)
+    columnar_store.convert(str(csv), out, chunk_rows=5)
+    return columnar_store.load(out)
+
+
+def test_round_trip(tmp_path, fmt, data_csv, monkeypatch):
+    src = pd.read_csv(data_csv).head(40)
+    got = _convert(tmp_path, fmt, src, monkeypatch)
+    assert list(got.columns) == list(src.columns)
+    pd.testing.assert_series_equal(got["marks_percent"], src["marks_percent"], check_dtype=False)
+    assert got["institute_name"].astype(str).tolist() == src["institute_name"].tolist()
+
+
+def test_late_text_in_numeric_column_is_kept(tmp_path, fmt, monkeypatch):
+    marks = ["81.5", "70", "66.25", "90", "55", "72", "absent", "", "64"]
+    frame = pd.DataFrame({"serial": [f"S{i}" for i in range(9)], "marks_percent": marks, "year": range(9)})
+    got = _convert(tmp_path, fmt, frame, monkeypatch)
+    col = got["marks_percent"]
+    assert col[6] == "absent" and pd.isna(col[7]) and col[8] == "64"
+    assert col[0] == "81.5"
+    assert got["year"].tolist() == list(range(9))
+
+
+def test_late_nan_still_promotes_int_column(tmp_path, monkeypatch):
+    frame = pd.DataFrame({"n": [1, 2, 3, 4, 5, 6, None, 8]})
+    got = _convert(tmp_path, "npy", frame, monkeypatch)
+    assert got["n"].dtype.kind == "f" and pd.isna(got["n"][6]) and got["n"][7] == 8
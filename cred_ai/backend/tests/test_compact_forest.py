@@ -0,0 +1,70 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest, RandomForestClassifier
+
+import compact_forest
+import train_agent
+from compact_forest import CompactForest
+
+
+@pytest.fixture(scope="module")
+def data(data_csv):
+    X, y, _ = train_agent.load_features(str(data_csv), use_cache=False)
+    return X, y
+
+
+@pytest.fixture(scope="module")
+def models(data):
+    X, y = data
+    clf = RandomForestClassifier(n_estimators=40, class_weight="balanced", random_state=0).fit(X, y)
+    iso = IsolationForest(n_estimators=40, random_state=0).fit(X[y == 0])
+    return clf, iso
+
+
+def test_classifier_parity(models, data):
+    X, _ = data
+    clf = models[0]
+    forest = CompactForest.from_sklearn(clf)
+    np.testing.assert_allclose(forest.predict_proba(X), clf.predict_proba(X), atol=1e-6)
+    assert (forest.predict(X) == clf.predict(X)).all()
+
+
+def test_isolation_forest_parity(models, data):
+    X, _ = data
+    iso = models[1]
+    forest = CompactForest.from_sklearn(iso)
+    np.testing.assert_allclose(forest.score_samples(X), iso.score_samples(X), atol=1e-6)
+    assert ((forest.decision_function(X) < 0) == (iso.decision_function(X) < 0)).all()
+
+
+def test_export_save_load_round_trip(models, data, tmp_path):
+    X, y = data
+    for model, name in zip(models, (train_agent.CLASSIFIER_NAME, train_agent.ANOMALY_NAME)):
+        path = tmp_path / name
+        joblib.dump(model, path)
+        report = compact_forest.export(model, str(path), X, y)
+        assert report["label_agreement"] == 1.0 and report["trees"] == 40
+        loaded = compact_forest.load_for(str(path))
+        assert loaded is not None and isinstance(loaded.threshold, np.memmap)
+        if name == train_agent.CLASSIFIER_NAME:
+            np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X), atol=1e-6)
+        else:
+            np.testing.assert_allclose(loaded.decision_function(X), model.decision_function(X), atol=1e-6)
+
+
+def test_stale_export_is_ignored(models, data, tmp_path):
+    X, y = data
+    path = tmp_path / train_agent.CLASSIFIER_NAME
+    joblib.dump(models[0], path)
+    compact_forest.export(models[0], str(path), X, y)
+    joblib.dump(RandomForestClassifier(n_estimators=5, random_state=1).fit(X, y), path)
+    assert compact_forest.load_for(str(path)) is None
+
+
+def test_fewer_trees_within_max_loss(models, data, tmp_path):
+    X, y = data
+    path = tmp_path / train_agent.CLASSIFIER_NAME
+    joblib.dump(models[0], path)
+    report = compact_forest.export(models[0], str(path), X, y, max_loss=0.05, min_trees=10, step=10)
+    assert report["trees"] <= 40 and report["label_agreement"] >= 0.95
@@ -0,0 +1,171 @@
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import domain_intel
+from agent_ai import webpage_check
+from domain_intel import DomainIntel
+
+
+class Clock:
+    def __init__(self, t=1_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class Handler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        body = b"<html><title>Test Institute of Technology</title><body>Welcome</body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.hits = 0
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}/"
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(domain_intel, "time", types.SimpleNamespace(time=c))
+    return c
+
+
+class Resolvers:
+    """Stub whois / MX resolvers counting their calls."""
+
+    def __init__(self, age=4000, mx=True):
+        self.age, self.mx = age, mx
+        self.calls = {"whois": 0, "mx": 0}
+
+    def whois(self, domain):
+        self.calls["whois"] += 1
+        return self.age
+
+    def mx_ok(self, domain):
+        self.calls["mx"] += 1
+        return self.mx
+
+
+def make(resolvers, fetch=None, **kw):
+    fetch = fetch or (lambda url, session: webpage_check(url, timeout=5, session=session))
+    return DomainIntel(fetch, resolvers.whois, resolvers.mx_ok, cache_path=None, **kw)
+
+
+def test_probe_against_local_server_then_cache(server, clock):
+    r = Resolvers()
+    intel = make(r)
+    first = intel.probe(server)
+    assert first["website"]["ok"] and first["website"]["title"] == "Test Institute of Technology"
+    assert first["whois_age_days"] == 4000 and first["mx_ok"] is True
+    assert first["cache"] == {"website": False, "whois": False, "mx": False}
+    second = intel.probe(server)
+    assert second["cache"] == {"website": True, "whois": True, "mx": True}
+    assert Handler.hits == 1 and r.calls == {"whois": 1, "mx": 1}
+
+
+def test_ttl_expiry_per_probe(server, clock):
+    r = Resolvers()
+    intel = make(r, ttls={"website": 100, "whois": 1000, "mx": 10})
+    intel.probe(server)
+    clock.t += 50                               # mx expired, website and whois still fresh
+    out = intel.probe(server)
+    assert out["cache"] == {"website": True, "whois": True, "mx": False}
+    clock.t += 5                                # mx re-probed 5s ago: fresh
+    assert intel.probe(server)["cache"] == {"website": True, "whois": True, "mx": True}
+    clock.t += 100                              # website expired, and mx again
+    out = intel.probe(server)
+    assert out["cache"] == {"website": False, "whois": True, "mx": False}
+    assert Handler.hits == 2 and r.calls == {"whois": 1, "mx": 3}
+
+
+def test_failures_use_negative_ttl(clock):
+    r = Resolvers(age=None, mx=False)
+    dead = "http://127.0.0.1:9/"                 # discard port: connection refused
+    intel = make(r, ttls={"website": 3600, "whois": 3600, "mx": 3600}, negative_ttl=30)
+    out = intel.probe(dead)
+    assert out["website"]["ok"] is False and out["whois_age_days"] is None and out["mx_ok"] is False
+    clock.t += 10
+    assert intel.probe(dead)["cache"] == {"website": True, "whois": True, "mx": True}
+    clock.t += 30
+    assert intel.probe(dead)["cache"] == {"website": False, "whois": False, "mx": False}
+    assert r.calls == {"whois": 2, "mx": 2}
+
+
+def test_single_flight(clock):
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch(url, session):
+        calls.append(url)
+        release.wait(5)
+        return {"ok": True, "status_code": 200, "title": "t"}
+
+    intel = make(Resolvers(), fetch=slow_fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(intel.probe("example.edu"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while not calls:
+        time.sleep(0.001)
+    time.sleep(0.2)                             # let the other seven reach the in-flight probe
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(calls) == 1 and len(results) == 8
+    assert all(r["website"]["ok"] for r in results)
+
+
+def test_save_load_round_trip(tmp_path, server, clock):
+    path = str(tmp_path / "sub" / "domain_cache.json")
+    r = Resolvers()
+    intel = make(r, ttls={"website": 100, "whois": 1000, "mx": 1000})
+    intel.probe(server)
+    intel.save(path)
+
+    warm = DomainIntel(lambda *a: pytest.fail("website re-probed"), r.whois, r.mx_ok, cache_path=path)
+    assert warm.probe(server)["cache"] == {"website": True, "whois": True, "mx": True}
+    assert [w["title"] for w in warm.websites()] == ["Test Institute of Technology"]
+
+    clock.t += 500                              # website entry expired before the next load
+    later = DomainIntel(lambda url, session: {"ok": False}, r.whois, r.mx_ok, cache_path=path)
+    assert later.probe(server)["cache"] == {"website": False, "whois": True, "mx": True}
+
+
+def test_server_and_warm_share_default_path():
+    assert DomainIntel.__init__.__defaults__[-1] == domain_intel.DOMAIN_CACHE_PATH
+    assert domain_intel.DOMAIN_CACHE_PATH == "cache/domain_cache.json"
+
+
+def test_cache_is_a_bounded_lru_that_drops_expired_first(clock):
+    r = Resolvers()
+    # one worker: a domain's probes are inserted in website, whois, mx order
+    intel = make(r, fetch=lambda url, session: {"ok": True}, ttls={"mx": 10}, max_entries=6, max_workers=1)
+    intel.probe("http://a.edu/")
+    intel.probe("http://b.edu/")
+    intel.probe("http://a.edu/")                  # hits: a.edu is now the most recently used
+    clock.t += 20                                 # both mx entries expired
+    intel.probe("http://c.edu/")
+    assert list(intel._cache) == [("whois", "b.edu"), ("website", "a.edu"), ("whois", "a.edu"),
+                                  ("website", "c.edu"), ("whois", "c.edu"), ("mx", "c.edu")]
+    assert intel.stats["evictions"] == 1          # b.edu's website page; the expired mx entries went first
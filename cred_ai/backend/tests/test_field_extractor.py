@@ -0,0 +1,72 @@
+import field_extractor
+from field_extractor import FieldExtractor, extract_fields, extract_fields_detailed
+
+DOC = """NATIONAL INSTITUTE OF TECHNOLOGY
+Name: Asha Rao
+Date of Birth: 01-01-2000
+Father's Name: R. Rao
+Student Name: Asha K. Rao
+Degree: B.Tech
+Marks: 82.5
+Issued on 29-05-2023
+Institute: NIT Silchar
+Certificate No: SN000123"""
+
+
+def test_extract_picks_highest_confidence_line():
+    out = extract_fields(DOC)
+    assert out == {"name": "Asha K. Rao", "degree": "B.Tech", "marks": "82.5", "issuance_date": "29-05-2023",
+                   "institute": "NIT Silchar", "serial": "SN000123"}
+
+
+def test_ignore_list_and_no_colon_keyword():
+    out = extract_fields("Date of Birth: 01-01-2000\nFather's Name: X\nDate of issue 02-06-2023")
+    assert out["name"] is None
+    assert out["issuance_date"] == "02-06-2023"
+
+
+def test_colon_line_wins_tie_and_fullwidth_colon():
+    out = extract_fields("Issued on 01-01-2020\nIssued on: 02-02-2021\nDegree：M.Tech")
+    assert out["issuance_date"] == "02-02-2021"
+    assert out["degree"] == "M.Tech"
+
+
+def test_detailed_offsets_and_lines():
+    det = extract_fields_detailed(DOC)
+    lines = DOC.split("\n")
+    for f, d in det.items():
+        assert DOC[d["start"]:d["end"]] == d["value"]
+        assert d["value"] in lines[d["line"]]
+    assert det["issuance_date"]["keyword"] == "issued on"
+    assert det["name"]["line"] == 4
+
+
+def test_percent_fallback():
+    text = "Result\nThe candidate secured 76.4 % overall"
+    assert extract_fields(text)["marks"] == "76.4%"
+    d = extract_fields_detailed(text)["marks"]
+    assert d["line"] == 1 and text[d["start"]:d["end"]] == "76.4 %"
+
+
+def test_templates():
+    field_extractor.register_template("Test Institute", {"keywords": {"enrolment": ["serial", 1.0]}})
+    try:
+        assert extract_fields("Enrolment: E-42", institute="test  institute")["serial"] == "E-42"
+        assert extract_fields("Enrolment: E-42")["serial"] is None
+    finally:
+        field_extractor._EXTRACTORS.pop("test institute", None)
+
+
+def test_label_cache_is_bounded():
+    ex = FieldExtractor()
+    ex.extract("\n".join(f"label {i}: v" for i in range(5000)))
+    assert len(ex._labels) <= 4096
+
+
+def test_accuracy_not_below_legacy(data_csv):
+    import bench_field_extractor as bench
+    docs = bench.synth_corpus(str(data_csv), 300)
+    legacy = bench.evaluate(bench.legacy_extract_fields, docs, 1)["accuracy"]
+    engine = bench.evaluate(extract_fields, docs, 1)["accuracy"]
+    for f, acc in legacy.items():
+        assert engine[f] >= acc, f
@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+import imaging
+
+
+def legacy_ela(pil_img):
+    """The temp-file ELA agent_ai used before ela_analysis."""
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        pil_img.convert("RGB").save(f.name, "JPEG", quality=90)
+        saved = Image.open(f.name)
+    diff = ImageChops.difference(pil_img.convert("RGB"), saved)
+    luma = np.array(diff.convert("L"))
+    os.remove(f.name)
+    return float(np.mean(luma)), luma
+
+
+def _scan(size=(960, 640), patch=None):
+    """A JPEG-compressed certificate; `patch` (x, y) pastes a never-compressed noise block afterwards."""
+    img = Image.new("RGB", size, (245, 240, 228))
+    draw = ImageDraw.Draw(img)
+    for y in range(60, size[1] - 60, 70):
+        draw.text((60, y), "Name: Asha Sharma   Degree: B.Tech   Marks: 81.5%", fill=(20, 20, 60), font_size=28)
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=75)
+    img = Image.open(BytesIO(buf.getvalue())).convert("RGB")
+    if patch:
+        noise = np.random.default_rng(0).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+        img.paste(Image.fromarray(noise), patch)
+    return img
+
+
+def test_in_memory_ela_matches_the_temp_file_score():
+    for img in (_scan(), _scan(patch=(700, 420)), _scan((333, 207))):
+        want, _ = legacy_ela(img)
+        whole = imaging.ela_analysis(img, strip_rows=1 << 20)
+        assert whole["score"] == pytest.approx(want, rel=1e-12)
+        assert imaging.ela_analysis(img)["score"] == pytest.approx(want, rel=0.01)
+        assert imaging.ela_score_from_image(img) == imaging.ela_analysis(img)["score"]
+
+
+def test_heatmap_cells_are_block_means_of_the_difference():
+    img = _scan(patch=(700, 420))
+    _, luma = legacy_ela(img)
+    out = imaging.ela_analysis(img, strip_rows=1 << 20, grid=4)
+    h, w = luma.shape
+    want = [[luma[r * h // 4:(r + 1) * h // 4, c * w // 4:(c + 1) * w // 4].mean() for c in range(4)] for r in range(4)]
+    np.testing.assert_allclose(out["grid"], want, atol=1e-3)
+    assert out["max_cell"] == [2, 3]                      # the pasted, never-recompressed block
+    assert out["grid_max"] == pytest.approx(max(map(max, want)), abs=1e-9)
+    assert out["size"] == [960, 640] and out["downscaled"] is False
+    assert imaging.ela_analysis(img, grid=1)["grid"] == [[round(out["score"], 3)]]
+
+
+def test_ela_input_modes_and_downscale():
+    img = _scan()
+    assert imaging.ela_analysis(img.convert("RGBA"))["score"] == imaging.ela_analysis(img)["score"]
+    small = imaging.ela_analysis(img, max_pixels=960 * 640 // 4)
+    assert small["downscaled"] and small["size"] == [480, 320]
+
+
+# ---------- PDF transcripts ----------
+PAGE_FILL = {1: (235, 235, 235), 2: (120, 120, 120)}
+
+
+def _page_text(img, texts):
+    """Stand-in for Tesseract: pages are told apart by their fill colour."""
+    return texts[1] if img.convert("L").getpixel((4, 4)) > 180 else texts[2]
+
+
+@pytest.fixture
+def two_page_pdf(monkeypatch):
+    pages = {n: Image.new("RGB", (850, 1100), fill) for n, fill in PAGE_FILL.items()}
+    buf = BytesIO()
+    pages[1].save(buf, "PDF", save_all=True, append_images=[pages[2]], resolution=100)
+    rendered = []
+    try:
+        import pdf2image  # noqa: F401
+        poppler = shutil.which("pdftoppm") is not None
+    except ImportError:
+        poppler = False
+    real_render = imaging._render_page
+    if not poppler:     # no poppler here: hand back the source pages instead of rasterizing the file
+        monkeypatch.setattr(imaging, "_pdf_page_count", lambda path: len(pages))
+        real_render = lambda path, page_no, dpi: pages[page_no].copy()    # noqa: E731
+    monkeypatch.setattr(imaging, "_render_page",
+                        lambda path, page_no, dpi: rendered.append(page_no) or real_render(path, page_no, dpi))
+    return buf.getvalue(), rendered
+
+
+def _ocr_as(monkeypatch, texts):
+    monkeypatch.setattr(imaging, "ocr_image", lambda img, institute=None: _page_text(img, texts))
+
+
+def test_pdf_pages_are_read_in_order(two_page_pdf, monkeypatch):
+    data, rendered = two_page_pdf
+    assert imaging.is_pdf(data)
+    _ocr_as(monkeypatch, {1: "Student Name: Asha Sharma\nInstitute: NIT Silchar", 2: "Percentage: 81.5%"})
+    out = imaging.ocr_pdf(data, workers=2)
+    assert out["ocr_text"] == "Student Name: Asha Sharma\nInstitute: NIT Silchar\nPercentage: 81.5%"
+    assert out["pdf"] == {"pages_total": 2, "pages_ocr": 2, "dpi": imaging.PDF_DPI, "stopped_early": False}
+    assert rendered == [1, 2]
+
+
+def test_pdf_stops_once_the_fields_are_found(two_page_pdf, monkeypatch):
+    data, rendered = two_page_pdf
+    _ocr_as(monkeypatch, {1: "Student Name: Asha Sharma\nInstitute: NIT Silchar\nPercentage: 81.5%",
+                          2: "Subject grades ..."})
+    out = imaging.ocr_pdf(data, workers=1)
+    assert out["pdf"]["pages_ocr"] == 1 and out["pdf"]["stopped_early"]
+    assert "Subject grades" not in out["ocr_text"]
+    assert rendered == [1]                        # page 2 was never rendered
+
+
+def test_pdf_page_limit(two_page_pdf, monkeypatch):
+    data, rendered = two_page_pdf
+    _ocr_as(monkeypatch, {1: "Student Name: Asha Sharma", 2: "Percentage: 81.5%"})
+    out = imaging.ocr_pdf(data, max_pages=1)
+    assert out["ocr_text"] == "Student Name: Asha Sharma"
+    assert out["pdf"]["pages_total"] == 2 and out["pdf"]["pages_ocr"] == 1 and not out["pdf"]["stopped_early"]
+    assert rendered == [1]
+    assert imaging.ocr_pdf(data, done=None)["pdf"]["pages_ocr"] == 2
@@ -0,0 +1,126 @@
+import asyncio, subprocess, sys
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import imaging
+import ingest
+
+from conftest import BACKEND
+
+
+def _jpeg(size=(2400, 1700), quality=85, **save):
+    rng = np.random.default_rng(0)
+    img = Image.fromarray(rng.integers(0, 255, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)).resize(size)
+    draw = ImageDraw.Draw(img)
+    for y in range(100, size[1] - 100, 120):
+        draw.text((120, y), "Name: Asha Sharma  Marks: 81.5%", fill="black")
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=quality, **save)
+    return buf.getvalue()
+
+
+class _Upload:
+    def __init__(self, data, size=None):
+        self._buf, self.size = BytesIO(data), size
+
+    async def read(self, n):
+        return self._buf.read(n)
+
+
+def test_read_upload_stops_past_the_byte_limit():
+    data = b"x" * (3 * ingest.READ_CHUNK)
+    assert asyncio.run(ingest.read_upload(_Upload(data), max_bytes=len(data))) == data
+    with pytest.raises(ingest.UploadTooLarge) as e:
+        asyncio.run(ingest.read_upload(_Upload(data), max_bytes=ingest.READ_CHUNK))
+    assert e.value.limit == "bytes"
+    with pytest.raises(ingest.UploadTooLarge):      # declared size refused before any read
+        asyncio.run(ingest.read_upload(_Upload(b"", size=10), max_bytes=5))
+    with pytest.raises(ingest.UploadTooLarge):
+        ingest.check_bytes(b"abc", max_bytes=2)
+
+
+def test_pixel_limit_is_checked_from_the_header(monkeypatch):
+    data = _jpeg((800, 600))
+    monkeypatch.setattr(ingest, "UPLOAD_MAX_PIXELS", 800 * 600 - 1)
+    with pytest.raises(ingest.UploadTooLarge) as e:
+        ingest.decode(data)
+    assert e.value.limit == "pixels"
+    with pytest.raises(ingest.UploadTooLarge):
+        ingest.decode_full(data)
+
+
+def test_jpeg_drafts_within_budget_and_keeps_dpi():
+    data = _jpeg(dpi=(300, 300))
+    out = ingest.decode(data, max_pixels=1_000_000)
+    w, h = out["size"]
+    assert out["draft"] and 1_000_000 / 4 <= w * h <= 1_000_000
+    assert out["source_size"] == [2400, 1700] and out["image"].mode == "RGB"
+    assert out["image"].info["dpi"][0] == pytest.approx(300 * out["scale"], rel=1e-3)
+
+
+def test_other_formats_are_reduced_to_budget():
+    buf = BytesIO()
+    Image.new("L", (2000, 1500), 200).save(buf, "PNG")
+    out = ingest.decode(buf.getvalue(), max_pixels=500_000)
+    assert not out["draft"] and out["size"][0] * out["size"][1] <= 500_000
+    assert out["image"].mode == "RGB"
+
+
+def test_ela_score_unchanged_for_a_large_jpeg():
+    data = _jpeg()
+    reference = imaging.ela_analysis(Image.open(BytesIO(data)).convert("RGB"))
+    shared = ingest.decode(data, max_pixels=1_000_000)["image"]
+    assert shared.size != (2400, 1700)
+    full = ingest.decode_full(data, shared)
+    assert full.size == (2400, 1700)
+    assert imaging.ela_analysis(full)["score"] == reference["score"]
+
+    import agent_ai
+    _, evidence = agent_ai.image_evidence({}, data, None, False, True, shared)
+    assert evidence["ela"] == reference["score"]
+
+
+def test_decode_full_reuses_an_unscaled_decode():
+    data = _jpeg((640, 480))
+    img = ingest.decode(data)["image"]
+    assert ingest.decode_full(data, img) is img
+
+
+def test_ela_strips_match_a_whole_image_pass():
+    img = Image.open(BytesIO(_jpeg())).convert("RGB")
+    whole = imaging.ela_analysis(img, strip_rows=1 << 20)
+    strips = imaging.ela_analysis(img, strip_rows=256)
+    assert strips["size"] == whole["size"] == [2400, 1700]
+    assert strips["score"] == pytest.approx(whole["score"], rel=0.01)
+    assert np.allclose(strips["grid"], whole["grid"], rtol=0.02)
+    assert strips["grid_max"] == pytest.approx(whole["grid_max"], rel=0.02)
+
+
+ELA_PEAK = """
+import sys
+sys.path.insert(0, {backend!r})
+from io import BytesIO
+from PIL import Image
+import imaging
+def hwm():
+    with open("/proc/self/status") as f:
+        return next(int(l.split()[1]) for l in f if l.startswith("VmHWM:")) * 1024
+img = Image.open(BytesIO(open({path!r}, "rb").read())).convert("RGB")
+base = hwm()
+imaging.ela_analysis(img)
+print(hwm() - base)
+"""
+
+
+@pytest.mark.skipif(not Path("/proc/self/status").exists(), reason="needs /proc VmHWM")
+def test_ela_peak_memory_is_a_fraction_of_the_bitmap(tmp_path):
+    # 12 MP: a whole-image pass adds a recompressed copy, a difference image and its
+    # luma fold (~2.3x the RGB bitmap); strips keep it to a few bands
+    path = tmp_path / "scan.jpg"
+    path.write_bytes(_jpeg((4000, 3000), quality=90))
+    out = subprocess.check_output([sys.executable, "-c", ELA_PEAK.format(backend=str(BACKEND), path=str(path))])
+    assert int(out.split()[-1]) < 0.25 * 4000 * 3000 * 3
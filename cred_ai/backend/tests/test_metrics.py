@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    reg = metrics.Registry(buckets=(0.01, 0.1, 1.0))
+    monkeypatch.setattr(metrics, "REGISTRY", reg)
+    return reg
+
+
+def test_histogram_buckets_are_upper_inclusive():
+    h = metrics.Histogram((0.01, 0.1, 1.0))
+    for s in (0.005, 0.01, 0.011, 0.1, 0.5, 2.0, 7.0):
+        h.observe(s)
+    assert h.counts == [2, 2, 1, 2]                   # le=0.01 holds 0.01 itself; the last slot is +Inf
+    assert (h.n, h.total) == (7, pytest.approx(9.626))
+    assert [h.quantile(q) for q in (0.25, 0.5, 0.7, 0.99)] == [0.01, 0.1, 1.0, float("inf")]
+    assert metrics.Histogram().quantile(0.5) is None
+
+
+def test_timed_counts_stage_errors(registry):
+    @metrics.timed("ocr_image")
+    def ocr(fail):
+        if fail:
+            raise ValueError("unreadable scan")
+        return "text"
+
+    assert ocr(False) == "text"
+    with pytest.raises(ValueError):
+        ocr(True)
+    with pytest.raises(KeyError), metrics.timed("decode"):
+        raise KeyError("x")
+    with metrics.request_timings() as timings, metrics.timed("decode"):
+        pass
+    assert set(timings) == {"decode"}
+    assert registry._errors == {("stage", "ocr_image"): 1, ("stage", "decode"): 1}
+    assert registry._inflight == {("stage", "ocr_image"): 0, ("stage", "decode"): 0}
+    snap = registry.snapshot()["stage"]
+    assert snap["ocr_image"]["count"] == 2 and snap["decode"]["count"] == 2
+
+
+def test_metrics_endpoint_renders_prometheus_text(app_module, registry):
+    for s in (0.005, 0.05, 0.05, 3.0):
+        registry.observe("stage", "ocr_image", s)
+    registry.observe("request", "agent_ai", 0.2, error=True)
+    registry._track("stage", "ocr_image", 1)
+    registry.collector(lambda: [("verifier_cache_hits_total", {"tier": "memory"}, 3), ("verifier_cache_entries", {}, 12)])
+    registry.collector(lambda: 1 / 0)                 # a failing collector doesn't break the scrape
+
+    client = TestClient(app_module.app)
+    resp = client.get("/metrics")
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = resp.text.splitlines()
+    stage = [l for l in lines if l.startswith("verifier_stage_seconds")]
+    assert stage == [
+        'verifier_stage_seconds_bucket{stage="ocr_image",le="0.01"} 1',
+        'verifier_stage_seconds_bucket{stage="ocr_image",le="0.1"} 3',
+        'verifier_stage_seconds_bucket{stage="ocr_image",le="1"} 3',
+        'verifier_stage_seconds_bucket{stage="ocr_image",le="+Inf"} 4',
+        'verifier_stage_seconds_sum{stage="ocr_image"} 3.105000',
+        'verifier_stage_seconds_count{stage="ocr_image"} 4',
+    ]
+    for line in ("# TYPE verifier_request_seconds histogram", "# TYPE verifier_stage_seconds histogram",
+                 'verifier_request_seconds_count{endpoint="agent_ai"} 1',
+                 "# TYPE verifier_stage_in_flight gauge", 'verifier_stage_in_flight{stage="ocr_image"} 1',
+                 "# TYPE verifier_request_errors_total counter", 'verifier_request_errors_total{endpoint="agent_ai"} 1',
+                 "# TYPE verifier_cache_hits_total counter", 'verifier_cache_hits_total{tier="memory"} 3',
+                 "# TYPE verifier_cache_entries gauge", "verifier_cache_entries 12"):
+        assert line in lines
+    assert sum(l.startswith("# TYPE verifier_stage_seconds ") for l in lines) == 1
+
+    snap = client.get("/metrics", params={"format": "json"}).json()   # 3.0s overflows the last bucket
+    assert snap["stage"]["ocr_image"] == {"count": 4, "mean_ms": 776.25, "inflight": 1,
+                                          "p50_ms": 100.0, "p95_ms": 1000.0, "p99_ms": 1000.0}
+    assert snap["request"]["agent_ai"]["count"] == 1
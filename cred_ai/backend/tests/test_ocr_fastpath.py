@@ -0,0 +1,68 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+import imaging
+import ocr_fastpath
+
+LINES = [100 + i * 80 for i in range(6)]
+
+
+def _page():
+    img = Image.new("L", (1200, 900), 255)
+    d = ImageDraw.Draw(img)
+    d.rectangle((10, 10, 1189, 889), outline=0, width=4)      # page frame
+    for y in LINES:
+        d.text((100, y), "Certificate No ABC/123 Student Name Jane Doe", fill=0, font_size=36)
+    d.rectangle((950, 600, 1150, 800), fill=0)                 # photo / seal block
+    return img
+
+
+def test_otsu_splits_a_bimodal_histogram():
+    rng = np.random.default_rng(0)
+    dark = rng.normal(50, 8, 3000)
+    light = rng.normal(200, 8, 7000)
+    gray = np.clip(np.concatenate([dark, light]), 0, 255).astype(np.uint8)
+    t = ocr_fastpath.otsu_threshold(gray)
+    assert gray[:3000].max() <= t < gray[3000:].min()
+    ink = ocr_fastpath.binarize(Image.fromarray(gray.reshape(100, 100)))
+    assert ink.sum() == (gray <= t).sum() == 3000
+
+
+def test_binarize_inverts_light_text_on_dark():
+    inverted = Image.new("L", (400, 100), 30)
+    ImageDraw.Draw(inverted).rectangle((50, 40, 349, 59), fill=220)
+    ink = ocr_fastpath.binarize(inverted)
+    assert ink.sum() == 300 * 20
+    assert (np.asarray(inverted)[ink] == 220).all()
+
+
+def test_estimate_skew_undoes_rotation():
+    for angle in (3.0, -2.0):
+        rotated = _page().rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+        assert abs(ocr_fastpath.estimate_skew(ocr_fastpath.binarize(rotated)) + angle) <= 0.25
+    assert ocr_fastpath.estimate_skew(ocr_fastpath.binarize(_page())) == 0.0
+
+
+def test_text_regions_are_line_bands_without_frame_or_photo():
+    boxes = ocr_fastpath.text_regions(ocr_fastpath.binarize(_page()))
+    assert len(boxes) == len(LINES)
+    for (x0, y0, x1, y1), y in zip(boxes, LINES):
+        assert y0 <= y < y1 and y1 - y0 < 80
+        assert x0 < 100 < x1 < 950
+
+
+def test_fast_ocr_falls_back_to_full_page_when_template_boxes_are_empty(monkeypatch):
+    monkeypatch.setitem(ocr_fastpath._LAYOUTS, "test university",
+                        {"boxes": {"name": [0.1, 0.1, 0.9, 0.2], "serial": [0.1, 0.3, 0.9, 0.4]}})
+    calls = []
+    monkeypatch.setattr(ocr_fastpath, "_tesseract_words_by_span", lambda img, spans, psm=6: ["" for _ in spans])
+    monkeypatch.setattr(imaging, "ocr_full_page", lambda img: calls.append(img) or "Student Name: Jane Doe")
+    out = ocr_fastpath.fast_ocr(_page(), "Test University")
+    assert out["mode"] == "template" and out["fields"] == {} and out["text"] == ""
+    assert imaging.ocr_image(_page(), "Test University", mode="fast") == "Student Name: Jane Doe"
+    assert len(calls) == 1
+
+    monkeypatch.setattr(ocr_fastpath, "_tesseract_words_by_span", lambda img, spans, psm=6: ["Jane Doe", "ABC/123"])
+    text = imaging.ocr_image(_page(), "Test University", mode="fast")
+    assert text == "Student Name: Jane Doe\nCertificate No: ABC/123"
+    assert len(calls) == 1
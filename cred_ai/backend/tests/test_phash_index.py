@@ -0,0 +1,83 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import phash_index
+from phash_index import HashIndex, phash, phash_bytes, popcount
+
+
+def _flip(h, bits):
+    for b in bits:
+        h ^= 1 << int(b)
+    return h
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    hashes = rng.integers(0, 2**63, 20000, dtype=np.uint64) * 2 + rng.integers(0, 2, 20000, dtype=np.uint64)
+    queries = [_flip(int(hashes[i]), rng.choice(64, d, replace=False))
+               for i, d in zip(rng.choice(len(hashes), 60), np.arange(60) % 16)]
+    return hashes, [f"K{i}" for i in range(len(hashes))], queries
+
+
+def _brute(hashes, keys, q, radius, k):
+    d = popcount(hashes ^ np.uint64(q))
+    ix = np.flatnonzero(d <= radius)
+    return sorted((int(d[i]), keys[i]) for i in ix)[:k]
+
+
+def test_mih_matches_brute_force_up_to_radius_15(corpus):
+    hashes, keys, queries = corpus
+    idx = HashIndex()
+    idx.add_many(hashes.tolist(), keys)
+    for q in queries:
+        for radius in (4, 8, 15):
+            got = idx.query(q, radius=radius, k=1000)
+            want = _brute(hashes, keys, q, radius, 1000)
+            assert sorted((g["distance"], g["key"]) for g in got) == want
+
+
+def test_delta_rows_are_found_before_and_after_merge(corpus, monkeypatch):
+    hashes, keys, _ = corpus
+    monkeypatch.setattr(phash_index, "PHASH_DELTA_MERGE", 10**9)
+    idx = HashIndex()
+    idx.add_many(hashes[:1000].tolist(), keys[:1000])
+    idx.add(int(hashes[5000]), "late")
+    assert idx.status()["delta_rows"] == 1
+    assert idx.query(int(hashes[5000]), radius=0)[0] == {"key": "late", "distance": 0}
+    idx._merge()
+    assert idx.status()["delta_rows"] == 0
+    assert idx.query(int(hashes[5000]), radius=0)[0]["key"] == "late"
+
+
+def test_save_load_and_shared_delta_log(corpus, tmp_path):
+    hashes, keys, queries = corpus
+    idx = HashIndex(str(tmp_path))
+    idx.add_many(hashes[:2000].tolist(), keys[:2000])
+    idx.save()
+    a, b = HashIndex.load(str(tmp_path)), HashIndex.load(str(tmp_path))
+    assert isinstance(a._base.hashes, np.memmap) and len(a) == 2000
+    a.add(int(hashes[9000]), "from-a")             # b picks it up from delta.jsonl
+    b._tail_log(force=True)
+    assert b.query(int(hashes[9000]), radius=0)[0]["key"] == "from-a"
+    a.save()
+    c = HashIndex.load(str(tmp_path))
+    assert len(c) == 2001 and c.status()["delta_rows"] == 0
+
+
+def test_phash_survives_recompression_and_resize():
+    img = Image.new("RGB", (600, 420), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((40, 40, 560, 380), outline="navy", width=8)
+    for y in range(90, 340, 30):
+        draw.line((80, y, 80 + (y * 7) % 400, y), fill="black", width=5)
+    buf = BytesIO()
+    img.resize((300, 210)).save(buf, "JPEG", quality=40)
+    other = Image.new("RGB", (600, 420), "white")
+    ImageDraw.Draw(other).ellipse((100, 50, 500, 400), fill="darkred")
+    h = phash(img)
+    assert bin(h ^ phash_bytes(buf.getvalue())).count("1") <= 8
+    assert bin(h ^ phash(other)).count("1") > 15
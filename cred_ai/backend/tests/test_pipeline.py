@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+import agent_ai
+import pipeline
+import startup
+
+
+def test_deadline_clock_starts_after_startup(monkeypatch):
+    slow = startup.LazyResource("slow", lambda: time.sleep(0.5) or "ready")
+    monkeypatch.setattr(startup, "RESOURCES", {"slow": slow})
+    monkeypatch.setitem(pipeline.DEADLINES, "dates", 0.2)
+    real = agent_ai.date_check
+    monkeypatch.setattr(agent_ai, "date_check", lambda md: (slow.get(), real(md))[1])
+
+    metadata = {"issuance_date": "29-05-2022", "convocation_date": "28-06-2022"}
+    result = asyncio.run(pipeline.run_agent_async({"metadata": metadata, "institute_name": "MNNIT Allahabad"}))
+    assert slow.loaded
+    assert result["checks"]["dates"]["status"] == "ok"
+    assert "dates" not in result.get("partial", [])
+
+
+def test_ensure_loaded_is_a_no_op_once_ready(monkeypatch):
+    calls = []
+    res = startup.LazyResource("r", lambda: calls.append(1))
+    monkeypatch.setattr(startup, "RESOURCES", {"r": res})
+    assert startup.pending() == ["r"]
+    assert startup.ensure_loaded()["ready"]
+    startup.ensure_loaded()
+    assert calls == [1] and startup.pending() == []
+
+
+def test_timed_out_check_keeps_its_slot_until_the_worker_finishes(monkeypatch):
+    monkeypatch.setitem(pipeline.DEADLINES, "ela", 0.05)
+    release = threading.Event()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        sem = pipeline._limits(loop)["ocr"] = asyncio.Semaphore(1)
+        checks = {}
+        assert await pipeline._check(checks, "ela", release.wait, 5, slot="ocr") is None
+        assert checks["ela"]["status"] == "timeout"
+        assert sem.locked()                   # the worker thread is still inside release.wait
+        release.set()
+        await asyncio.wait_for(sem.acquire(), 2)
+        sem.release()
+        assert await pipeline._check(checks, "ela", lambda: "done", slot="ocr") == "done"
+        assert not sem.locked()
+
+    asyncio.run(main())
+
+
+def test_ela_shares_the_ocr_slot(monkeypatch):
+    seen = []
+
+    async def fake_check(checks, name, fn, *args, executor=None, slot=None):
+        seen.append((name, slot))
+        checks[name] = {"status": "ok"}
+        return None
+
+    monkeypatch.setattr(pipeline, "_check", fake_check)
+    monkeypatch.setattr(agent_ai._RESULT_CACHE, "get", lambda *a: None)
+    asyncio.run(pipeline._credential({"image_bytes": b"\xff\xd8\xff not a real scan"}, {}, {}))
+    assert dict(seen)["ela"] == "ocr" == dict(seen)["ocr"]
@@ -0,0 +1,65 @@
+import json
+
+import pandas as pd
+import pytest
+
+from registry import TrustedRegistry
+
+
+@pytest.fixture
+def reg_paths(tmp_path, data_csv):
+    base = pd.read_csv(data_csv, dtype=str)
+    csv = tmp_path / "trusted.csv"
+    base.head(50).to_csv(csv, index=False)
+    deltas = tmp_path / "deltas"
+    deltas.mkdir()
+    return base, csv, deltas, tmp_path
+
+
+def _registry(csv, deltas, tmp_path):
+    reg = TrustedRegistry(str(csv), artifact_dir=str(tmp_path / "cache"), delta_dir=str(deltas))
+    reg.load()
+    return reg
+
+
+def test_header_only_delta_does_not_reload(reg_paths):
+    base, csv, deltas, tmp = reg_paths
+    reg = _registry(csv, deltas, tmp)
+    base.head(0).to_csv(deltas / "new.csv", index=False)
+    for _ in range(2):
+        out = reg.poll()
+        assert not out["reloaded"] and out["rows_added"] == 0
+    assert reg.stats["reloads"] == 1
+    base.iloc[60:62].to_csv(deltas / "new.csv", mode="a", header=False, index=False)
+    out = reg.poll()
+    assert out["rows_added"] == 2 and not out["reloaded"]
+
+
+def test_appends_and_deltas_are_ingested(reg_paths):
+    base, csv, deltas, tmp = reg_paths
+    reg = _registry(csv, deltas, tmp)
+    v0, snapshot = reg.version, reg.current()
+    base.iloc[50:53].to_csv(csv, mode="a", header=False, index=False)
+    base.iloc[53:55].to_csv(deltas / "a.csv", index=False)
+    with open(deltas / "b.jsonl", "w") as f:
+        f.write(json.dumps(base.iloc[55].to_dict()) + "\n")
+        f.write(json.dumps(base.iloc[56].to_dict()))          # no newline yet: left for the next poll
+    out = reg.poll()
+    assert out["rows_added"] == 6 and out["version"] != v0
+    assert len(reg.current().df) == 56 and len(snapshot.df) == 50
+    with open(deltas / "b.jsonl", "a") as f:
+        f.write("\n")
+    assert reg.poll()["rows_added"] == 1
+    assert reg.poll()["rows_added"] == 0
+    assert reg.stats["reloads"] == 1
+
+
+def test_rewritten_file_triggers_full_reload(reg_paths):
+    base, csv, deltas, tmp = reg_paths
+    reg = _registry(csv, deltas, tmp)
+    base.iloc[60:64].to_csv(deltas / "a.csv", index=False)
+    assert reg.poll()["rows_added"] == 4
+    base.iloc[70:72].to_csv(deltas / "a.csv", index=False)   # shrunk and rewritten
+    out = reg.poll()
+    assert out["reloaded"] and reg.stats["reloads"] == 2
+    assert len(reg.current().df) == 52
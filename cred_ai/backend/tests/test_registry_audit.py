@@ -0,0 +1,76 @@
+import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import IsolationForest
+
+import registry_audit
+import train_agent
+from bench_registry_audit import per_row, synthesize
+from registry_audit import FLAGS, SerialFlags
+
+TODAY = datetime.date(2026, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def planted(data_csv, tmp_path_factory):
+    df, planted = synthesize(str(data_csv), 6000, 40)
+    tmp = tmp_path_factory.mktemp("audit")
+    csv = tmp / "registry.csv"
+    df.to_csv(csv, index=False)
+    report = registry_audit.audit(str(csv), str(tmp / "out"), model_dir=str(tmp / "no-models"), today=TODAY)
+    return df, planted, report, SerialFlags.load(str(tmp / "out"))
+
+
+def test_bitmask_reduction_matches_per_row_loop(planted, monkeypatch):
+    df, _, report, flags = planted
+    monkeypatch.setattr(datetime, "date", type("D", (datetime.date,), {"today": staticmethod(lambda: TODAY)}))
+    rows = per_row(df)
+    want = {}
+    for serial, f in zip(df["certificate_serial_number"], rows):
+        want[serial] = want.get(serial, 0) | f
+    checked = FLAGS["duplicate_serial"] | FLAGS["convocation_before_issuance"] | \
+        FLAGS["issuance_in_future"] | FLAGS["marks_out_of_range"]
+    got = {s: sum(FLAGS[n] for n in (flags.lookup(s) or {"flags": []})["flags"]) & checked for s in want}
+    assert got == want
+    assert report["anomaly_model"] is None
+
+
+def test_planted_problems_are_flagged(planted):
+    df, planted_rows, report, flags = planted
+    serials = df["certificate_serial_number"]
+    for name, idx in planted_rows.items():
+        if name == "iso_dates":
+            for s in serials.iloc[idx]:
+                assert "issuance_unparseable" not in (flags.lookup(s) or {"flags": []})["flags"]
+            continue
+        for s in serials.iloc[idx]:
+            assert name in flags.lookup(s)["flags"], (name, s)
+    assert report["flag_counts"]["convocation_unparseable"] == 40
+    assert report["serials_flagged"] == len(flags)
+
+
+def test_serials_stripped_missing_skipped_and_min_anomaly_score(data_csv, tmp_path):
+    base = pd.read_csv(data_csv, dtype=str).head(6)
+    base["certificate_serial_number"] = ["A1", " A1 ", None, "B2", "C3", "C3"]
+    base.loc[4, "marks_percent"] = "-3"
+    csv = tmp_path / "r.csv"
+    base.to_csv(csv, index=False)
+
+    X, y = train_agent.build_features(pd.read_csv(data_csv))
+    iso = IsolationForest(n_estimators=20, random_state=0).fit(X[y == 0])
+    models = tmp_path / "models"
+    models.mkdir()
+    joblib.dump(iso, models / train_agent.ANOMALY_NAME)
+
+    report = registry_audit.audit(str(csv), str(tmp_path / "out"), model_dir=str(models), today=TODAY)
+    flags = SerialFlags.load(str(tmp_path / "out"))
+    assert report["rows_without_serial"] == 1
+    assert "duplicate_serial" in flags.lookup("A1")["flags"]
+    assert "marks_out_of_range" in flags.lookup(" C3")["flags"]
+    scores = iso.decision_function(train_agent.build_features(pd.read_csv(csv))[0])
+    c3 = flags.lookup("C3")
+    assert c3["anomaly_score"] == pytest.approx(min(scores[4], scores[5]), abs=1e-5)
+    assert (flags.lookup("B2") is None) == (scores[3] >= 0)     # only flagged serials are written
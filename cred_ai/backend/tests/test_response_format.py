@@ -0,0 +1,65 @@
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import response_format
+from bench_response import sample_result
+
+
+@pytest.fixture
+def result(data_csv):
+    return sample_result(str(data_csv), 3)
+
+
+@pytest.fixture(params=["orjson", "json"])
+def dumps(request):
+    if request.param == "orjson":
+        if response_format.orjson is None:
+            pytest.skip("orjson not installed")
+        return response_format.dumps
+    return lambda o: json.dumps(o, default=response_format._default, separators=(",", ":")).encode()
+
+
+def test_full_is_unchanged(result):
+    assert response_format.shape(result, "full") is result
+
+
+def test_verdict_keeps_only_decision_keys(result):
+    out = response_format.shape(result, "verdict")
+    assert set(out) == {"student_id", "tenant", "registry_version", "decision",
+                        "institute_verified", "certificate_verified"}
+
+
+def test_summary_drops_bulk_but_keeps_references(result):
+    out = response_format.shape(result, "SUMMARY")
+    checks = out["institution_evidence"]["checks"]
+    assert "row" not in checks["trusted_csv"] and checks["trusted_csv"]["ref"]
+    assert "text_snippet" not in checks["website"] and "domain_cache" not in checks
+    cred = out["credential_evidence"]
+    assert "ocr_text" not in cred and "ela_heatmap" not in cred and cred["ela"] == result["credential_evidence"]["ela"]
+    assert "rows" not in cred["serial_check"] and len(cred["serial_check"]["refs"]) == 3
+    assert "features" not in out and "model_scores" in out
+    # shaping copies; the cached full result is untouched
+    assert "row" in result["institution_evidence"]["checks"]["trusted_csv"]
+
+
+def test_default_verbosity_comes_from_config(result, monkeypatch):
+    monkeypatch.setattr(response_format, "RESPONSE_VERBOSITY", "verdict")
+    assert "credential_evidence" not in response_format.shape(result)
+
+
+def test_dumps_handles_numpy_and_pandas(result, dumps):
+    for level in response_format.VERBOSITY_LEVELS:
+        json.loads(dumps(response_format.shape(result, level)))
+    extra = {"ts": pd.Timestamp("2024-01-02"), "na": pd.NA, "nat": pd.NaT, "d": datetime.date(2024, 1, 2),
+             "arr": np.arange(3), "i": np.int32(4), "s": {1}}
+    assert json.loads(dumps(extra)) == {"ts": "2024-01-02T00:00:00", "na": None, "nat": None, "d": "2024-01-02",
+                                        "arr": [0, 1, 2], "i": 4, "s": [1]}
+
+
+def test_unknown_types_raise(dumps):
+    with pytest.raises(TypeError):
+        dumps({"x": object()})
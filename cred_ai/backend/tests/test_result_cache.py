@@ -0,0 +1,113 @@
+import types
+
+import numpy as np
+import pytest
+
+import agent_ai
+import result_cache
+from result_cache import VerificationCache, make_key
+
+
+class Clock:
+    def __init__(self, t=1_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(result_cache, "time", types.SimpleNamespace(time=c))
+    return c
+
+
+@pytest.fixture
+def watched(tmp_path):
+    path = tmp_path / "registry.csv"
+    path.write_text("serial\nA1\n")
+    return path
+
+
+def test_memory_hits_and_cached(clock):
+    cache = VerificationCache(max_entries=2)
+    calls = []
+    value, info = cache.cached("credential", "k1", lambda: calls.append(1) or {"ela": np.float32(1.5)})
+    assert info == {"hit": False} and value == {"ela": np.float32(1.5)}
+    clock.t += 3
+    value, info = cache.cached("credential", "k1", lambda: calls.append(1))
+    assert value == {"ela": 1.5} and info == {"hit": True, "tier": "memory", "age_s": 3.0}
+    assert calls == [1] and cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+    cache.put("credential", "k2", 2)
+    cache.get("credential", "k1")                 # k1 is now the most recently used
+    cache.put("credential", "k3", 3)
+    assert cache.get("credential", "k2") is None and cache.get("credential", "k1")[0] == {"ela": 1.5}
+
+
+def test_per_kind_ttl(clock):
+    cache = VerificationCache(ttls={"credential": 100, "institution": 10, "phash": 0})
+    for kind in ("credential", "institution", "phash"):
+        cache.put(kind, "k", kind)
+    assert cache.get("phash", "k") is None       # a zero TTL is never stored
+    clock.t += 10
+    assert cache.get("institution", "k")[0] == "institution"
+    clock.t += 1
+    assert cache.get("institution", "k") is None
+    assert cache.get("credential", "k")[0] == "credential"
+    clock.t += 90
+    assert cache.get("credential", "k") is None
+
+
+def test_watched_file_change_invalidates(tmp_path, watched, clock):
+    db = str(tmp_path / "cache.db")
+    cache = VerificationCache(db_path=db, watch_paths=[str(watched)], check_interval=5)
+    cache.put("credential", "k", {"v": 1})
+    watched.write_text("serial\nA1\nB2\n")
+    assert cache.get("credential", "k") is not None   # not re-checked until check_interval passes
+    clock.t += 5
+    assert cache.get("credential", "k") is None       # memory cleared, disk row is the old generation
+    assert cache.stats["invalidations"] == 1
+    cache.put("credential", "k", {"v": 2})
+    assert cache.get("credential", "k")[0] == {"v": 2}
+
+
+def test_sqlite_tier_survives_a_restart(tmp_path, watched, clock):
+    db = str(tmp_path / "cache.db")
+    first = VerificationCache(db_path=db, watch_paths=[str(watched)])
+    first.put("institution", "k", {"institution_score": 90})
+    clock.t += 60
+    second = VerificationCache(db_path=db, watch_paths=[str(watched)])
+    value, info = second.get("institution", "k")
+    assert value == {"institution_score": 90} and info["tier"] == "disk" and info["age_s"] == 60.0
+    assert second.get("institution", "k")[1]["tier"] == "memory"
+    assert second.stats["disk_hits"] == 1
+    watched.write_text("changed\n")
+    third = VerificationCache(db_path=db, watch_paths=[str(watched)])
+    assert third.get("institution", "k") is None
+
+
+def test_registry_version_is_part_of_the_key(monkeypatch):
+    cache = VerificationCache()
+    monkeypatch.setattr(agent_ai, "_RESULT_CACHE", cache)
+    calls = []
+    monkeypatch.setattr(agent_ai, "_institution_authenticator",
+                        lambda name, website=None, code=None: calls.append(name) or {"institution_score": len(calls)})
+    snapshot = types.SimpleNamespace(version="v1")
+    token = agent_ai._SNAPSHOT.set(snapshot)
+    try:
+        assert agent_ai.institution_authenticator("NIT Silchar")["cache"] == {"hit": False}
+        assert agent_ai.institution_authenticator(" nit silchar ")["cache"]["hit"]
+        snapshot.version = "v2"                       # the registry ingested a delta
+        assert agent_ai.institution_authenticator("NIT Silchar")["institution_score"] == 2
+        snapshot.version = "v1"
+        assert agent_ai.institution_authenticator("NIT Silchar")["institution_score"] == 1
+    finally:
+        agent_ai._SNAPSHOT.reset(token)
+    assert len(calls) == 2
+
+
+def test_make_key_is_canonical():
+    assert make_key({"a": 1, "b": [1, 2]}) == make_key({"b": [1, 2], "a": 1})
+    assert make_key(b"img") != make_key("img")
+    assert make_key(np.int64(3)) == make_key(3)
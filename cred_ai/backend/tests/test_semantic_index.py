@@ -0,0 +1,103 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import agent_ai
+import metrics
+import startup
+from semantic_index import SemanticEngine, StaleStore, VectorStore
+from trusted_index import InstituteIndex, normalize_name
+
+
+class StubEncoder:
+    """Character-trigram hashing into 64 dims; records which threads call it, can be held."""
+    name, dim = "stub-encoder", 64
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def encode(self, texts):
+        self.gate.wait(5)
+        self.calls.append((threading.current_thread().name, list(texts)))
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for r, t in enumerate(texts):
+            t = f"  {t}  "
+            for i in range(len(t) - 2):
+                out[r, hash(t[i:i + 3]) % self.dim] += 1.0
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-9)
+
+
+NAMES = [normalize_name(n) for n in ("National Institute of Technology Silchar", "MNNIT Allahabad",
+                                     "Indian Institute of Technology Bombay", "Birla Institute of Technology Mesra")]
+
+
+def _index(names):
+    return InstituteIndex(names, np.array([[i, 0] for i in range(len(names))], dtype=np.int64))
+
+
+def _wait(engine, timeout=5):
+    end = time.time() + timeout
+    while engine.status()["aligning"] and time.time() < end:
+        time.sleep(0.01)
+
+
+def test_missing_rows_are_built_in_the_background(tmp_path):
+    enc = StubEncoder()
+    engine = SemanticEngine(enc, str(tmp_path))
+    engine.build(NAMES[:2], [])
+    index = _index(NAMES)                   # two names the store doesn't have
+    enc.calls.clear()
+    enc.gate.clear()
+    assert engine.top_k("indian institute of technology bombay", index) == []     # not ready: caller keeps fuzzy
+    assert engine.best("indian institute of technology bombay", index) == (None, 0.0)
+    enc.gate.set()
+    _wait(engine)
+    assert engine.best("Indian Inst. of Technology Bombay", index)[0] == 2
+    assert {name for name, _ in enc.calls} == {"semantic-batcher"}     # never on the request thread
+    assert sorted(t for _, texts in enc.calls for t in texts if t in NAMES) == sorted(NAMES[2:])
+    st = engine.status()
+    assert st["aligned_built"] == 1 and st["aligned_not_ready"] >= 1
+
+
+def test_store_built_for_the_index_is_served_directly(tmp_path):
+    enc = StubEncoder()
+    engine = SemanticEngine(enc, str(tmp_path))
+    engine.build(NAMES, [])
+    index = _index(NAMES)
+    enc.calls.clear()
+    assert engine.aligned(index) is engine.institutes.matrix
+    assert engine.best("mnnit allahabad", index) == (1, pytest.approx(100.0, abs=1e-3))
+    assert enc.calls == [] and engine.status()["store_hits"] == 1
+
+
+def test_stale_store_is_reported_not_printed(tmp_path, capsys):
+    SemanticEngine(StubEncoder(), str(tmp_path)).build(NAMES, [])
+    other = StubEncoder()
+    other.dim = 32
+    engine = SemanticEngine(other, str(tmp_path))
+    assert engine.institutes is None and "institutes" in engine.status()["store_errors"]
+    assert engine.stats["stores_rejected"] == 2
+    with pytest.raises(StaleStore):
+        VectorStore.load(engine.dir / "institutes", other.name, other.dim)
+    assert capsys.readouterr().out == ""
+
+
+def test_agent_falls_back_to_fuzzy_on_encoder_timeout(tmp_path, monkeypatch, capsys):
+    enc = StubEncoder()
+    engine = SemanticEngine(enc, str(tmp_path), timeout=0.05)
+    engine.build(NAMES, [])
+    monkeypatch.setattr(agent_ai, "_SEMANTIC", startup.LazyResource("semantic_engine", lambda: engine))
+    enc.gate.clear()
+    try:
+        assert agent_ai._semantic_best("some unseen query", _index(NAMES)) == (None, 0.0)
+        assert agent_ai.semantic_sim("NIT Silchar", "N.I.T. Silchar") >= 0
+    finally:
+        enc.gate.set()
+    assert capsys.readouterr().out == ""
+    rendered = metrics.render()
+    assert 'verifier_stage_errors_total{stage="semantic_lookup"}' in rendered
+    assert 'verifier_semantic_events_total{event="aligned_built"}' in rendered
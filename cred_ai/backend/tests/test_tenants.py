@@ -0,0 +1,39 @@
+from tenants import TenantDirectory
+
+from conftest import BACKEND
+
+TENANTS_JSON = BACKEND.parent / "data" / "tenants.json"
+MITS = {"certificate_serial_number": "MITSDU/CS/2025/0001",
+        "institute_name": "Madhav Institute of Technology & Science, Gwalior (M.P.)",
+        "recipient_name": "Dr. Saurabh Agarwal", "credential_category": "certificate",
+        "issuance_date": "2025-10-08"}
+
+
+def test_shipped_known_good_rule_matches_on_its_match_block():
+    directory = TenantDirectory.from_file(str(TENANTS_JSON), lambda t: None)
+    tenant, rule = directory.match_known_good(MITS)
+    assert tenant.id == "mits_gwalior" and rule["reason"] == "forced_mits_match"
+    assert set(rule) == {"name", "reason", "match"}
+    assert directory.match_known_good(dict(MITS, issuance_date="2025-10-09")) is None
+
+
+def test_routing_by_code_and_name():
+    directory = TenantDirectory.from_file(str(TENANTS_JSON), lambda t: None)
+    assert directory.route("mitsdu").id == "mits_gwalior"
+    assert directory.route(None, "Madhav Institute of Technology and Science, Gwalior").id == "mits_gwalior"
+    assert directory.route(None, "MNNIT Allahabad") is None
+
+
+def test_split_derives_codes_from_serial_prefixes(tmp_path):
+    import pandas as pd
+    from tenants import split
+    csv = tmp_path / "registry.csv"
+    pd.DataFrame({
+        "certificate_serial_number": ["MITSDU/CS/1", "MITSDU-EE-2", "SHARED/1", "NITS/ME/3", "SHARED/2", "4FFF61B7"],
+        "institute_name": ["MITS Gwalior", "MITS Gwalior", "MITS Gwalior", "NIT Silchar", "NIT Silchar", "NIT Silchar"],
+    }).to_csv(csv, index=False)
+    spec = split(str(csv), str(tmp_path / "shards"))
+    codes = {t["names"][0]: t["codes"] for t in spec["tenants"]}
+    assert codes == {"MITS Gwalior": ["MITSDU"], "NIT Silchar": ["NITS"]}
+    directory = TenantDirectory.from_file(str(tmp_path / "shards" / "tenants.json"), lambda t: None)
+    assert directory.route("MITSDU/CS/9").names == ["MITS Gwalior"]
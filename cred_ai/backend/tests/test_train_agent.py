@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import train_agent
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    out = tmp_path / "models"
+    out.mkdir()
+    monkeypatch.setattr(train_agent, "OUT_DIR", out)
+    monkeypatch.setattr(train_agent, "VERSIONS_DIR", out / "versions")
+    monkeypatch.setitem(train_agent.CLASSIFIER_PARAMS, "n_estimators", 10)
+    monkeypatch.setitem(train_agent.ANOMALY_PARAMS, "n_estimators", 10)
+    return out
+
+
+def test_serving_reads_the_training_model_dir():
+    import agent_ai
+    assert agent_ai._MODEL_DIR == train_agent.OUT_DIR
+    assert agent_ai._CLASSIFIER_P.name == train_agent.CLASSIFIER_NAME
+
+
+def test_refit_without_a_classifier_is_a_clear_error(model_dir, data_csv):
+    with pytest.raises(SystemExit, match="no classifier_model.joblib"):
+        train_agent.main(["refit", "--new-rows", str(data_csv), "--no-cache"])
+
+
+def test_single_class_data_is_refused(model_dir, data_csv, tmp_path):
+    df = pd.read_csv(data_csv)
+    X, y = train_agent.build_features(df[df["label"] == "genuine"])
+    with pytest.raises(train_agent.SingleClassError):
+        train_agent.fit_models(X, y, n_jobs=1)
+
+    train_agent.main(["train", "--csv", str(data_csv), "--no-cache", "--n-jobs", "1"])
+    assert (model_dir / train_agent.CLASSIFIER_NAME).exists()
+    genuine = tmp_path / "genuine.csv"
+    df[df["label"] == "genuine"].head(200).to_csv(genuine, index=False)
+    with pytest.raises(SystemExit, match="refusing to refit"):
+        train_agent.main(["refit", "--new-rows", str(genuine), "--no-cache", "--n-jobs", "1"])
+    assert len(list((model_dir / "versions").iterdir())) == 1
+
+    mixed = tmp_path / "mixed.csv"
+    df.sample(300, random_state=0).to_csv(mixed, index=False)
+    train_agent.main(["refit", "--new-rows", str(mixed), "--no-cache", "--n-jobs", "1", "--add-trees", "5"])
+    assert len(list((model_dir / "versions").iterdir())) == 2
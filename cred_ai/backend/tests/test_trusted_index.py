@@ -0,0 +1,165 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+from fuzzywuzzy import fuzz
+
+import trusted_index
+from trusted_index import InstituteIndex, KeyIndex, TrustedData, name_columns
+
+
+def legacy_lookup(df, q):
+    """The iterrows() scan find_in_trusted used before the index."""
+    cols = name_columns(df)
+    best_score, best_pos = 0, None
+    for pos, (_, r) in enumerate(df.iterrows()):
+        for nc in cols:
+            s = fuzz.token_set_ratio(q.lower(), str(r.get(nc, "")).lower())
+            if s > best_score:
+                best_score, best_pos = s, pos
+    return best_pos, best_score
+
+
+def queries(df, n=24, seed=1):
+    rnd = random.Random(seed)
+    names = df["institute_name"].dropna().drop_duplicates().tolist()
+    out = []
+    for _ in range(n):
+        q = rnd.choice(names)
+        if rnd.random() < 0.5:
+            i = rnd.randrange(len(q))
+            q = q[:i] + rnd.choice("abcdefghijklmnopqrstuvwxyz") + q[i + 1:]
+        out.append(q)
+    return out + ["", "Unknown Institute of Nowhere"]
+
+
+@pytest.fixture(scope="module")
+def registry(data_csv):
+    return pd.read_csv(data_csv, usecols=["institute_type", "institute_name", "institute_website"])
+
+
+def test_best_matches_legacy_scan(registry):
+    idx = InstituteIndex.from_frame(registry)
+    assert len(idx) <= idx.exact_limit          # every name scored
+    for q in queries(registry):
+        assert idx.best(q) == legacy_lookup(registry, q), q
+
+
+def test_prefilter_keeps_best_score(registry):
+    # enough distinct names that the trigram shortlist is used
+    base = registry["institute_name"].drop_duplicates().tolist()
+    names = [f"{n} Campus {i}" if i >= len(base) else n for i, n in enumerate(base * 8)][:700]
+    df = pd.DataFrame({"institute_name": names})
+    idx = InstituteIndex.from_frame(df)
+    assert len(idx) > idx.exact_limit
+    for q in queries(df):
+        _, score = idx.best(q)
+        assert score == legacy_lookup(df, q)[1], q
+
+
+def test_extended_index_sees_appended_names(registry):
+    idx = InstituteIndex.from_frame(registry)
+    extra = pd.DataFrame({"institute_type": ["Private"], "institute_name": ["Zeta Nova Institute of Science"],
+                          "institute_website": ["https://zeta.example"]})
+    grown = idx.extended(extra, row_offset=len(registry))
+    pos, score = grown.best("Zeta Nova Institute of Science")
+    assert (pos, score) == (len(registry), 100)
+    assert idx.best("Zeta Nova Institute of Science")[1] < 100
+
+
+def test_key_index_positions_and_counts():
+    s = pd.Series(["A1", " A1", "B2", None, "a1"])
+    idx = KeyIndex.from_series(s)
+    assert idx.count("A1") == 2 and list(idx.positions("A1")) == [0, 1]
+    assert idx.count("a1") == 1 and idx.count("missing") == 0
+    lower = KeyIndex.from_series(s, lower=True)
+    assert lower.count("a1") == 3
+    grown = idx.extended(pd.Series(["B2", "C3"]), row_offset=5)
+    assert list(grown.positions("B2")) == [2, 5] and grown.count("C3") == 1
+    assert np.array_equal(idx.positions("B2"), [2])
+
+
+def test_appends_go_to_a_delta_that_is_merged_later(data_csv, monkeypatch):
+    monkeypatch.setattr(trusted_index, "TRUSTED_DELTA_ROWS", 150)
+    df = pd.read_csv(data_csv, usecols=["certificate_serial_number", "institute_name", "accreditation_statement"])
+    df["code"] = df["institute_name"].str.split().str[0].str.upper()
+    df = df.iloc[:1200]
+    base, tail = df.iloc[:1000].reset_index(drop=True), df.iloc[1000:].reset_index(drop=True)
+    data = TrustedData.from_frame(base)
+    shared = data.serial_index._positions
+    chunks = [tail.iloc[i:i + 40] for i in range(0, len(tail), 40)]
+    for n, chunk in enumerate(chunks[:3], 1):
+        data = data.extended(chunk)
+        assert data._delta is not None and len(data._delta) == 40 * n
+        assert data.serial_index._positions is shared and data._frame is base
+    data = data.extended(chunks[3])
+    assert data._delta is None and len(data._frame) == 1160 == len(data)   # 160 delta rows > 150: merged
+    assert data.serial_index._delta is None
+    for chunk in chunks[4:]:
+        data = data.extended(chunk)
+
+    ref = TrustedData.from_frame(df)
+    for grown in (data, TrustedData.from_frame(base).extended(tail.iloc[:120])):
+        n = len(grown)
+        for key in df["certificate_serial_number"].iloc[:n].tolist() + ["missing"]:
+            want = ref.serial_index.positions(key)
+            want = want[want < n]
+            assert grown.serial_index.count(key) == len(want)
+            assert np.array_equal(grown.serial_index.positions(key), want)
+            assert grown.rows(want)["certificate_serial_number"].tolist() == [key] * len(want)
+        for code in df["code"].iloc[:n].str.lower().unique():
+            want = ref.code_index.positions(code)
+            assert np.array_equal(grown.code_index.positions(code), want[want < n])
+        assert len(grown.serial_index) == df["certificate_serial_number"].iloc[:n].nunique()
+        pd.testing.assert_frame_equal(grown.df, df.iloc[:n])
+        assert grown.row(n - 1).equals(df.iloc[n - 1])
+
+
+def legacy_accreditation(df, institute, claim):
+    """The per-row scan credential_verifier ran before the table. It passed the name to
+    str.contains as a regex, so names with "(...)" never matched themselves; compared literally here."""
+    matches = df[df["institute_name"].astype(str).str.lower().str.contains(str(institute).lower(), na=False, regex=False)]
+    for _, r in matches.iterrows():
+        combined = " ".join(str(r.get(c, "")) for c in r.index if isinstance(c, str)).lower()
+        if claim.lower() in combined or any(k in combined for k in trusted_index.ACCREDITATION_BODIES):
+            return True
+    return False
+
+
+def test_accreditation_table_matches_legacy_scan(data_csv):
+    df = pd.read_csv(data_csv, usecols=trusted_index.CHECK_COLUMNS["accreditation"])
+    table = trusted_index.AccreditationTable.from_frame(df)
+    institutes = df["institute_name"].unique().tolist() + ["NIT", "iiit", "Unknown College of Nowhere"]
+    claims = df["accreditation_statement"].dropna().unique().tolist() + ["Accredited by the Lunar Board"]
+    for institute in institutes:
+        for claim in claims:
+            assert table.check(institute, claim) == legacy_accreditation(df, institute, claim), (institute, claim)
+
+
+def test_accreditation_memo_stays_consistent_across_refresh():
+    import threading
+    a = pd.DataFrame({"institute_name": ["North Institute", "South Institute"],
+                      "accreditation_statement": ["Accredited by NAAC", "Recognized by the State"]})
+    b = pd.DataFrame({"institute_name": ["East Institute"], "accreditation_statement": ["Recognized by the State"]})
+    table = trusted_index.AccreditationTable.from_frame(a)
+    errors, stop = [], threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                table.check("Institute", "Recognized by the State")
+                table.bodies("North")
+            except Exception as e:      # a key resolved against one version, read from another
+                errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    [t.start() for t in threads]
+    for i in range(300):
+        table.refresh(b if i % 2 == 0 else a)
+    stop.set()
+    [t.join() for t in threads]
+    assert not errors
+    table.refresh(b)
+    assert table._keys_for("Institute")[1] == ("east institute",)
+    assert table.bodies("North") == frozenset()
@@ -1,123 +1,337 @@
 # backend/train_agent.py
-import os, joblib, json
+# Training for the serving models (RandomForest tamper classifier + IsolationForest).
+#   python train_agent.py train  [--csv path]                 # full fit on all cores -> new version
+#   python train_agent.py refit  --new-rows new.csv           # warm-start: add trees fit on the new rows
+#   python train_agent.py promote <version> | list
+# Every run writes models/versions/<version>/ (both models, training_metrics.json,
+# manifest.json with the feature schema) and, unless --no-promote, copies it to
+# models/ where agent_ai loads from. agent_ai refuses artifacts whose manifest
+# schema doesn't match its FEATURES (see agent_ai.reload_models).
+# The feature matrix of a CSV is cached in cache/train_features/ keyed by the
+# file's size/mtime and the schema, so re-runs on unchanged data skip parsing.
+import os, json, time, shutil, hashlib, argparse, datetime, warnings
 from pathlib import Path
-import pandas as pd
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, IsolationForest
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_recall_fscore_support, confusion_matrix, roc_auc_score
-import warnings
-warnings.filterwarnings("ignore")
+import pandas as pd
 
-# Paths (edit if needed)
-CSV_PATH = "D:/Documents/NIT_SILCHAR Dataset.csv"   # your uploaded CSV path
-OUT_DIR = Path("models")
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-CLASSIFIER_P = OUT_DIR / "classifier_model.joblib"
-ANOMALY_P = OUT_DIR / "anomaly_model.joblib"
-METRICS_P = OUT_DIR / "training_metrics.json"
-
-# Required column names (exact from your CSV header)
-expected_cols = [
- "unique_registration_roll_number","student_id","certificate_serial_number",
- "institute_type","institute_name","institute_website","accreditation_statement",
- "credential_category","credential_title","issuance_date","convocation_date","year",
- "marks_percent","marks_removed_flag","num_subjects","signed_hash_present",
- "ocr_vs_meta_name_match","ocr_vs_meta_institute_match","ela_score","image_complexity_kb",
- "label","tamper_type","image_file","meta_file","logo_file"
-]
+from result_cache import files_fingerprint
+
+warnings.filterwarnings("ignore")
 
-if not os.path.exists(CSV_PATH):
-    raise FileNotFoundError(f"CSV not found: {CSV_PATH}")
-
-df = pd.read_csv(CSV_PATH)
-print("Loaded CSV rows:", len(df))
-
-# Create/ensure numeric features used by model
-# Feature list we will use (exact names)
-FEATURES = [
-    "marks_percent",
-    "num_subjects",
-    "signed_hash_present",
-    "ocr_vs_meta_name_match",
-    "ocr_vs_meta_institute_match",
-    "ela_score",
-    "image_complexity_kb",
-    "marks_removed_flag",
-    "marks_missing"   # derived
+# Candidate CSV locations (relative to backend/), same as agent_ai; TRAIN_CSV overrides
+CANDIDATE_CSV_PATHS = [
+    Path("data/NIT_SILCHAR Dataset.csv"),
+    Path("data/NIT_SILCHAR_Dataset.csv"),
+    Path("../data/NIT_SILCHAR Dataset.csv"),
+    Path("../data/NIT_SILCHAR_Dataset.csv"),
 ]
+OUT_DIR = Path(os.environ.get("MODEL_DIR", "models"))
+VERSIONS_DIR = OUT_DIR / "versions"
+FEATURE_CACHE_DIR = Path(os.environ.get("TRAIN_FEATURE_CACHE", "cache/train_features"))
+CLASSIFIER_NAME = "classifier_model.joblib"
+ANOMALY_NAME = "anomaly_model.joblib"
+METRICS_NAME = "training_metrics.json"
+MANIFEST_NAME = "manifest.json"
 
-# Ensure columns exist (fill defaults)
-df["marks_percent"] = pd.to_numeric(df.get("marks_percent", df.get("marks_percent")), errors="coerce")
-df["num_subjects"] = pd.to_numeric(df.get("num_subjects", 0), errors="coerce").fillna(0)
-df["signed_hash_present"] = pd.to_numeric(df.get("signed_hash_present", 0), errors="coerce").fillna(0)
-df["ocr_vs_meta_name_match"] = pd.to_numeric(df.get("ocr_vs_meta_name_match", 50), errors="coerce").fillna(50)
-df["ocr_vs_meta_institute_match"] = pd.to_numeric(df.get("ocr_vs_meta_institute_match", 50), errors="coerce").fillna(50)
-df["ela_score"] = pd.to_numeric(df.get("ela_score", 5.0), errors="coerce").fillna(5.0)
-df["image_complexity_kb"] = pd.to_numeric(df.get("image_complexity_kb", 200.0), errors="coerce").fillna(200.0)
-df["marks_removed_flag"] = pd.to_numeric(df.get("marks_removed_flag", 0), errors="coerce").fillna(0).astype(int)
-df["marks_missing"] = df["marks_percent"].isnull().astype(int)
-
-# Label normalization: 'tampered' vs 'genuine' (safe mapping)
-df["label_norm"] = df.get("label", "").astype(str).fillna("genuine").str.lower().apply(lambda x: 1 if "tam" in x else 0)
-
-# Final numeric matrix
-X = df[FEATURES].fillna(0).values
-y = df["label_norm"].values
-print("Features shape:", X.shape, "Positives:", int(y.sum()))
-
-# If y has only one class, create tiny synthetic tamper samples to allow training
-if len(np.unique(y)) == 1:
-    print("Only one class found. Synthesizing few tampered examples for demo.")
-    n_aug = max(1, int(0.03 * X.shape[0]))
-    ix = np.random.choice(np.arange(X.shape[0]), size=n_aug, replace=False)
-    X_aug = np.vstack([X, X[ix] + np.array([10,0,0,-20,-20,15,100,1,1])])  # crafted perturbation
-    y_aug = np.concatenate([y, np.ones(n_aug)])
-    X, y = X_aug, y_aug
-
-# Train/test split
-strat = y if len(np.unique(y))>1 else None
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=strat)
-
-# Train RandomForest classifier
-clf = RandomForestClassifier(n_estimators=300, class_weight="balanced", random_state=42)
-clf.fit(X_train, y_train)
-y_pred = clf.predict(X_test)
-y_prob = clf.predict_proba(X_test)[:,1] if hasattr(clf, "predict_proba") else None
-
-# Metrics
-acc = accuracy_score(y_test, y_pred)
-prec, rec, f1, _ = precision_recall_fscore_support(y_test, y_pred, average='binary', zero_division=0)
-conf = confusion_matrix(y_test, y_pred).tolist()
-roc = roc_auc_score(y_test, y_prob) if (y_prob is not None and len(np.unique(y_test))>1) else None
-
-metrics = {
-    "accuracy": float(acc),
-    "precision": float(prec),
-    "recall": float(rec),
-    "f1": float(f1),
-    "roc_auc": float(roc) if roc is not None else None,
-    "confusion_matrix": conf,
-    "n_rows": int(len(df)),
-    "n_tampered": int(df["label_norm"].sum())
+# Feature schema: name -> (CSV dtype, fill value). Order is the model's column order
+# and must match agent_ai.FEATURES; marks_missing is derived from marks_percent.
+FEATURE_SCHEMA = {
+    "marks_percent": ("float32", 0.0),
+    "num_subjects": ("float32", 0.0),
+    "signed_hash_present": ("float32", 0.0),
+    "ocr_vs_meta_name_match": ("float32", 50.0),
+    "ocr_vs_meta_institute_match": ("float32", 50.0),
+    "ela_score": ("float32", 5.0),
+    "image_complexity_kb": ("float32", 200.0),
+    "marks_removed_flag": ("float32", 0.0),
+    "marks_missing": ("float32", 0.0),
 }
+FEATURES = list(FEATURE_SCHEMA)
+FEATURE_VERSION = hashlib.sha256(json.dumps(FEATURE_SCHEMA, sort_keys=True).encode()).hexdigest()[:12]
+
+CLASSIFIER_PARAMS = {"n_estimators": 300, "class_weight": "balanced", "random_state": 42}
+ANOMALY_PARAMS = {"n_estimators": 200, "random_state": 42}
+
+
+def default_csv() -> Optional[str]:
+    if os.environ.get("TRAIN_CSV"):
+        return os.environ["TRAIN_CSV"]
+    for p in CANDIDATE_CSV_PATHS:
+        if p.exists():
+            return str(p)
+    return None
+
+
+# ---------- features ----------
+def build_features(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """-> (X float32 [n, len(FEATURES)], y int8 [n], 1 = tampered); column-wise, no per-row Python."""
+    n = len(df)
+    X = np.empty((n, len(FEATURES)), dtype=np.float32)
+    marks = pd.to_numeric(df["marks_percent"], errors="coerce") if "marks_percent" in df else pd.Series(np.nan, index=df.index)
+    for j, (name, (dtype, fill)) in enumerate(FEATURE_SCHEMA.items()):
+        if name == "marks_missing":
+            X[:, j] = marks.isna().to_numpy(dtype=np.float32)
+            continue
+        col = marks if name == "marks_percent" else (
+            pd.to_numeric(df[name], errors="coerce") if name in df else pd.Series(np.nan, index=df.index))
+        X[:, j] = col.fillna(fill).to_numpy(dtype=dtype)
+    labels = df["label"].astype(str) if "label" in df else pd.Series("genuine", index=df.index)
+    y = labels.str.lower().str.contains("tam", regex=False).to_numpy(dtype=np.int8)
+    return X, y
+
+
+def read_rows(csv_path: str) -> pd.DataFrame:
+    """Only the columns training reads, with explicit dtypes."""
+    want = set(FEATURES) | {"label"}
+    head = pd.read_csv(csv_path, nrows=0).columns
+    cols = [c for c in head if c in want]
+    dtypes = {c: "float32" for c in FEATURES if c in head}
+    dtypes.update({"label": "string"} if "label" in head else {})
+    try:
+        return pd.read_csv(csv_path, usecols=cols, dtype=dtypes)
+    except ValueError:
+        # stray text in a numeric column: parse as-is, build_features coerces to NaN
+        return pd.read_csv(csv_path, usecols=cols, dtype={k: v for k, v in dtypes.items() if k == "label"})
+
+
+def load_features(csv_path: str, use_cache: bool = True) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """Feature matrix for a CSV, from cache/train_features/ when the file hasn't changed."""
+    key = f"{files_fingerprint([csv_path])}-{FEATURE_VERSION}"
+    cache_p = FEATURE_CACHE_DIR / f"{key}.npz"
+    if use_cache and cache_p.exists():
+        with np.load(cache_p) as z:
+            return z["X"], z["y"], {"feature_cache": "hit", "data_fingerprint": key}
+    t = time.perf_counter()
+    X, y = build_features(read_rows(csv_path))
+    info = {"feature_cache": "miss", "data_fingerprint": key, "feature_build_s": round(time.perf_counter() - t, 3)}
+    if use_cache:
+        FEATURE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = cache_p.with_name(cache_p.name + ".tmp.npz")
+        np.savez(tmp, X=X, y=y)
+        os.replace(tmp, cache_p)
+    return X, y, info
+
+
+class SingleClassError(ValueError):
+    """The rows to fit on are all genuine or all tampered."""
+
+
+# ---------- fitting ----------
+def _evaluate(clf, X_test, y_test) -> Dict[str, Any]:
+    from sklearn.metrics import accuracy_score, precision_recall_fscore_support, confusion_matrix, roc_auc_score
+    y_pred = clf.predict(X_test)
+    y_prob = clf.predict_proba(X_test)[:, list(clf.classes_).index(1)] if 1 in clf.classes_ else None
+    prec, rec, f1, _ = precision_recall_fscore_support(y_test, y_pred, average="binary", zero_division=0)
+    roc = roc_auc_score(y_test, y_prob) if (y_prob is not None and len(np.unique(y_test)) > 1) else None
+    return {"accuracy": float(accuracy_score(y_test, y_pred)), "precision": float(prec), "recall": float(rec),
+            "f1": float(f1), "roc_auc": float(roc) if roc is not None else None,
+            "confusion_matrix": confusion_matrix(y_test, y_pred).tolist()}
+
+
+def _split(X, y, test_size=0.2, seed=42):
+    from sklearn.model_selection import train_test_split
+    strat = y if len(np.unique(y)) > 1 and np.bincount(y).min() >= 2 else None
+    return train_test_split(X, y, test_size=test_size, random_state=seed, stratify=strat)
+
+
+def fit_models(X, y, n_jobs=-1, base=None, add_trees=0):
+    """
+    Full fit (base=None) or warm start: base=(clf, iso) gets add_trees more trees
+    per forest, fit on (X, y). -> (clf, iso or None, metrics).
+    """
+    from sklearn.ensemble import RandomForestClassifier, IsolationForest
+    if len(np.unique(y)) < 2:
+        label = "tampered" if len(y) and y[0] else "genuine"
+        raise SingleClassError(f"all {len(y)} rows are {label}; the classifier needs both classes")
+    X_train, X_test, y_train, y_test = _split(X, y)
+    timings = {}
+
+    t = time.perf_counter()
+    if base is None:
+        clf = RandomForestClassifier(n_jobs=n_jobs, **CLASSIFIER_PARAMS)
+    else:
+        clf = base[0]
+        clf.set_params(warm_start=True, n_jobs=n_jobs, n_estimators=clf.n_estimators + add_trees)
+    clf.fit(X_train, y_train)
+    timings["classifier_fit_s"] = round(time.perf_counter() - t, 3)
+    metrics = _evaluate(clf, X_test, y_test)
+
+    iso = base[1] if base is not None else None
+    X_genuine = X[y == 0]
+    contamination = max(0.01, float(y.mean()))
+    t = time.perf_counter()
+    if iso is not None:
+        iso.set_params(warm_start=True, n_jobs=n_jobs, n_estimators=iso.n_estimators + add_trees)
+        iso.fit(X_genuine)
+    elif len(X_genuine) >= 20:
+        iso = IsolationForest(contamination=contamination, n_jobs=n_jobs, **ANOMALY_PARAMS)
+        iso.fit(X_genuine)
+    else:
+        print("Not enough genuine rows to train IsolationForest; skipping.")
+    timings["anomaly_fit_s"] = round(time.perf_counter() - t, 3)
+    # serving is single-request; don't fork a worker pool per predict
+    for m in (clf, iso):
+        if m is not None:
+            m.set_params(n_jobs=None, warm_start=False)
+    metrics.update(n_rows=int(len(X)), n_tampered=int(y.sum()), n_estimators=int(clf.n_estimators),
+                   anomaly_n_estimators=int(iso.n_estimators) if iso is not None else None, timings=timings)
+    return clf, iso, metrics
+
+
+# ---------- artifacts ----------
+def _new_version(data_key: str) -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + data_key[:8]
+
+
+def manifest_for(version, metrics, data_info, parent=None) -> Dict[str, Any]:
+    import sklearn
+    return {"version": version, "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "parent": parent, "features": FEATURES, "feature_schema": FEATURE_SCHEMA,
+            "feature_version": FEATURE_VERSION, "sklearn": sklearn.__version__,
+            "files": {"classifier": CLASSIFIER_NAME, "anomaly": ANOMALY_NAME if metrics.get("anomaly_n_estimators") else None},
+            "data": data_info, "metrics": metrics}
+
+
+def check_compatible(manifest: Dict[str, Any], features) -> Optional[str]:
+    """None if artifacts built for `features` can be served, else the reason they can't."""
+    if manifest.get("features") != list(features):
+        return f"feature mismatch: artifact {manifest.get('features')} vs serving {list(features)}"
+    try:
+        import sklearn
+        if manifest.get("sklearn") and manifest["sklearn"].split(".")[:2] != sklearn.__version__.split(".")[:2]:
+            return f"sklearn {manifest['sklearn']} artifact vs {sklearn.__version__} installed"
+    except ImportError:
+        return "sklearn not installed"
+    return None
+
+
+def save_version(clf, iso, metrics, data_info, parent=None) -> Path:
+    version = _new_version(data_info.get("data_fingerprint", "nodata"))
+    vdir = VERSIONS_DIR / version
+    vdir.mkdir(parents=True, exist_ok=True)
+    joblib.dump(clf, vdir / CLASSIFIER_NAME)
+    if iso is not None:
+        joblib.dump(iso, vdir / ANOMALY_NAME)
+    with open(vdir / METRICS_NAME, "w") as f:
+        json.dump(metrics, f, indent=2)
+    with open(vdir / MANIFEST_NAME, "w") as f:
+        json.dump(manifest_for(version, metrics, data_info, parent), f, indent=2)
+    print("Saved model version", version, "to", vdir)
+    return vdir
+
+
+def promote(version: str) -> Dict[str, Any]:
+    """Copy a version's artifacts to models/ (serving paths); manifest goes last so readers never see a half-copy."""
+    vdir = VERSIONS_DIR / version
+    manifest = json.loads((vdir / MANIFEST_NAME).read_text())
+    for name in (CLASSIFIER_NAME, ANOMALY_NAME, METRICS_NAME):
+        src = vdir / name
+        if src.exists():
+            tmp = OUT_DIR / (name + ".tmp")
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, OUT_DIR / name)
+        elif (OUT_DIR / name).exists():
+            (OUT_DIR / name).unlink()
+    tmp = OUT_DIR / (MANIFEST_NAME + ".tmp")
+    shutil.copyfile(vdir / MANIFEST_NAME, tmp)
+    os.replace(tmp, OUT_DIR / MANIFEST_NAME)
+    print("Promoted", version, "to", OUT_DIR)
+    return manifest
+
+
+def current_manifest() -> Optional[Dict[str, Any]]:
+    p = OUT_DIR / MANIFEST_NAME
+    return json.loads(p.read_text()) if p.exists() else None
+
+
+def _load_base(version: Optional[str]):
+    vdir = VERSIONS_DIR / version if version else OUT_DIR
+    if not (vdir / CLASSIFIER_NAME).exists():
+        raise SystemExit(f"cannot refit: no {CLASSIFIER_NAME} in {vdir}; run `train` first")
+    manifest = json.loads((vdir / MANIFEST_NAME).read_text()) if (vdir / MANIFEST_NAME).exists() else {}
+    reason = check_compatible(manifest, FEATURES) if manifest else None
+    if reason:
+        raise SystemExit(f"cannot refit {vdir}: {reason}")
+    clf = joblib.load(vdir / CLASSIFIER_NAME)
+    iso = joblib.load(vdir / ANOMALY_NAME) if (vdir / ANOMALY_NAME).exists() else None
+    return clf, iso, manifest.get("version")
+
+
+# ---------- CLI ----------
+def cmd_train(args):
+    csv_path = args.csv or default_csv()
+    if not csv_path or not os.path.exists(csv_path):
+        raise SystemExit(f"CSV not found: {csv_path}")
+    X, y, info = load_features(csv_path, use_cache=not args.no_cache)
+    print("Loaded", len(X), "rows from", csv_path, f"(feature cache {info['feature_cache']}); positives:", int(y.sum()))
+    try:
+        clf, iso, metrics = fit_models(X, y, n_jobs=args.n_jobs)
+    except SingleClassError as e:
+        raise SystemExit(f"cannot train on {csv_path}: {e}")
+    info["csv"] = os.path.abspath(csv_path)
+    vdir = save_version(clf, iso, metrics, info)
+    if not args.no_promote:
+        promote(vdir.name)
+    print("Training complete. Metrics:", json.dumps({k: v for k, v in metrics.items() if k != "confusion_matrix"}))
+
+
+def cmd_refit(args):
+    clf, iso, parent = _load_base(args.base)
+    X_new, y_new, info = load_features(args.new_rows, use_cache=not args.no_cache)
+    if args.replay_csv:
+        # mix in a sample of the old data so the new trees don't only see the delta
+        X_old, y_old, _ = load_features(args.replay_csv, use_cache=not args.no_cache)
+        rng = np.random.default_rng(42)
+        k = min(len(X_old), int(args.replay_ratio * len(X_new)))
+        ix = rng.choice(len(X_old), size=k, replace=False)
+        X_new, y_new = np.vstack([X_new, X_old[ix]]), np.concatenate([y_new, y_old[ix]])
+        info["replay_rows"] = int(k)
+    print("Refitting", parent or "current models", "with", len(X_new), "rows, +", args.add_trees, "trees per forest")
+    try:
+        clf, iso, metrics = fit_models(X_new, y_new, n_jobs=args.n_jobs, base=(clf, iso), add_trees=args.add_trees)
+    except SingleClassError as e:
+        raise SystemExit(f"refusing to refit on {args.new_rows}: {e} (mix in older rows with --replay-csv)")
+    info["csv"] = os.path.abspath(args.new_rows)
+    vdir = save_version(clf, iso, metrics, info, parent=parent)
+    if not args.no_promote:
+        promote(vdir.name)
+
+
+def cmd_list(args):
+    cur = (current_manifest() or {}).get("version")
+    for vdir in sorted(VERSIONS_DIR.glob("*")):
+        m = json.loads((vdir / MANIFEST_NAME).read_text()) if (vdir / MANIFEST_NAME).exists() else {}
+        met = m.get("metrics", {})
+        print(("* " if m.get("version") == cur else "  ") + vdir.name,
+              f"parent={m.get('parent')} f1={met.get('f1')} roc_auc={met.get('roc_auc')} trees={met.get('n_estimators')}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Train / refit the tamper classifier and IsolationForest.")
+    sub = ap.add_subparsers(dest="cmd")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--n-jobs", type=int, default=-1, help="cores for fitting (-1: all)")
+    common.add_argument("--no-cache", action="store_true", help="rebuild the feature matrix")
+    common.add_argument("--no-promote", action="store_true", help="write the version without serving it")
+    p = sub.add_parser("train", parents=[common]); p.add_argument("--csv", default=None); p.set_defaults(fn=cmd_train)
+    p = sub.add_parser("refit", parents=[common])
+    p.add_argument("--new-rows", required=True, help="CSV of newly labeled rows")
+    p.add_argument("--base", default=None, help="version to start from (default: the promoted models)")
+    p.add_argument("--add-trees", type=int, default=50)
+    p.add_argument("--replay-csv", default=None, help="older training CSV to sample alongside the new rows")
+    p.add_argument("--replay-ratio", type=float, default=1.0, help="replayed rows per new row")
+    p.set_defaults(fn=cmd_refit)
+    p = sub.add_parser("promote"); p.add_argument("version"); p.set_defaults(fn=lambda a: promote(a.version))
+    p = sub.add_parser("list"); p.set_defaults(fn=cmd_list)
+    args = ap.parse_args(argv)
+    if args.cmd is None:    # bare `python train_agent.py` keeps training like before
+        args = ap.parse_args(["train"] + list(argv or []))
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    args.fn(args)
+
 
-# Save classifier
-joblib.dump(clf, CLASSIFIER_P)
-print("Saved classifier to:", CLASSIFIER_P)
-
-# Train IsolationForest on genuine examples
-X_genuine = df[df["label_norm"]==0][FEATURES].fillna(0).values
-if len(X_genuine) >= 20:
-    iso = IsolationForest(n_estimators=200, contamination=max(0.01, df["label_norm"].mean()), random_state=42)
-    iso.fit(X_genuine)
-    joblib.dump(iso, ANOMALY_P)
-    print("Saved IsolationForest to:", ANOMALY_P)
-else:
-    print("Not enough genuine rows to train IsolationForest; skipping.")
-
-# Save metrics
-with open(METRICS_P, "w") as f:
-    json.dump(metrics, f, indent=2)
-print("Saved training metrics to:", METRICS_P)
-print("Training complete. Metrics:", metrics)
+if __name__ == "__main__":
+    main()
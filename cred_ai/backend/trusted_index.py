@@ -0,0 +1,590 @@
+# backend/trusted_index.py
+# In-memory indexes over the trusted registry, built once at load time so the
+# per-request lookups in agent_ai don't have to walk the whole DataFrame.
+import os, re, hashlib, threading
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import fuzz, utils as fuzz_utils
+
+import columnar_store
+
+# Columns each check reads from the registry; everything else in the CSV
+# (image/meta/logo file paths, training-only features) is never loaded.
+CHECK_COLUMNS = {
+    "institute": ["institute_name", "institute_type", "institute_website", "code"],
+    "serial": ["certificate_serial_number"],
+    "accreditation": ["institute_name", "accreditation_statement"],
+    "evidence": ["unique_registration_roll_number", "student_id", "credential_category", "credential_title",
+                 "issuance_date", "convocation_date", "year", "marks_percent", "marks_removed_flag",
+                 "num_subjects", "signed_hash_present"],
+}
+VERIFY_COLUMNS = list(dict.fromkeys(c for cols in CHECK_COLUMNS.values() for c in cols))
+
+# Appended rows (TrustedData.extended) go to a small delta frame / delta KeyIndex
+# that lookups consult after the base; the delta is merged into the base once it
+# holds more than TRUSTED_DELTA_ROWS rows or 1/8 of the base, so an append costs
+# O(delta) and the O(N log N) rebuild is amortized over many appends.
+TRUSTED_DELTA_ROWS = int(os.environ.get("TRUSTED_DELTA_ROWS", 4096))
+
+
+def _merge_due(delta_rows: int, base_rows: int) -> bool:
+    return delta_rows > max(TRUSTED_DELTA_ROWS, base_rows // 8)
+
+
+def normalize_name(s) -> str:
+    """Same processing fuzz.token_set_ratio applies internally (alnum, lower, ascii)."""
+    return " ".join(fuzz_utils.full_process(str(s), force_ascii=True).split())
+
+
+def _ngrams(s: str, n: int = 3) -> set:
+    padded = f" {s} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def name_columns(df: pd.DataFrame) -> List[str]:
+    cols = [c for c in df.columns if "institute" in c.lower() or "name" in c.lower()]
+    return cols or df.columns.tolist()
+
+
+# ---------------------------
+# Institute-name index
+# ---------------------------
+class InstituteIndex:
+    """
+    Deduplicated, normalized institute names with a trigram prefilter.
+
+    Every distinct normalized value of the name columns is kept once together
+    with the position of the first row (and column) it appeared in, so lookups
+    return the same row the old iterrows() scan picked on score ties.
+    """
+
+    def __init__(self, names: List[str], first_pos: np.ndarray, exact_limit: int = 512, prefilter_k: int = 64,
+                 postings: Optional[Dict[str, np.ndarray]] = None, gram_sizes: Optional[np.ndarray] = None):
+        self.names = names                      # normalized, distinct
+        self.first_pos = first_pos              # (row_pos, col_idx) per name, int64[n, 2]
+        self.exact_limit = exact_limit
+        self.prefilter_k = prefilter_k
+        if postings is None:
+            postings, gram_sizes = self._build_postings(names)
+        # trigram -> name ids (CSR-style postings)
+        self._gram_sizes = gram_sizes
+        self._postings = postings
+
+    @staticmethod
+    def _build_postings(names: List[str], start: int = 0):
+        postings: Dict[str, List[int]] = {}
+        sizes = np.zeros(len(names), dtype=np.int32)
+        for i, nm in enumerate(names):
+            grams = _ngrams(nm)
+            sizes[i] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(start + i)
+        return {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}, sizes
+
+    @staticmethod
+    def _first_positions(df: pd.DataFrame, columns: List[str], row_offset: int = 0) -> Dict[str, Tuple[int, int]]:
+        seen: Dict[str, Tuple[int, int]] = {}
+        for ci, col in enumerate(columns):
+            if col not in df.columns:
+                continue
+            values = df[col].astype(object).fillna("").astype(str)
+            # the CSV repeats each institute hundreds of times: normalize distinct raw values only
+            uniq, first = np.unique(values.to_numpy(dtype=object), return_index=True)
+            for raw, pos in zip(uniq, first):
+                key = normalize_name(raw)
+                if not key:
+                    continue
+                cand = (int(pos) + row_offset, ci)
+                cur = seen.get(key)
+                if cur is None or cand < cur:
+                    seen[key] = cand
+        return seen
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: Optional[List[str]] = None, **kw) -> "InstituteIndex":
+        seen = cls._first_positions(df, columns or name_columns(df))
+        names = list(seen.keys())
+        first_pos = np.array([seen[n] for n in names], dtype=np.int64).reshape(-1, 2)
+        return cls(names, first_pos, **kw)
+
+    def extended(self, df: pd.DataFrame, row_offset: int, columns: Optional[List[str]] = None) -> "InstituteIndex":
+        """
+        New index with the names of appended rows df (frame positions starting
+        at row_offset). Existing names keep their first position; only postings
+        of trigrams the new names touch are copied, the rest are shared.
+        """
+        seen = self._first_positions(df, columns or name_columns(df), row_offset)
+        known = set(self.names)
+        fresh = [n for n in seen if n not in known]
+        if not fresh:
+            return self
+        add_postings, add_sizes = self._build_postings(fresh, start=len(self.names))
+        postings = dict(self._postings)
+        for g, ids in add_postings.items():
+            postings[g] = np.concatenate([postings[g], ids]) if g in postings else ids
+        first_pos = np.vstack([self.first_pos, np.array([seen[n] for n in fresh], dtype=np.int64).reshape(-1, 2)])
+        return InstituteIndex(self.names + fresh, first_pos, self.exact_limit, self.prefilter_k,
+                              postings, np.concatenate([self._gram_sizes, add_sizes]))
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidates(self, query_norm: str) -> np.ndarray:
+        """Name ids worth scoring: everything when the index is small, else the trigram shortlist."""
+        n = len(self.names)
+        if n <= self.exact_limit:
+            return np.arange(n)
+        q_grams = _ngrams(query_norm)
+        hits = [self._postings[g] for g in q_grams if g in self._postings]
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        overlap = np.bincount(np.concatenate(hits), minlength=n)
+        # containment in either direction, since token_set_ratio rewards subsets
+        denom = np.minimum(self._gram_sizes, len(q_grams)).clip(min=1)
+        sim = overlap / denom
+        k = min(self.prefilter_k, int(np.count_nonzero(overlap)))
+        if k == 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-sim, k - 1)[:k]
+        return top
+
+    def top_k(self, query: str, k: int = 5) -> List[Tuple[int, int]]:
+        """[(name_id, score)] best first; ties broken by first occurrence in the frame."""
+        q = normalize_name(query)
+        if not q:
+            return []
+        scored = []
+        for i in self.candidates(q):
+            s = fuzz.token_set_ratio(q, self.names[i], full_process=False)
+            row_pos, col_idx = self.first_pos[i]
+            scored.append((-s, int(row_pos), int(col_idx), int(i)))
+        scored.sort()
+        return [(i, -neg) for neg, _, _, i in scored[:k]]
+
+    def best(self, query: str) -> Tuple[Optional[int], int]:
+        """(row position of the best match or None, score)."""
+        top = self.top_k(query, k=1)
+        if not top:
+            return None, 0
+        i, score = top[0]
+        if score <= 0:
+            return None, 0
+        return int(self.first_pos[i][0]), score
+
+
+# ---------------------------
+# Exact-key indexes (serial numbers, institute codes)
+# ---------------------------
+class KeyIndex:
+    """
+    Maps a normalized key to the row positions holding it.
+
+    Keys are factorized once; positions are stored grouped by key (CSR layout)
+    so a lookup is one dict hit plus an array slice, and count() is O(1).
+    Appended rows live in a delta KeyIndex until they are merged (see
+    TRUSTED_DELTA_ROWS); their positions follow the base's for each key.
+    """
+
+    def __init__(self, keys: Dict[str, int], offsets: np.ndarray, positions: np.ndarray,
+                 delta: Optional["KeyIndex"] = None):
+        self._keys = keys
+        self._offsets = offsets
+        self._positions = positions
+        self._delta = delta
+
+    # Pickled as arrays: a dict of millions of serials is slow to unpickle, while
+    # the array is memory-mapped by joblib and turned back into a dict on first use.
+    def __getstate__(self):
+        if self._delta is not None:
+            return self.compacted().__getstate__()
+        return {"key_array": np.array(list(self._map()), dtype=str), "offsets": self._offsets,
+                "positions": self._positions}
+
+    def __setstate__(self, state):
+        self._key_array = state["key_array"]
+        self._offsets = state["offsets"]
+        self._positions = state["positions"]
+        self._keys = None
+        self._delta = None
+
+    def _map(self) -> Dict[str, int]:
+        keys = self._keys
+        if keys is None:   # racing threads build the same dict; last assignment wins
+            keys = dict(zip(self._key_array.tolist(), range(len(self._key_array))))
+            self._keys = keys
+        return keys
+
+    @staticmethod
+    def normalize(value, lower: bool = False) -> str:
+        s = str(value).strip()
+        return s.lower() if lower else s
+
+    @staticmethod
+    def _normalized(series: pd.Series, lower: bool) -> Tuple[pd.Series, np.ndarray]:
+        valid = series.notna().to_numpy()
+        norm = series[valid].astype(str).str.strip()
+        return (norm.str.lower() if lower else norm), np.flatnonzero(valid)
+
+    @classmethod
+    def _build(cls, norm: pd.Series, rows: np.ndarray) -> "KeyIndex":
+        codes, uniques = pd.factorize(norm)
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=len(uniques))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        keys = {k: i for i, k in enumerate(uniques)}
+        return cls(keys, offsets, rows[order].astype(np.int64))
+
+    @classmethod
+    def from_series(cls, series: pd.Series, lower: bool = False) -> "KeyIndex":
+        norm, rows = cls._normalized(series, lower)
+        return cls._build(norm, rows)
+
+    def _merged(self, other: "KeyIndex") -> "KeyIndex":
+        """One CSR index over self's rows and then other's (other holds no delta)."""
+        keys = dict(self._map())
+        other_keys = other._map()
+        remap = np.fromiter((keys.setdefault(k, len(keys)) for k in other_keys), dtype=np.int64, count=len(other_keys))
+        old_counts = np.diff(self._offsets)
+        codes = np.concatenate([np.repeat(np.arange(len(old_counts)), old_counts),
+                                np.repeat(remap, np.diff(other._offsets))])
+        positions = np.concatenate([np.asarray(self._positions), np.asarray(other._positions)])
+        order = np.argsort(codes, kind="stable")   # self's rows stay ahead of other's per key
+        counts = np.bincount(codes, minlength=len(keys))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return KeyIndex(keys, offsets, positions[order].astype(np.int64))
+
+    def compacted(self) -> "KeyIndex":
+        """The same index with the delta merged into the base."""
+        return self if self._delta is None else self._merged(self._delta)
+
+    def extended(self, series: pd.Series, row_offset: int, lower: bool = False) -> "KeyIndex":
+        """
+        New index over the old rows plus appended rows series (positions from
+        row_offset). Only the delta is rebuilt; the base arrays are shared.
+        """
+        norm, rows = self._normalized(series, lower)
+        if not len(rows):
+            return self
+        delta = KeyIndex._build(norm, rows + row_offset)
+        if self._delta is not None:
+            delta = self._delta._merged(delta)
+        out = KeyIndex.__new__(KeyIndex)
+        out.__dict__.update(self.__dict__)
+        out._delta = delta
+        return out.compacted() if _merge_due(len(delta._positions), len(self._positions)) else out
+
+    def __len__(self):
+        keys = self._map()
+        if self._delta is None:
+            return len(keys)
+        return len(keys) + sum(1 for k in self._delta._map() if k not in keys)
+
+    def __contains__(self, key):
+        return key in self._map() or (self._delta is not None and key in self._delta)
+
+    def positions(self, key: str) -> np.ndarray:
+        i = self._map().get(key)
+        own = self._positions[:0] if i is None else self._positions[self._offsets[i]:self._offsets[i + 1]]
+        if self._delta is None:
+            return own
+        extra = self._delta.positions(key)
+        return np.concatenate([own, extra]) if len(extra) else own
+
+    def count(self, key: str) -> int:
+        i = self._map().get(key)
+        n = 0 if i is None else int(self._offsets[i + 1] - self._offsets[i])
+        return n if self._delta is None else n + self._delta.count(key)
+
+
+# ---------------------------
+# Accreditation table
+# ---------------------------
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+ACCREDITATION_BODIES = ("ugc", "aicte", "naac", "abet", "national importance", "ministry")
+
+
+def _institute_key(s) -> str:
+    return " ".join(str(s).lower().split())
+
+
+def _tokens(s) -> frozenset:
+    return frozenset(_TOKEN_RE.findall(str(s).lower()))
+
+
+class AccreditationTable:
+    """
+    institute key -> (accreditation bodies, statement tokens), built from the
+    accreditation_statement column (or the whole row text when it is missing).
+    A check is a dict hit plus a set intersection instead of scanning rows.
+    refresh() swaps entries and the substring memo together under a lock, so a
+    lookup never mixes keys resolved against one version with another's entries.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Tuple[frozenset, frozenset]]] = None):
+        self.entries: Dict[str, Tuple[frozenset, frozenset]] = dict(entries or {})
+        self._resolved: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"entries": self.entries}
+
+    def __setstate__(self, state):
+        self.__init__(state["entries"])
+
+    @staticmethod
+    def _row_text(df: pd.DataFrame) -> pd.Series:
+        if "accreditation_statement" in df.columns:
+            return df["accreditation_statement"].astype(object).fillna("").astype(str)
+        return df.astype(str).agg(" ".join, axis=1)
+
+    @staticmethod
+    def _entries(df: pd.DataFrame) -> Dict[str, Tuple[frozenset, frozenset]]:
+        if "institute_name" not in df.columns or df.empty:
+            return {}
+        keys = df["institute_name"].astype(str).map(_institute_key)
+        pairs = pd.DataFrame({"key": keys, "text": AccreditationTable._row_text(df).str.lower()}).drop_duplicates()
+        out: Dict[str, Tuple[frozenset, frozenset]] = {}
+        for key, texts in pairs.groupby("key", sort=False)["text"]:
+            joined = " ".join(texts)
+            bodies = frozenset(b for b in ACCREDITATION_BODIES if b in joined)
+            out[key] = (bodies, _tokens(joined))
+        return out
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "AccreditationTable":
+        return cls(cls._entries(df))
+
+    def refresh(self, df: pd.DataFrame, institutes=None):
+        """
+        Recompute entries from df. With institutes (raw names) given, only
+        those keys are rebuilt, from df's rows for them; keys with no rows left
+        are dropped. Without, the whole table is replaced.
+        """
+        if institutes is None:
+            entries = self._entries(df)
+        else:
+            keys = {_institute_key(i) for i in institutes}
+            if "institute_name" in df.columns:
+                rows = df[df["institute_name"].astype(str).map(_institute_key).isin(keys)]
+            else:
+                rows = df.iloc[:0]
+            fresh = self._entries(rows)
+            entries = {k: v for k, v in self.entries.items() if k not in keys}
+            entries.update(fresh)
+        with self._lock:
+            self.entries, self._resolved = entries, {}
+
+    def extended(self, df: pd.DataFrame) -> "AccreditationTable":
+        """New table with appended rows df merged in (sets are unioned per institute)."""
+        entries = dict(self.entries)
+        for key, (bodies, tokens) in self._entries(df).items():
+            cur = entries.get(key)
+            entries[key] = (bodies, tokens) if cur is None else (cur[0] | bodies, cur[1] | tokens)
+        return AccreditationTable(entries)
+
+    def _keys_for(self, institute) -> Tuple[Dict[str, Tuple[frozenset, frozenset]], Tuple[str, ...]]:
+        """-> (entries, registry keys containing the query) - the old str.contains semantics, memoized."""
+        q = _institute_key(institute or "")
+        with self._lock:
+            entries, resolved = self.entries, self._resolved
+        if q in entries:
+            return entries, (q,)
+        keys = resolved.get(q)
+        if keys is None:
+            keys = tuple(k for k in entries if q in k)
+            with self._lock:
+                if self._resolved is resolved and len(resolved) < 4096:
+                    resolved[q] = keys
+        return entries, keys
+
+    def bodies(self, institute) -> frozenset:
+        entries, keys = self._keys_for(institute)
+        out = frozenset()
+        for k in keys:
+            out |= entries[k][0]
+        return out
+
+    def check(self, institute, statement) -> Optional[bool]:
+        """True if a matching institute has a known accreditation body or its statements cover the claim."""
+        entries, keys = self._keys_for(institute)
+        if not keys:
+            return False
+        claim = _tokens(statement)
+        for k in keys:
+            bodies, tokens = entries[k]
+            if bodies or (claim and claim <= tokens):
+                return True
+        return False
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# ---------------------------
+# Bundle + shared on-disk artifact
+# ---------------------------
+class TrustedData:
+    """
+    The trusted DataFrame together with every index built over it. Rows added
+    by extended() sit in a delta frame after the base until they are merged;
+    row()/rows() read across both, `df` joins them on first use.
+    """
+
+    version: Optional[str] = None   # set by registry.TrustedRegistry when it publishes a snapshot
+
+    def __init__(self, df: pd.DataFrame, institute_index: InstituteIndex,
+                 serial_index: Optional[KeyIndex], code_index: Optional[KeyIndex], source: str = "",
+                 accreditation: Optional[AccreditationTable] = None, delta: Optional[pd.DataFrame] = None):
+        self.df = df
+        self._delta = delta
+        self.institute_index = institute_index
+        self.serial_index = serial_index
+        self.code_index = code_index
+        self.accreditation = accreditation if accreditation is not None else AccreditationTable.from_frame(df)
+        self.source = source
+
+    @property
+    def df(self) -> pd.DataFrame:
+        if self._delta is None:
+            return self._frame
+        joined = self._joined
+        if joined is None:   # racing threads join the same frames; last assignment wins
+            joined = self._joined = _append(self._frame, self._delta)
+        return joined
+
+    @df.setter
+    def df(self, df: pd.DataFrame):
+        self._frame, self._delta, self._joined = df, None, None
+
+    def __len__(self):
+        return len(self._frame) + (0 if self._delta is None else len(self._delta))
+
+    def rows(self, positions) -> pd.DataFrame:
+        """Rows at frame positions (base rows first, then delta rows)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        n = len(self._frame)
+        if self._delta is None or not (positions >= n).any():
+            return self._frame.iloc[positions]
+        tail = self._delta.iloc[positions[positions >= n] - n]
+        if (positions >= n).all():
+            return tail
+        return pd.concat([self._frame.iloc[positions[positions < n]], tail])
+
+    def row(self, pos: int) -> pd.Series:
+        return self.rows([pos]).iloc[0]
+
+    # the frame lives in the columnar store next to the index artifact, not in the pickle
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_frame"] = state["_delta"] = state["_joined"] = None
+        return state
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, source: str = "") -> "TrustedData":
+        serial = KeyIndex.from_series(df["certificate_serial_number"]) if "certificate_serial_number" in df.columns else None
+        code = KeyIndex.from_series(df["code"], lower=True) if "code" in df.columns else None
+        return cls(df, InstituteIndex.from_frame(df), serial, code, source, AccreditationTable.from_frame(df))
+
+    def extended(self, rows: pd.DataFrame) -> "TrustedData":
+        """
+        Copy-on-write append: a new TrustedData over df + rows. Only the new
+        rows are indexed and the base frame and index arrays are shared with
+        self, which stays valid for requests still holding it.
+        """
+        if rows is None or rows.empty:
+            return self
+        offset = len(self)
+        rows = rows.reindex(columns=self._frame.columns)
+        rows.index = pd.RangeIndex(offset, offset + len(rows))
+        delta = rows if self._delta is None else pd.concat([self._delta, rows])
+        serial, code = self.serial_index, self.code_index
+        if serial is not None:
+            serial = serial.extended(rows["certificate_serial_number"], offset)
+        if code is not None:
+            code = code.extended(rows["code"], offset, lower=True)
+        out = TrustedData(self._frame, self.institute_index.extended(rows, offset, name_columns(self._frame)),
+                          serial, code, self.source, self.accreditation.extended(rows), delta)
+        return out.compacted() if _merge_due(len(delta), len(self._frame)) else out
+
+    def compacted(self) -> "TrustedData":
+        """The same data with the delta frame and delta key indexes merged into the base."""
+        if self._delta is None:
+            return self
+        return TrustedData(self.df, self.institute_index,
+                           self.serial_index.compacted() if self.serial_index is not None else None,
+                           self.code_index.compacted() if self.code_index is not None else None,
+                           self.source, self.accreditation)
+
+
+def _append(base: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """base + rows, keeping categorical columns categorical (categories extended, codes reused)."""
+    cats = [c for c in base.columns if isinstance(base[c].dtype, pd.CategoricalDtype)]
+    if cats:
+        base = base.copy(deep=False)
+        rows = rows.copy()
+        for c in cats:
+            new = pd.Index(rows[c].dropna().astype(str).unique()).difference(base[c].cat.categories)
+            if len(new):
+                base[c] = base[c].cat.add_categories(new)
+            rows[c] = pd.Categorical(rows[c].astype(object), categories=base[c].cat.categories)
+    return pd.concat([base, rows], ignore_index=True)
+
+
+ARTIFACT_VERSION = 4   # bump when TrustedData gains fields, so stale artifacts are rebuilt
+
+
+def _artifact_base(csv_path: str, artifact_dir: str, columns) -> str:
+    st = os.stat(csv_path)
+    key = f"{ARTIFACT_VERSION}|{os.path.abspath(csv_path)}|{st.st_size}|{st.st_mtime_ns}|{columns}"
+    tag = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return os.path.join(artifact_dir, f"trusted_{tag}")
+
+
+def _csv_columns(csv_path: str, columns):
+    head = pd.read_csv(csv_path, nrows=0).columns
+    return list(head) if columns is None else [c for c in columns if c in head]
+
+
+def load_trusted(csv_path: str, artifact_dir: Optional[str] = "cache",
+                 columns: Optional[List[str]] = None) -> TrustedData:
+    """
+    Load the registry (only `columns`, default all) and its indexes.
+
+    The first process converts the CSV to a typed columnar store (see
+    columnar_store) and writes a joblib artifact with the indexes, both keyed
+    by the CSV's size/mtime; later workers memory-map the index arrays and the
+    numeric/categorical columns instead of re-parsing the CSV.
+    """
+    columns = _csv_columns(csv_path, columns)
+    if not artifact_dir:
+        return TrustedData.from_frame(pd.read_csv(csv_path, usecols=columns)[columns], source=csv_path)
+    base = _artifact_base(csv_path, artifact_dir, columns)
+    art, store = base + ".joblib", columnar_store.store_path(base)
+    try:
+        os.makedirs(artifact_dir, exist_ok=True)
+        if not os.path.exists(store):
+            columnar_store.convert(csv_path, store)
+        df = columnar_store.load(store, columns)
+    except Exception as e:
+        print("trusted_index: columnar store unusable, reading the CSV:", e)
+        return TrustedData.from_frame(pd.read_csv(csv_path, usecols=columns)[columns], source=csv_path)
+    if os.path.exists(art):
+        try:
+            data = joblib.load(art, mmap_mode="r")
+            data.df = df
+            return data
+        except Exception as e:
+            print("trusted_index: artifact unusable, rebuilding:", e)
+    data = TrustedData.from_frame(df, source=csv_path)
+    try:
+        tmp = f"{art}.{os.getpid()}.tmp"
+        joblib.dump(data, tmp)
+        os.replace(tmp, art)
+    except Exception as e:
+        print("trusted_index: could not write artifact:", e)
+    return data